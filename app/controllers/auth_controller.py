@@ -2,6 +2,7 @@ from fastapi import HTTPException, Depends, status
 from fastapi.security import OAuth2PasswordBearer
 from app.models.user import UserCreate, UserLogin, UserVerify, TokenData, GoogleUser
 from app.services.auth_service import AuthService
+from app.utils.async_database import get_db_session, async_db_connection
 import jwt
 from jwt.exceptions import PyJWTError
 from config.settings import JWT_SECRET_KEY, JWT_ALGORITHM, GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET, GOOGLE_REDIRECT_URI
@@ -355,7 +356,7 @@ class AuthController:
         print(f"Generated token with expiration: {expire}, payload: {to_encode}")
         return encoded_jwt
 
-    async def get_current_user(self, token: str = Depends(oauth2_scheme)):
+    async def get_current_user(self, token: str = Depends(oauth2_scheme), conn = Depends(get_db_session)):
         """Get the current authenticated user from the JWT token."""
         credentials_exception = HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -376,16 +377,10 @@ class AuthController:
         except PyJWTError:
             raise credentials_exception
         
-        # Get user from database
-        conn = None
+        # Get user from database (dùng chung connection của request với handler)
         try:
-            from app.utils.database import get_db_connection
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("SELECT * FROM users WHERE id = %s", (token_data.user_id,))
-            user = cursor.fetchone()
-            
+            user = await conn.fetchrow("SELECT * FROM users WHERE id = $1", token_data.user_id)
+
             if user is None:
                 raise credentials_exception
             
@@ -403,10 +398,18 @@ class AuthController:
                 "created_at": user["created_at"],
                 "updated_at": user["updated_at"]
             }
-            
+
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-        
-        finally:
-            if conn:
-                conn.close()
+
+    async def get_current_user_unpinned(self, token: str = Depends(oauth2_scheme)):
+        """
+        Same as get_current_user, but on a connection held only for the user lookup.
+
+        For handlers that make slow external calls (e.g. LLM generation): depending on
+        get_db_session would keep a pooled connection checked out until the response.
+        """
+        async with async_db_connection() as conn:
+            return await self.get_current_user(token, conn)
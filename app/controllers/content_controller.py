@@ -1,13 +1,30 @@
 from app.services.rag_service import RAGService
-from app.utils.database import fetch_data, get_db_connection
+from app.utils.async_database import async_fetch_data, async_select_rows, async_insert_rows, async_get_projection, async_get_column_types
+from app.utils.ann_index import ann_upsert
+from app.utils.bm25_index import bm25_upsert
+from app.utils.llm_cache import fresh_responses
+from fastapi.concurrency import run_in_threadpool
 from langchain.prompts import PromptTemplate
 import json
+import uuid
 
 class ContentController:
     def __init__(self):
         self.rag_service = RAGService()
     
-    async def generate_topic(self, product_id=None, product_query=None, brand_id=None, prompt=None, count=1, use_previous_topics=True, max_previous_topics=5):
+    @staticmethod
+    async def _run_blocking(fresh, func, *args, **kwargs):
+        """
+        Run a synchronous LLM, embedding or psycopg2 call in the threadpool so it does not block the event loop.
+        
+        The fresh flag is set inside the worker thread, where the LLM and semantic caches read it.
+        """
+        def call():
+            with fresh_responses(fresh):
+                return func(*args, **kwargs)
+        return await run_in_threadpool(call)
+    
+    async def generate_topic(self, product_id=None, product_query=None, brand_id=None, prompt=None, count=1, use_previous_topics=True, max_previous_topics=5, fresh=False):
         """
         Generate multiple topics based on product information, brand info and previous topics.
         
@@ -19,6 +36,7 @@ class ContentController:
             count (int): Number of topics to generate (default: 1)
             use_previous_topics (bool): Whether to use previous topics as context
             max_previous_topics (int): Maximum number of previous topics to use
+            fresh (bool): Bypass the LLM response cache
             
         Returns:
             dict: Generated topics
@@ -31,7 +49,7 @@ class ContentController:
             
             if product_id:
                 # Fetch specific product from database
-                products = fetch_data("products", f"id = '{product_id}'")
+                products = await async_select_rows("products", {"id": product_id}, columns=await async_get_projection("products"))
                 if products:
                     product = products[0]
                     product_context = f"Tên sản phẩm: {product.get('name', '')}\nMô tả: {product.get('description', '')}"
@@ -51,7 +69,7 @@ class ContentController:
                     
                     # Get brand info if brand_id is provided
                     if brand_id:
-                        brands = fetch_data("brands", f"id = '{brand_id}'")
+                        brands = await async_select_rows("brands", {"id": brand_id})
                         if brands:
                             brand = brands[0]
                             brand_info = f"Thông tin thương hiệu:\nTên: {brand.get('name', '')}\nMô tả: {brand.get('description', '')}"
@@ -59,23 +77,24 @@ class ContentController:
                     # Get previous topics if requested
                     if use_previous_topics:
                         # Get topics for this product
-                        product_topics = fetch_data("topics", f"product_id = '{product_id}'", limit=max_previous_topics)
+                        product_topics = await async_select_rows("topics", {"product_id": product_id}, limit=max_previous_topics)
                         if product_topics:
                             previous_topics.extend([topic.get('title') for topic in product_topics])
                         
                         # If brand_id is provided, get topics for other products of the same brand
                         if brand_id:
-                            brand_topics = fetch_data(
+                            brand_topics = await async_fetch_data(
                                 "topics",
-                                f"product_id IN (SELECT id FROM products WHERE brand_id = '{brand_id}') AND product_id != '{product_id}'",
-                                limit=max_previous_topics
+                                "product_id IN (SELECT id FROM products WHERE brand_id = $1) AND product_id != $2",
+                                limit=max_previous_topics,
+                                params=(brand_id, product_id)
                             )
                             if brand_topics:
                                 previous_topics.extend([topic.get('title') for topic in brand_topics])
             
             elif product_query:
                 # Retrieve relevant products based on query
-                products = self.rag_service.retrieve_relevant_products(product_query)
+                products = await self._run_blocking(fresh, self.rag_service.retrieve_relevant_products, product_query)
                 product_context = "\n\n".join(products)
             
             if not product_context:
@@ -160,7 +179,7 @@ class ContentController:
                 )
                 
                 # Generate topics
-                response = self.rag_service.openai.invoke(formatted_prompt)
+                response = await self._run_blocking(fresh, self.rag_service.openai.invoke, formatted_prompt)
                 
                 # Parse response
                 try:
@@ -204,11 +223,16 @@ class ContentController:
                 }
             else:
                 # Original logic for single topic
-                topic = self.rag_service.generate_topic_from_context(
+                topic = await self._run_blocking(
+                    fresh,
+                    self.rag_service.generate_topic_from_context,
                     product_context=product_context,
                     brand_info=brand_info if brand_info else None,
                     previous_topics=previous_topics if previous_topics else None,
-                    prompt=prompt
+                    prompt=prompt,
+                    tenant=brand_id,
+                    # Tìm sản phẩm theo truy vấn thì truy vấn đó xác định sản phẩm
+                    product_id=product_id or product_query
                 )
                 
                 # Return topic without saving to database
@@ -229,7 +253,7 @@ class ContentController:
                 "error": str(e)
             }
     
-    async def generate_brand_product_topics(self, brand_id, product_id, count=3, save_to_db=False, prompt=None, use_previous_topics=False, max_previous_topics=5):
+    async def generate_brand_product_topics(self, brand_id, product_id, count=3, save_to_db=False, prompt=None, use_previous_topics=False, max_previous_topics=5, fresh=False):
         """
         Generate multiple topics for a product from a specific brand.
         
@@ -241,13 +265,14 @@ class ContentController:
             prompt (str, optional): Additional prompt instructions
             use_previous_topics (bool): Whether to use previous topics as context
             max_previous_topics (int): Maximum number of previous topics to use
+            fresh (bool): Bypass the LLM response cache
             
         Returns:
             dict: Generated topics in JSON format
         """
         try:
             # Fetch product information
-            product_data = fetch_data("products", f"id = '{product_id}'")
+            product_data = await async_select_rows("products", {"id": product_id}, columns=await async_get_projection("products"))
             if not product_data:
                 return {
                     "success": False,
@@ -272,7 +297,7 @@ class ContentController:
             
             # Fetch brand information
             brand_info = ""
-            brands = fetch_data("brands", f"id = '{brand_id}'")
+            brands = await async_select_rows("brands", {"id": brand_id})
             if brands:
                 brand = brands[0]
                 brand_info = f"Thông tin thương hiệu:\nTên: {brand.get('name', '')}\nMô tả: {brand.get('description', '')}"
@@ -281,15 +306,16 @@ class ContentController:
             previous_topics = []
             if use_previous_topics:
                 # Get topics for this product
-                product_topics = fetch_data("topics", f"product_id = '{product_id}'", limit=max_previous_topics)
+                product_topics = await async_select_rows("topics", {"product_id": product_id}, limit=max_previous_topics)
                 if product_topics:
                     previous_topics.extend([topic.get('title') for topic in product_topics])
                 
                 # Get topics for other products of the same brand
-                brand_topics = fetch_data(
+                brand_topics = await async_fetch_data(
                     "topics",
-                    f"product_id IN (SELECT id FROM products WHERE brand_id = '{brand_id}') AND product_id != '{product_id}'",
-                    limit=max_previous_topics
+                    "product_id IN (SELECT id FROM products WHERE brand_id = $1) AND product_id != $2",
+                    limit=max_previous_topics,
+                    params=(brand_id, product_id)
                 )
                 if brand_topics:
                     previous_topics.extend([topic.get('title') for topic in brand_topics])
@@ -371,7 +397,7 @@ class ContentController:
             )
             
             # Generate topics
-            response = self.rag_service.openai.invoke(formatted_prompt)
+            response = await self._run_blocking(fresh, self.rag_service.openai.invoke, formatted_prompt)
             
             # Parse response
             try:
@@ -443,46 +469,33 @@ class ContentController:
                     "topics": topics
                 }
             
-            conn = get_db_connection()
-            cursor = conn.cursor()
+            # Only save topics with status 'complete'
+            complete_topics = [topic_data for topic_data in topics if topic_data.get("status") == "complete"]
+            
+            # Chèn tất cả topic trong một câu lệnh INSERT nhiều dòng (một round trip)
+            rows = [
+                {
+                    "id": str(uuid.uuid4()),
+                    "title": topic_data.get("title", ""),
+                    "product_id": topic_data.get("product_id"),
+                    "brand_id": topic_data.get("brand_id"),
+                    "keywords": topic_data.get("seo_keywords", []),
+                    "relevance_score": topic_data.get("relevance_score", 0),
+                    "target_audience": topic_data.get("target_audience", ""),
+                    "prompt": topic_data.get("prompt", ""),
+                    "category": topic_data.get("category", ""),
+                    "status": "published"  # Set status to published when saving to database
+                }
+                for topic_data in complete_topics
+            ]
+            db_results = await async_insert_rows(
+                "topics",
+                rows,
+                returning=["id", "title", "created_at", "category", "status"]
+            )
             
             saved_topics = []
-            
-            for topic_data in topics:
-                # Only save topics with status 'complete'
-                if topic_data.get("status") != "complete":
-                    continue
-                
-                # Create a new topic record
-                query = """
-                INSERT INTO topics (
-                    title, 
-                    product_id, 
-                    brand_id, 
-                    keywords, 
-                    relevance_score, 
-                    target_audience, 
-                    prompt, 
-                    category,
-                    status
-                )
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                RETURNING id, title, created_at, category, status
-                """
-                
-                cursor.execute(query, (
-                    topic_data.get("title", ""),
-                    topic_data.get("product_id"),
-                    topic_data.get("brand_id"),
-                    json.dumps(topic_data.get("seo_keywords", [])),
-                    topic_data.get("relevance_score", 0),
-                    topic_data.get("target_audience", ""),
-                    topic_data.get("prompt", ""),
-                    topic_data.get("category", ""),
-                    "published"  # Set status to published when saving to database
-                ))
-                db_result = cursor.fetchone()
-                
+            for topic_data, db_result in zip(complete_topics, db_results):
                 # Add all data to result
                 result_topic = {
                     "id": db_result["id"],
@@ -495,10 +508,6 @@ class ContentController:
                 
                 saved_topics.append(result_topic)
             
-            conn.commit()
-            cursor.close()
-            conn.close()
-            
             return {
                 "success": True,
                 "topics": saved_topics
@@ -510,7 +519,7 @@ class ContentController:
                 "error": str(e)
             }
     
-    async def generate_content(self, topic_id=None, topic_title=None, with_related=True):
+    async def generate_content(self, topic_id=None, topic_title=None, with_related=True, fresh=False):
         """
         Generate content based on a topic.
         
@@ -518,6 +527,7 @@ class ContentController:
             topic_id (str, optional): ID of an existing topic
             topic_title (str, optional): Title of the topic to generate content for
             with_related (bool): Whether to include related content
+            fresh (bool): Bypass the LLM response cache
             
         Returns:
             dict: Generated content
@@ -527,7 +537,7 @@ class ContentController:
             
             # If topic_id is provided, fetch the topic from the database
             if topic_id and not topic:
-                topics = fetch_data("topics", f"id = '{topic_id}'")
+                topics = await async_select_rows("topics", {"id": topic_id})
                 if topics:
                     topic = topics[0].get("title", "")
             
@@ -538,28 +548,22 @@ class ContentController:
                 }
             
             # Generate content using RAG service
-            content = self.rag_service.generate_content_from_topic(
+            content = await self._run_blocking(
+                fresh,
+                self.rag_service.generate_content_from_topic,
                 topic=topic,
                 with_related=with_related
             )
             
-            # Save content to database
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Create a new content record
-            query = """
-            INSERT INTO content (title, content, topic_id)
-            VALUES (%s, %s, %s)
-            RETURNING id, title, created_at
-            """
-            
-            cursor.execute(query, (topic, content, topic_id))
-            result = cursor.fetchone()
+            # Lưu nội dung qua asyncpg để không chặn event loop
+            rows = await async_insert_rows(
+                "content",
+                [{"title": topic, "content": content, "topic_id": topic_id}],
+                returning=["id", "title", "created_at"]
+            )
+            result = rows[0]
             
-            conn.commit()
-            cursor.close()
-            conn.close()
+            bm25_upsert("content", {"id": result["id"], "title": topic, "content": content})
             
             return {
                 "success": True,
@@ -588,7 +592,7 @@ class ContentController:
             dict: List of topics
         """
         try:
-            topics = fetch_data("topics", limit=limit)
+            topics = await async_select_rows("topics", limit=limit)
             
             return {
                 "success": True,
@@ -615,11 +619,11 @@ class ContentController:
         """
         try:
             if content_id:
-                content = fetch_data("content", f"id = '{content_id}'")
+                content = await async_select_rows("content", {"id": content_id})
             elif topic_id:
-                content = fetch_data("content", f"topic_id = '{topic_id}'")
+                content = await async_select_rows("content", {"topic_id": topic_id})
             else:
-                content = fetch_data("content", limit=limit)
+                content = await async_select_rows("content", limit=limit)
             
             return {
                 "success": True,
@@ -632,7 +636,7 @@ class ContentController:
                 "error": str(e)
             }
     
-    async def generate_content_from_approved_topic(self, topic_id, with_related=True, save_to_db=True):
+    async def generate_content_from_approved_topic(self, topic_id, with_related=True, save_to_db=True, fresh=False):
         """
         Tạo nội dung cho một chủ đề cụ thể đã được duyệt sử dụng RAG.
         
@@ -640,13 +644,14 @@ class ContentController:
             topic_id (str): ID của chủ đề đã được duyệt
             with_related (bool): Có sử dụng nội dung liên quan làm ngữ cảnh hay không
             save_to_db (bool): Có lưu nội dung đã tạo vào cơ sở dữ liệu hay không
+            fresh (bool): Bỏ qua cache phản hồi LLM
             
         Returns:
             dict: Nội dung đã tạo
         """
         try:
             # Lấy thông tin chủ đề từ cơ sở dữ liệu
-            topics = fetch_data("topics", f"id = '{topic_id}'")
+            topics = await async_select_rows("topics", {"id": topic_id})
             
             if not topics:
                 return {
@@ -658,7 +663,7 @@ class ContentController:
             topic_title = topic.get("title")
             
             # Kiểm tra xem nội dung đã tồn tại cho chủ đề này chưa
-            existing_content = fetch_data("content", f"topic_id = '{topic_id}'")
+            existing_content = await async_select_rows("content", {"topic_id": topic_id})
             
             # Chuẩn bị ngữ cảnh từ nội dung hiện có (nếu có)
             existing_content_context = None
@@ -677,7 +682,7 @@ class ContentController:
                 if with_related:
                     try:
                         # Lấy nội dung liên quan cho chủ đề này
-                        retrieved_content = self.rag_service.retrieve_related_content(topic_title)
+                        retrieved_content = await self._run_blocking(fresh, self.rag_service.retrieve_related_content, topic_title)
                         if retrieved_content:
                             related_content.extend(retrieved_content)
                     except Exception as e:
@@ -694,7 +699,7 @@ class ContentController:
                         # Thêm thông tin sản phẩm nếu có
                         if topic.get("product_id"):
                             try:
-                                product_data = fetch_data("products", f"id = '{topic.get('product_id')}'")
+                                product_data = await async_select_rows("products", {"id": topic.get('product_id')}, columns=await async_get_projection("products"))
                                 if product_data:
                                     product = product_data[0]
                                     related_content.append(f"Sản phẩm: {product.get('name', '')}")
@@ -750,14 +755,8 @@ class ContentController:
             
             try:
                 # Giảm nhiệt độ để giảm sử dụng token và tăng tính ổn định
-                original_temp = self.rag_service.openai.temperature
-                self.rag_service.openai.temperature = 0.5
-                
-                try:
-                    response = self.rag_service.openai.invoke(formatted_prompt)
-                finally:
-                    # Khôi phục nhiệt độ ban đầu
-                    self.rag_service.openai.temperature = original_temp
+                # (client riêng cho temperature 0.5, không sửa client dùng chung)
+                response = await self._run_blocking(fresh, self.rag_service.chat_model(0.5).invoke, formatted_prompt)
             except Exception as e:
                 error_message = str(e)
                 print(f"Lỗi khi gọi OpenAI API: {error_message}")
@@ -829,6 +828,7 @@ class ContentController:
             #     # Vẫn tiếp tục mà không có ảnh
             
             # Tạo embedding vector cho nội dung
+            embedding_vector = None
             try:
                 # Kết hợp tất cả nội dung để tạo embedding
                 # Giới hạn độ dài văn bản để tránh lỗi token limit
@@ -852,28 +852,15 @@ class ContentController:
             
             if save_to_db:
                 # Lưu nội dung vào cơ sở dữ liệu
-                conn = get_db_connection()
-                cursor = conn.cursor()
+                record = {"title": topic_title, "content": content_json, "topic_id": topic_id}
                 
                 # Kiểm tra cấu trúc bảng content để xác định các cột hiện có
                 try:
-                    # Thử truy vấn cấu trúc bảng
-                    cursor.execute("SELECT column_name FROM information_schema.columns WHERE table_name = 'content'")
-                    columns = [col[0] for col in cursor.fetchall()]
-                    has_metadata_column = 'metadata' in columns
-                    has_embedding_column = 'embedding' in columns
-                    has_preview_image_column = 'preview_image' in columns
-                    has_seo_title_column = 'seo_title' in columns
-                    has_seo_description_column = 'seo_description' in columns
-                    has_word_count_column = 'word_count' in columns
-                    
-                    # Chuẩn bị các cột và giá trị để chèn
-                    insert_columns = ["title", "content", "topic_id"]
-                    insert_values = [topic_title, content_json, topic_id]
+                    # Lấy danh sách cột từ cache schema (không truy vấn catalog mỗi lần lưu)
+                    column_types = await async_get_column_types("content")
                     
                     # Thêm metadata nếu có cột
-                    if has_metadata_column:
-                        insert_columns.append("metadata")
+                    if "metadata" in column_types:
                         metadata = {
                             "generated_with_related": with_related,
                             "topic_status": topic.get("status", ""),
@@ -883,63 +870,37 @@ class ContentController:
                             "platforms": ["facebook", "instagram", "linkedin", "tiktok"],
                             "has_existing_content": existing_content_context is not None
                         }
-                        insert_values.append(json.dumps(metadata))
+                        # Cột json/jsonb được asyncpg tự mã hoá, cột text cần chuỗi JSON
+                        record["metadata"] = metadata if column_types["metadata"] in ("json", "jsonb") else json.dumps(metadata)
                     
                     # Thêm embedding nếu có cột và đã tạo embedding
-                    if has_embedding_column and embedding_vector is not None:
-                        insert_columns.append("embedding")
-                        # Định dạng embedding vector cho PostgreSQL
-                        # PostgreSQL yêu cầu vector được định dạng dưới dạng cụ thể
-                        # Chú ý: Sử dụng cú pháp đặc biệt của PostgreSQL cho kiểu dữ liệu vector
-                        formatted_vector = f"[{','.join(str(x) for x in embedding_vector)}]"
-                        insert_values.append(formatted_vector)
-                    
-                    # Thêm preview_image nếu có cột và đã tạo ảnh
-                    if has_preview_image_column and "preview_image" in content:
-                        insert_columns.append("preview_image")
-                        insert_values.append(content["preview_image"])
+                    if "embedding" in column_types and embedding_vector is not None:
+                        # PostgreSQL nhận vector dưới dạng chuỗi '[x,y,...]'
+                        record["embedding"] = f"[{','.join(str(x) for x in embedding_vector)}]"
                     
-                    # Thêm seo_title nếu có cột
-                    if has_seo_title_column and "seo_title" in content:
-                        insert_columns.append("seo_title")
-                        insert_values.append(content["seo_title"])
+                    # Thêm preview_image, seo_title, seo_description, word_count nếu có cột và có giá trị
+                    for column in ("preview_image", "seo_title", "seo_description", "word_count"):
+                        if column in column_types and column in content:
+                            record[column] = content[column]
                     
-                    # Thêm seo_description nếu có cột
-                    if has_seo_description_column and "seo_description" in content:
-                        insert_columns.append("seo_description")
-                        insert_values.append(content["seo_description"])
-                    
-                    # Thêm word_count nếu có cột
-                    if has_word_count_column and "word_count" in content:
-                        insert_columns.append("word_count")
-                        insert_values.append(content["word_count"])
-                    
-                    # Tạo câu lệnh SQL động
-                    columns_str = ", ".join(insert_columns)
-                    placeholders = ", ".join([f"%s" for _ in insert_values])
-                    
-                    query = f"""
-                    INSERT INTO content ({columns_str})
-                    VALUES ({placeholders})
-                    RETURNING id, title, created_at
-                    """
-                    
-                    cursor.execute(query, insert_values)
+                    rows = await async_insert_rows("content", [record], returning=["id", "title", "created_at"])
+                    embedding_saved = "embedding" in record
                 except Exception as e:
                     print(f"Lỗi khi chèn dữ liệu: {str(e)}")
                     # Nếu có lỗi, sử dụng câu lệnh đơn giản nhất
-                    query = """
-                    INSERT INTO content (title, content, topic_id)
-                    VALUES (%s, %s, %s)
-                    RETURNING id, title, created_at
-                    """
-                    
-                    cursor.execute(query, (topic_title, content_json, topic_id))
-                result = cursor.fetchone()
-                
-                conn.commit()
-                cursor.close()
-                conn.close()
+                    rows = await async_insert_rows(
+                        "content",
+                        [{"title": topic_title, "content": content_json, "topic_id": topic_id}],
+                        returning=["id", "title", "created_at"]
+                    )
+                    embedding_saved = False
+                result = rows[0] if rows else None
+                
+                # Cập nhật ANN index của content khi đã lưu embedding
+                if embedding_saved and result:
+                    ann_upsert("content", result["id"], embedding_vector)
+                if result:
+                    bm25_upsert("content", {"id": result["id"], "title": topic_title, "content": content_json})
                 
                 return {
                     "success": True,
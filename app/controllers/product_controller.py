@@ -1,49 +1,75 @@
 from fastapi import HTTPException, Depends, status
 from app.models.product import ProductCreate, ProductUpdate, Product
-from app.utils.database import get_db_connection
+from app.utils.async_database import async_db_connection, async_get_projection, async_get_table_columns
+from app.utils.database import select_list
+from app.utils.embedding_cache import text_hash
+from app.utils.product_embeddings import ProductEmbeddings
+from app.services.embedding_refresher import embedding_refresher
+from app.utils.bm25_index import bm25_upsert, bm25_remove
+from app.utils.ann_index import ann_remove
 from datetime import datetime
 import uuid
 
 class ProductController:
+    def _embedding_dirty_fields(self, columns, existing_product, product_data, params):
+        """
+        SET clauses that mark the product's embedding stale when its embedded text changes,
+        so the mark is written by the same UPDATE as the edit.
+
+        Does nothing until scripts/add_embedding_dirty_tracking.sql has been run.
+
+        Returns:
+            tuple: (SET clauses, SQL expression that is true when the text changed, or None)
+        """
+        if "embedding_dirty_at" not in columns:
+            return [], None
+
+        product = dict(existing_product)
+        product.update(product_data.model_dump(exclude_unset=True, exclude_none=True))
+        params.append(text_hash(ProductEmbeddings.build_product_text(product)))
+        stale = f"embedding_text_hash IS DISTINCT FROM ${len(params)}"
+
+        fields = [f"embedding_dirty_at = CASE WHEN {stale} THEN NOW() ELSE embedding_dirty_at END"]
+        if "embedding_attempts" in columns:
+            # Sửa sản phẩm thì cho refresher thử lại ngay
+            fields.append(f"embedding_attempts = CASE WHEN {stale} THEN 0 ELSE embedding_attempts END")
+            fields.append(f"embedding_retry_at = CASE WHEN {stale} THEN NULL ELSE embedding_retry_at END")
+        return fields, stale
+
     async def create_product(self, product_data: ProductCreate, user_id: str):
         """Create a new product for the user."""
-        conn = None
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Verify that the brand exists and belongs to the user
-            cursor.execute("SELECT * FROM brands WHERE id = %s AND user_id = %s", (product_data.brand_id, user_id))
-            brand = cursor.fetchone()
-            
-            if not brand:
-                raise HTTPException(status_code=404, detail="Brand not found or does not belong to user")
-            
-            product_id = str(uuid.uuid4())
-            now = datetime.now()
-            
-            cursor.execute(
-                """INSERT INTO products 
-                   (id, name, description, brand_id, image_url, category, price, user_id, created_at, updated_at) 
-                   VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s) 
-                   RETURNING *""", 
-                (
-                    product_id, 
-                    product_data.name, 
-                    product_data.description, 
-                    product_data.brand_id, 
-                    product_data.image_url, 
-                    product_data.category, 
-                    product_data.price, 
-                    user_id, 
-                    now, 
+            async with async_db_connection() as conn:
+                # Verify that the brand exists and belongs to the user
+                brand = await conn.fetchrow("SELECT * FROM brands WHERE id = $1 AND user_id = $2", product_data.brand_id, user_id)
+
+                if not brand:
+                    raise HTTPException(status_code=404, detail="Brand not found or does not belong to user")
+
+                product_id = str(uuid.uuid4())
+                now = datetime.now()
+
+                product = await conn.fetchrow(
+                    """INSERT INTO products
+                       (id, name, description, brand_id, image_url, category, price, user_id, created_at, updated_at)
+                       VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
+                       RETURNING *""",
+                    product_id,
+                    product_data.name,
+                    product_data.description,
+                    product_data.brand_id,
+                    product_data.image_url,
+                    product_data.category,
+                    product_data.price,
+                    user_id,
+                    now,
                     now
                 )
-            )
-            
-            product = cursor.fetchone()
-            conn.commit()
-            
+
+            # Sản phẩm mới được đánh dấu cần embedding (giá trị mặc định của cột), báo worker xử lý
+            embedding_refresher.notify()
+            bm25_upsert("products", dict(product))
+
             return {
                 "id": product["id"],
                 "name": product["name"],
@@ -56,45 +82,32 @@ class ProductController:
                 "created_at": product["created_at"],
                 "updated_at": product["updated_at"]
             }
-            
+
         except HTTPException:
             raise
         except Exception as e:
-            if conn:
-                conn.rollback()
             raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-        finally:
-            if conn:
-                conn.close()
-    
+
     async def get_products(self, user_id: str, brand_id: str = None):
         """Get all products for a user, optionally filtered by brand."""
-        conn = None
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            if brand_id:
-                cursor.execute(
-                    """SELECT p.*, b.name as brand_name 
-                       FROM products p
-                       JOIN brands b ON p.brand_id = b.id
-                       WHERE p.user_id = %s AND p.brand_id = %s 
-                       ORDER BY p.created_at DESC""", 
-                    (user_id, brand_id)
-                )
-            else:
-                cursor.execute(
-                    """SELECT p.*, b.name as brand_name 
+            query = """SELECT {columns}, b.name as brand_name
                        FROM products p
                        JOIN brands b ON p.brand_id = b.id
-                       WHERE p.user_id = %s 
-                       ORDER BY p.created_at DESC""", 
-                    (user_id,)
-                )
-                
-            products = cursor.fetchall()
-            
+                       WHERE p.user_id = $1"""
+            params = [user_id]
+
+            if brand_id:
+                params.append(brand_id)
+                query += f" AND p.brand_id = ${len(params)}"
+
+            query += " ORDER BY p.created_at DESC"
+
+            async with async_db_connection() as conn:
+                # Bỏ vector embedding khỏi danh sách cột
+                columns = await async_get_projection("products", conn=conn)
+                products = await conn.fetch(query.format(columns=select_list(columns, "p")), *params)
+
             return [
                 {
                     "id": product["id"],
@@ -111,32 +124,26 @@ class ProductController:
                 }
                 for product in products
             ]
-            
+
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-        finally:
-            if conn:
-                conn.close()
-    
+
     async def get_product(self, product_id: str, user_id: str):
         """Get a specific product by ID."""
-        conn = None
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute(
-                """SELECT p.*, b.name as brand_name 
-                   FROM products p
-                   JOIN brands b ON p.brand_id = b.id
-                   WHERE p.id = %s AND p.user_id = %s""", 
-                (product_id, user_id)
-            )
-            product = cursor.fetchone()
-            
+            async with async_db_connection() as conn:
+                columns = await async_get_projection("products", conn=conn)
+                product = await conn.fetchrow(
+                    f"""SELECT {select_list(columns, "p")}, b.name as brand_name
+                       FROM products p
+                       JOIN brands b ON p.brand_id = b.id
+                       WHERE p.id = $1 AND p.user_id = $2""",
+                    product_id, user_id
+                )
+
             if not product:
                 raise HTTPException(status_code=404, detail="Product not found")
-            
+
             return {
                 "id": product["id"],
                 "name": product["name"],
@@ -150,111 +157,109 @@ class ProductController:
                 "created_at": product["created_at"],
                 "updated_at": product["updated_at"]
             }
-            
+
         except HTTPException:
             raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-        finally:
-            if conn:
-                conn.close()
-    
+
     async def update_product(self, product_id: str, product_data: ProductUpdate, user_id: str):
         """Update a product."""
-        conn = None
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Check if product exists and belongs to user
-            cursor.execute("SELECT * FROM products WHERE id = %s AND user_id = %s", (product_id, user_id))
-            existing_product = cursor.fetchone()
-            
-            if not existing_product:
-                raise HTTPException(status_code=404, detail="Product not found")
-            
-            # If brand_id is being updated, verify that the new brand exists and belongs to the user
-            if product_data.brand_id is not None and product_data.brand_id != existing_product["brand_id"]:
-                cursor.execute("SELECT * FROM brands WHERE id = %s AND user_id = %s", (product_data.brand_id, user_id))
-                brand = cursor.fetchone()
-                
-                if not brand:
-                    raise HTTPException(status_code=404, detail="Brand not found or does not belong to user")
-            
-            # Build update query dynamically based on provided fields
-            update_fields = []
-            params = []
-            
-            if product_data.name is not None:
-                update_fields.append("name = %s")
-                params.append(product_data.name)
-                
-            if product_data.description is not None:
-                update_fields.append("description = %s")
-                params.append(product_data.description)
-                
-            if product_data.brand_id is not None:
-                update_fields.append("brand_id = %s")
-                params.append(product_data.brand_id)
-                
-            if product_data.image_url is not None:
-                update_fields.append("image_url = %s")
-                params.append(product_data.image_url)
-                
-            if product_data.category is not None:
-                update_fields.append("category = %s")
-                params.append(product_data.category)
-                
-            if product_data.price is not None:
-                update_fields.append("price = %s")
-                params.append(product_data.price)
-            
-            # Add updated_at
-            update_fields.append("updated_at = %s")
-            params.append(datetime.now())
-            
-            # Add product_id and user_id to params
-            params.append(product_id)
-            params.append(user_id)
-            
-            # Execute update if there are fields to update
-            if update_fields:
-                query = f"""
-                    UPDATE products 
-                    SET {', '.join(update_fields)}
-                    WHERE id = %s AND user_id = %s
-                    RETURNING *
-                """
-                
-                cursor.execute(query, params)
-                updated_product = cursor.fetchone()
-                conn.commit()
-                
+            async with async_db_connection() as conn:
+                # Check if product exists and belongs to user
+                existing_product = await conn.fetchrow("SELECT * FROM products WHERE id = $1 AND user_id = $2", product_id, user_id)
+
+                if not existing_product:
+                    raise HTTPException(status_code=404, detail="Product not found")
+
+                # If brand_id is being updated, verify that the new brand exists and belongs to the user
+                if product_data.brand_id is not None and product_data.brand_id != existing_product["brand_id"]:
+                    brand = await conn.fetchrow("SELECT * FROM brands WHERE id = $1 AND user_id = $2", product_data.brand_id, user_id)
+
+                    if not brand:
+                        raise HTTPException(status_code=404, detail="Brand not found or does not belong to user")
+
+                # Build update query dynamically based on provided fields
+                update_fields = []
+                params = []
+
+                if product_data.name is not None:
+                    params.append(product_data.name)
+                    update_fields.append(f"name = ${len(params)}")
+
+                if product_data.description is not None:
+                    params.append(product_data.description)
+                    update_fields.append(f"description = ${len(params)}")
+
+                if product_data.brand_id is not None:
+                    params.append(product_data.brand_id)
+                    update_fields.append(f"brand_id = ${len(params)}")
+
+                if product_data.image_url is not None:
+                    params.append(product_data.image_url)
+                    update_fields.append(f"image_url = ${len(params)}")
+
+                if product_data.category is not None:
+                    params.append(product_data.category)
+                    update_fields.append(f"category = ${len(params)}")
+
+                if product_data.price is not None:
+                    params.append(product_data.price)
+                    update_fields.append(f"price = ${len(params)}")
+
+                # Add updated_at
+                params.append(datetime.now())
+                update_fields.append(f"updated_at = ${len(params)}")
+
+                # Văn bản của sản phẩm thay đổi thì embedding cũ cần được tạo lại
+                columns = await async_get_table_columns("products", conn)
+                dirty_fields, stale = self._embedding_dirty_fields(columns, existing_product, product_data, params)
+                update_fields.extend(dirty_fields)
+
+                # Add product_id and user_id to params
+                params.append(product_id)
+                params.append(user_id)
+
+                # Execute update if there are fields to update
+                if update_fields:
+                    returning_stale = f", {stale} AS embedding_stale" if stale else ""
+                    query = f"""
+                        UPDATE products
+                        SET {', '.join(update_fields)}
+                        WHERE id = ${len(params) - 1} AND user_id = ${len(params)}
+                        RETURNING *{returning_stale}
+                    """
+
+                    updated_product = await conn.fetchrow(query, *params)
+
+                    # Get brand name
+                    brand = await conn.fetchrow("SELECT name FROM brands WHERE id = $1", updated_product["brand_id"])
+                    brand_name = brand["name"] if brand else None
+
+                    if stale and updated_product["embedding_stale"]:
+                        embedding_refresher.notify()
+                    bm25_upsert("products", dict(updated_product))
+
+                    return {
+                        "id": updated_product["id"],
+                        "name": updated_product["name"],
+                        "description": updated_product["description"],
+                        "brand_id": updated_product["brand_id"],
+                        "brand_name": brand_name,
+                        "image_url": updated_product["image_url"],
+                        "category": updated_product["category"],
+                        "price": updated_product["price"],
+                        "user_id": updated_product["user_id"],
+                        "created_at": updated_product["created_at"],
+                        "updated_at": updated_product["updated_at"]
+                    }
+
+                # If no fields to update, return existing product
                 # Get brand name
-                cursor.execute("SELECT name FROM brands WHERE id = %s", (updated_product["brand_id"],))
-                brand = cursor.fetchone()
+                brand = await conn.fetchrow("SELECT name FROM brands WHERE id = $1", existing_product["brand_id"])
                 brand_name = brand["name"] if brand else None
-                
-                return {
-                    "id": updated_product["id"],
-                    "name": updated_product["name"],
-                    "description": updated_product["description"],
-                    "brand_id": updated_product["brand_id"],
-                    "brand_name": brand_name,
-                    "image_url": updated_product["image_url"],
-                    "category": updated_product["category"],
-                    "price": updated_product["price"],
-                    "user_id": updated_product["user_id"],
-                    "created_at": updated_product["created_at"],
-                    "updated_at": updated_product["updated_at"]
-                }
-            
-            # If no fields to update, return existing product
-            # Get brand name
-            cursor.execute("SELECT name FROM brands WHERE id = %s", (existing_product["brand_id"],))
-            brand = cursor.fetchone()
-            brand_name = brand["name"] if brand else None
-            
+
             return {
                 "id": existing_product["id"],
                 "name": existing_product["name"],
@@ -268,43 +273,31 @@ class ProductController:
                 "created_at": existing_product["created_at"],
                 "updated_at": existing_product["updated_at"]
             }
-            
+
         except HTTPException:
             raise
         except Exception as e:
-            if conn:
-                conn.rollback()
             raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-        finally:
-            if conn:
-                conn.close()
-    
+
     async def delete_product(self, product_id: str, user_id: str):
         """Delete a product."""
-        conn = None
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Check if product exists and belongs to user
-            cursor.execute("SELECT * FROM products WHERE id = %s AND user_id = %s", (product_id, user_id))
-            existing_product = cursor.fetchone()
-            
-            if not existing_product:
-                raise HTTPException(status_code=404, detail="Product not found")
-            
-            # Delete product
-            cursor.execute("DELETE FROM products WHERE id = %s AND user_id = %s", (product_id, user_id))
-            conn.commit()
-            
+            async with async_db_connection() as conn:
+                async with conn.transaction():
+                    # Check if product exists and belongs to user
+                    existing_product = await conn.fetchrow("SELECT * FROM products WHERE id = $1 AND user_id = $2", product_id, user_id)
+
+                    if not existing_product:
+                        raise HTTPException(status_code=404, detail="Product not found")
+
+                    # Delete product
+                    await conn.execute("DELETE FROM products WHERE id = $1 AND user_id = $2", product_id, user_id)
+
+            bm25_remove("products", product_id)
+            ann_remove("products", product_id)
             return {"message": "Product deleted successfully"}
-            
+
         except HTTPException:
             raise
         except Exception as e:
-            if conn:
-                conn.rollback()
             raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-        finally:
-            if conn:
-                conn.close()
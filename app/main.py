@@ -1,8 +1,19 @@
+import asyncio
+
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.routes import api, embeddings, auth, google_auth, twitter, facebook
 from app.routes import brands_api, products_api, topics_api, brands_simple, products_simple
+from app.utils.database import close_connection_pool
+from app.utils.async_database import close_async_pool
+from app.utils.pagination import NEXT_CURSOR_HEADER
+from app.utils.ann_index import load_ann_indexes
+from app.utils.bm25_index import load_bm25_indexes
+from app.services.embedding_refresher import embedding_refresher
+from app.services.embedding_jobs import embedding_job_manager
+from app.services.ann_index_syncer import ann_index_syncer
+from config.settings import ANN_INDEX_ENABLED, ANN_SYNC_ENABLED, BM25_INDEX_ENABLED, EMBEDDING_REFRESH_ENABLED
 
 
 app = FastAPI(
@@ -31,6 +42,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],  # Allow all headers, or be more specific e.g., ["Content-Type", "Authorization"]
+    expose_headers=[NEXT_CURSOR_HEADER],  # Cho phép dashboard đọc cursor phân trang
 )
 
 # Include API routes
@@ -49,6 +61,37 @@ app.include_router(brands_simple.router)  # Router không yêu cầu xác thực
 app.include_router(products_simple.router)  # Router không yêu cầu xác thực
 
 
+@app.on_event("startup")
+async def startup_event():
+    # Nạp ANN index của products/content vào bộ nhớ để truy vấn vector chạy tại chỗ
+    if ANN_INDEX_ENABLED:
+        await asyncio.to_thread(load_ann_indexes)
+        # Đọc định kỳ các vector mà worker khác đã ghi hoặc xoá
+        if ANN_SYNC_ENABLED:
+            ann_index_syncer.start()
+    # Chỉ mục BM25 cho tìm kiếm theo từ khoá trên toàn bộ content
+    if BM25_INDEX_ENABLED:
+        await asyncio.to_thread(load_bm25_indexes)
+    # Worker nền tạo lại embedding cho sản phẩm đã sửa
+    if EMBEDDING_REFRESH_ENABLED:
+        embedding_refresher.start()
+    # Chạy tiếp các job embedding bị dừng giữa chừng
+    try:
+        await asyncio.to_thread(embedding_job_manager.resume_pending)
+    except Exception as e:
+        print(f"Error resuming embedding jobs: {e}")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Đóng các kết nối database trong pool khi tắt ứng dụng
+    embedding_refresher.stop()
+    ann_index_syncer.stop()
+    await asyncio.to_thread(embedding_job_manager.shutdown)
+    close_connection_pool()
+    await close_async_pool()
+
+
 @app.get("/")
 async def root():
     return {
@@ -0,0 +1 @@
+"""Repositories holding the SQL for domain tables."""
@@ -0,0 +1,83 @@
+from datetime import datetime
+
+from app.utils.database import quote_identifier
+from app.utils.async_database import record_to_dict, records_to_dicts
+
+# UPDATE ... RETURNING chạy trong CTE rồi join sang brands/products,
+# nên kiểm tra quyền sở hữu, cập nhật và lấy tên chỉ tốn một round trip.
+_UPDATE_WITH_NAMES = """
+    WITH updated AS (
+        UPDATE topics
+        SET {assignments}
+        WHERE {id_condition} AND user_id = ${user_param}
+        RETURNING *
+    )
+    SELECT updated.*, b.name AS brand_name, p.name AS product_name
+    FROM updated
+    LEFT JOIN brands b ON b.id = updated.brand_id
+    LEFT JOIN products p ON p.id = updated.product_id
+"""
+
+def _build_update(values, id_condition, id_value, user_id):
+    params = []
+    assignments = []
+    for column, value in {**values, "updated_at": datetime.now()}.items():
+        params.append(value)
+        assignments.append(f"{quote_identifier(column)} = ${len(params)}")
+
+    params.extend([id_value, user_id])
+    query = _UPDATE_WITH_NAMES.format(
+        assignments=", ".join(assignments),
+        id_condition=id_condition.format(id_param=len(params) - 1),
+        user_param=len(params)
+    )
+    return query, params
+
+class TopicRepository:
+    async def update(self, conn, topic_id: str, user_id: str, values: dict):
+        """
+        Update a topic owned by the user and return it with brand and product names.
+
+        Ownership check, update and name lookup run as one statement.
+
+        Args:
+            conn: asyncpg connection
+            topic_id (str): Topic ID
+            user_id (str): Owner of the topic
+            values (dict): Columns to set; ``updated_at`` is always refreshed
+
+        Returns:
+            dict: The updated topic with ``brand_name`` and ``product_name``,
+            or None if the topic does not exist or belongs to someone else
+        """
+        query, params = _build_update(values, "id = ${id_param}", topic_id, user_id)
+        return record_to_dict(await conn.fetchrow(query, *params))
+
+    async def update_many(self, conn, topic_ids: list, user_id: str, values: dict):
+        """
+        Apply the same update to many topics owned by the user in one set-based statement.
+
+        Returns:
+            list: Updated topics with brand and product names; ids that do not
+            exist or belong to someone else are simply absent
+        """
+        query, params = _build_update(values, "id = ANY(${id_param})", list(topic_ids), user_id)
+        return records_to_dicts(await conn.fetch(query, *params))
+
+    async def transition_status(self, conn, topic_id: str, user_id: str, status: str):
+        """
+        Move a topic owned by the user to ``status``.
+
+        Returns:
+            dict: The updated topic with brand and product names, or None if not found
+        """
+        return await self.update(conn, topic_id, user_id, {"status": status})
+
+    async def transition_status_many(self, conn, topic_ids: list, user_id: str, status: str):
+        """
+        Move many topics owned by the user to ``status`` with one UPDATE.
+
+        Returns:
+            list: The updated topics with brand and product names
+        """
+        return await self.update_many(conn, topic_ids, user_id, {"status": status})
@@ -5,7 +5,9 @@ import base64
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import JSONResponse, Response
 from app.controllers.content_controller import ContentController
-from app.utils.database import get_db_connection
+from app.utils.llm_cache import llm_cache
+from app.utils.semantic_cache import semantic_cache
+from app.utils.database import get_db_connection, has_column, invalidate_schema_cache
 from typing import Optional, List, Dict, Any
 from pydantic import BaseModel, Field
 
@@ -45,7 +47,7 @@ class TopicApprovalRequest(BaseModel):
     save_to_db: bool = True
 
 @router.post("/topics/generate")
-async def generate_topic(request: TopicRequest):
+async def generate_topic(request: TopicRequest, fresh: bool = Query(False, description="Bypass the LLM response cache")):
     """
     Generate a topic based on product information.
     
@@ -56,6 +58,7 @@ async def generate_topic(request: TopicRequest):
     - count to specify number of topics to generate (default: 1)
     - use_previous_topics to consider existing topics (default: True)
     - max_previous_topics to limit number of previous topics used (default: 5)
+    - fresh=true to regenerate instead of reusing a cached LLM response
     """
     if not request.product_id and not request.product_query:
         raise HTTPException(status_code=400, detail="Either product_id or product_query must be provided")
@@ -67,7 +70,8 @@ async def generate_topic(request: TopicRequest):
         prompt=request.prompt,
         count=request.count,
         use_previous_topics=request.use_previous_topics,
-        max_previous_topics=request.max_previous_topics
+        max_previous_topics=request.max_previous_topics,
+        fresh=fresh
     )
     
     if not result.get("success"):
@@ -75,20 +79,57 @@ async def generate_topic(request: TopicRequest):
     
     return result
 
+@router.get("/search")
+def hybrid_search(
+    q: str = Query(..., min_length=1, description="Search text"),
+    table: str = Query("products", description="products or content"),
+    limit: int = Query(5, ge=1, le=50),
+    vector_weight: Optional[float] = Query(None, ge=0),
+    lexical_weight: Optional[float] = Query(None, ge=0)
+):
+    """
+    Hybrid keyword + vector search over products or content, with per-stage timings.
+    
+    - Rankings of the BM25 and ANN indexes are fused with reciprocal rank fusion
+    - vector_weight / lexical_weight override the configured weights (0 disables a source)
+    """
+    if table not in ("products", "content"):
+        raise HTTPException(status_code=400, detail="table must be products or content")
+    
+    weights = {}
+    if vector_weight is not None:
+        weights["vector"] = vector_weight
+    if lexical_weight is not None:
+        weights["lexical"] = lexical_weight
+    
+    result = content_controller.rag_service.hybrid_search(table, q, limit, weights)
+    if result is None:
+        raise HTTPException(status_code=503, detail=f"No search index loaded for {table}")
+    return result
+
+@router.get("/llm-cache/stats")
+def get_llm_cache_stats():
+    """
+    Size and hit rate of the LLM response cache and of the semantic topic cache.
+    """
+    return {**llm_cache.stats(), "semantic_cache": semantic_cache.stats()}
+
 @router.post("/brand-product/topics")
-async def generate_brand_product_topics(request: BrandProductTopicsRequest):
+async def generate_brand_product_topics(request: BrandProductTopicsRequest, fresh: bool = Query(False, description="Bypass the LLM response cache")):
     """
     Generate multiple topics for a product from a specific brand.
     
     - Requires brand_id and product_id
     - Optionally specify the number of topics to generate (default: 3)
     - Returns JSON format with topics and SEO information
+    - fresh=true to regenerate instead of reusing a cached LLM response
     """
     result = await content_controller.generate_brand_product_topics(
         brand_id=request.brand_id,
         product_id=request.product_id,
         count=request.count,
-        save_to_db=request.save_to_db
+        save_to_db=request.save_to_db,
+        fresh=fresh
     )
     
     if not result.get("success"):
@@ -97,13 +138,14 @@ async def generate_brand_product_topics(request: BrandProductTopicsRequest):
     return result
 
 @router.post("/content/generate")
-async def generate_content(request: ContentRequest):
+async def generate_content(request: ContentRequest, fresh: bool = Query(False, description="Bypass the LLM response cache")):
     """
     Generate content based on a topic.
     
     - Use topic_id to generate content based on an existing topic
     - Or use topic_title to specify a new topic
     - Set with_related to false to disable using related content as context
+    - fresh=true to regenerate instead of reusing a cached LLM response
     """
     if not request.topic_id and not request.topic_title:
         raise HTTPException(status_code=400, detail="Either topic_id or topic_title must be provided")
@@ -111,7 +153,8 @@ async def generate_content(request: ContentRequest):
     result = await content_controller.generate_content(
         topic_id=request.topic_id,
         topic_title=request.topic_title,
-        with_related=request.with_related
+        with_related=request.with_related,
+        fresh=fresh
     )
     
     if not result.get("success"):
@@ -156,13 +199,14 @@ async def get_content(
     return result
 
 @router.post("/topics/generate-multiple")
-async def generate_multiple_topics(request: MultipleTopic):
+async def generate_multiple_topics(request: MultipleTopic, fresh: bool = Query(False, description="Bypass the LLM response cache")):
     """
     Generate multiple topics based on product and brand information.
     
     - Requires product_id and brand_id
     - Optionally specify the number of topics to generate (default: 5)
     - Returns JSON format with multiple topics and their SEO information
+    - fresh=true to regenerate instead of reusing a cached LLM response
     """
     result = await content_controller.generate_brand_product_topics(
         brand_id=request.brand_id,
@@ -171,7 +215,8 @@ async def generate_multiple_topics(request: MultipleTopic):
         save_to_db=True,
         prompt=request.prompt,
         use_previous_topics=request.use_previous_topics,
-        max_previous_topics=request.max_previous_topics
+        max_previous_topics=request.max_previous_topics,
+        fresh=fresh
     )
     
     if not result.get("success"):
@@ -204,7 +249,7 @@ class ApprovedTopicContentRequest(BaseModel):
     save_to_db: bool = Field(default=True, description="Có lưu nội dung đã tạo vào cơ sở dữ liệu hay không")
 
 @router.post("/content/generate-from-approved")
-async def generate_content_from_approved_topic(request: ApprovedTopicContentRequest):
+async def generate_content_from_approved_topic(request: ApprovedTopicContentRequest, fresh: bool = Query(False, description="Bypass the LLM response cache")):
     """
     Tạo nội dung cho một chủ đề cụ thể đã được duyệt sử dụng RAG.
     
@@ -213,12 +258,14 @@ async def generate_content_from_approved_topic(request: ApprovedTopicContentRequ
     - Tùy chọn sử dụng nội dung liên quan làm ngữ cảnh
     - Lưu nội dung đã tạo vào cơ sở dữ liệu
     - Trả về nội dung đã tạo
+    - fresh=true để tạo lại thay vì dùng kết quả LLM đã cache
     """
     try:
         result = await content_controller.generate_content_from_approved_topic(
             topic_id=request.topic_id,
             with_related=request.with_related,
-            save_to_db=request.save_to_db
+            save_to_db=request.save_to_db,
+            fresh=fresh
         )
         
         if not result.get("success"):
@@ -257,11 +304,8 @@ def view_content_image(content_id: str):
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        # Kiểm tra xem có cột preview_image không
-        cursor.execute("SELECT column_name FROM information_schema.columns WHERE table_name = 'content' AND column_name = 'preview_image'")
-        has_preview_image = cursor.fetchone() is not None
-        
-        if not has_preview_image:
+        # Kiểm tra xem có cột preview_image không (dùng cache schema)
+        if not has_column("content", "preview_image", conn):
             return JSONResponse(status_code=404, content={'error': 'Preview image column does not exist'})
         
         # Lấy dữ liệu ảnh từ cơ sở dữ liệu
@@ -271,7 +315,7 @@ def view_content_image(content_id: str):
         if not result:
             return JSONResponse(status_code=404, content={'error': 'Content not found'})
         
-        content_json, preview_image = result
+        content_json, preview_image = result["content"], result["preview_image"]
         
         if not preview_image:
             # Nếu không có preview_image, thử lấy từ trường content
@@ -336,6 +380,9 @@ def run_sql_script():
         cursor.execute(sql_script)
         conn.commit()
         
+        # Script thêm cột mới nên cần tải lại cấu trúc bảng content
+        invalidate_schema_cache("content")
+        
         return {'message': 'SQL script executed successfully'}
     
     except Exception as e:
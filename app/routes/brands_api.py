@@ -1,90 +1,88 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Response
 from app.controllers.auth_controller import AuthController
-from app.utils.database import get_db_connection
-from typing import List, Dict, Any
+from app.utils.async_database import get_db_session, async_get_projection
+from app.utils.database import select_list
+from app.utils.fields import fields_query, pick_fields
+from app.utils.pagination import PageParams, NEXT_CURSOR_HEADER, keyset_condition, keyset_order, keyset_limit, split_page
+from typing import List, Dict, Any, Optional
 
 router = APIRouter(prefix="/api/brands", tags=["brands"])
 auth_controller = AuthController()
 
 @router.get("/", response_model=List[Dict[str, Any]])
-async def get_user_brands(current_user = Depends(auth_controller.get_current_user)):
+async def get_user_brands(response: Response, page: PageParams = Depends(), fields: Optional[set] = Depends(fields_query), current_user = Depends(auth_controller.get_current_user), conn = Depends(get_db_session)):
     """
-    Get all brands for the authenticated user.
+    Get the brands of the authenticated user, newest first.
+
+    Results are paginated; the cursor for the next page is returned in the X-Next-Cursor header.
+    Pass ``fields`` (e.g. ``id,name``) to receive only those fields.
     """
-    conn = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        # Lấy brands của user theo từng trang, không kéo vector embedding (nếu có)
+        columns = await async_get_projection("brands", fields, required=("id", "created_at"), conn=conn)
+        query = f"SELECT {select_list(columns, 'b')} FROM brands b WHERE b.user_id = $1"
+        params = [current_user["id"]]
         
-        # Lấy tất cả brands của user
-        cursor.execute(
-            """SELECT * FROM brands 
-               WHERE user_id = %s 
-               ORDER BY created_at DESC""", 
-            (current_user["id"],)
-        )
+        if page.cursor:
+            query += " AND " + keyset_condition("b", page.cursor, params)
         
-        brands = cursor.fetchall()
+        query += keyset_order("b")
+        query += keyset_limit(page.limit, params)
+        
+        brands, next_cursor = split_page(await conn.fetch(query, *params), page.limit)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
         
         return [
-            {
-                "id": brand["id"],
-                "name": brand["name"],
-                "description": brand["description"],
-                "logo_url": brand["logo_url"],
-                "website": brand["website"],
-                "industry": brand["industry"],
-                "created_at": brand["created_at"],
-                "updated_at": brand["updated_at"],
-                "user_id": brand["user_id"]
-            }
+            pick_fields({
+                "id": brand.get("id"),
+                "name": brand.get("name"),
+                "description": brand.get("description"),
+                "logo_url": brand.get("logo_url"),
+                "website": brand.get("website"),
+                "industry": brand.get("industry"),
+                "created_at": brand.get("created_at"),
+                "updated_at": brand.get("updated_at"),
+                "user_id": brand.get("user_id")
+            }, fields)
             for brand in brands
         ]
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-    finally:
-        if conn:
-            conn.close()
 
 @router.get("/{brand_id}", response_model=Dict[str, Any])
-async def get_brand_detail(brand_id: str, current_user = Depends(auth_controller.get_current_user)):
+async def get_brand_detail(brand_id: str, fields: Optional[set] = Depends(fields_query), current_user = Depends(auth_controller.get_current_user), conn = Depends(get_db_session)):
     """
-    Get detail of a specific brand.
+    Get detail of a specific brand. Pass ``fields`` to receive only those fields.
     """
-    conn = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         # Lấy thông tin brand
-        cursor.execute(
-            """SELECT * FROM brands 
-               WHERE id = %s AND user_id = %s""", 
-            (brand_id, current_user["id"])
+        columns = await async_get_projection("brands", fields, conn=conn)
+        brand = await conn.fetchrow(
+            f"""SELECT {select_list(columns)} FROM brands 
+               WHERE id = $1 AND user_id = $2""", 
+            brand_id, current_user["id"]
         )
         
-        brand = cursor.fetchone()
-        
         if not brand:
             raise HTTPException(status_code=404, detail="Brand not found")
         
-        return {
-            "id": brand["id"],
-            "name": brand["name"],
-            "description": brand["description"],
-            "logo_url": brand["logo_url"],
-            "website": brand["website"],
-            "industry": brand["industry"],
-            "created_at": brand["created_at"],
-            "updated_at": brand["updated_at"],
-            "user_id": brand["user_id"]
-        }
+        return pick_fields({
+            "id": brand.get("id"),
+            "name": brand.get("name"),
+            "description": brand.get("description"),
+            "logo_url": brand.get("logo_url"),
+            "website": brand.get("website"),
+            "industry": brand.get("industry"),
+            "created_at": brand.get("created_at"),
+            "updated_at": brand.get("updated_at"),
+            "user_id": brand.get("user_id")
+        }, fields)
         
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-    finally:
-        if conn:
-            conn.close()
@@ -1,87 +1,74 @@
-from fastapi import APIRouter, HTTPException
-from app.utils.database import get_db_connection
-from typing import List, Dict, Any
+from fastapi import APIRouter, Depends, HTTPException
+from app.utils.async_database import async_db_connection, async_get_projection
+from app.utils.database import select_list
+from app.utils.fields import fields_query, pick_fields
+from typing import List, Dict, Any, Optional
 
 router = APIRouter(prefix="/api/brands-simple", tags=["brands-simple"])
 
 @router.get("/", response_model=List[Dict[str, Any]])
-async def get_all_brands():
+async def get_all_brands(fields: Optional[set] = Depends(fields_query)):
     """
-    Get all brands without authentication.
+    Get all brands without authentication. Pass ``fields`` to receive only those fields.
     """
-    conn = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         # Lấy tất cả brands
-        cursor.execute(
-            """SELECT * FROM brands 
-               ORDER BY created_at DESC"""
-        )
-        
-        brands = cursor.fetchall()
+        async with async_db_connection() as conn:
+            columns = await async_get_projection("brands", fields, conn=conn)
+            brands = await conn.fetch(
+                f"""SELECT {select_list(columns)} FROM brands 
+                   ORDER BY created_at DESC"""
+            )
         
         if not brands:
             # Nếu không có brands, trả về danh sách rỗng
             return []
         
         return [
-            {
-                "id": brand["id"],
-                "name": brand["name"],
-                "description": brand["description"],
-                "logo_url": brand["logo_url"],
-                "website": brand["website"],
-                "industry": brand["industry"],
-                "created_at": brand["created_at"],
-                "updated_at": brand["updated_at"],
-                "user_id": brand["user_id"]
-            }
+            pick_fields({
+                "id": brand.get("id"),
+                "name": brand.get("name"),
+                "description": brand.get("description"),
+                "logo_url": brand.get("logo_url"),
+                "website": brand.get("website"),
+                "industry": brand.get("industry"),
+                "created_at": brand.get("created_at"),
+                "updated_at": brand.get("updated_at"),
+                "user_id": brand.get("user_id")
+            }, fields)
             for brand in brands
         ]
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-    finally:
-        if conn:
-            conn.close()
 
 @router.get("/check", response_model=Dict[str, Any])
 async def check_brands_table():
     """
     Check if brands table exists and return its structure.
     """
-    conn = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Kiểm tra bảng brands có tồn tại không
-        cursor.execute(
-            """SELECT EXISTS (
-                SELECT FROM information_schema.tables 
-                WHERE table_name = 'brands'
-            )"""
-        )
-        
-        table_exists = cursor.fetchone()["exists"]
-        
-        if not table_exists:
-            return {"exists": False, "message": "Brands table does not exist"}
-        
-        # Lấy cấu trúc bảng brands
-        cursor.execute(
-            """SELECT column_name, data_type 
-               FROM information_schema.columns 
-               WHERE table_name = 'brands'"""
-        )
-        
-        columns = cursor.fetchall()
-        
-        # Đếm số lượng brands
-        cursor.execute("SELECT COUNT(*) FROM brands")
-        count = cursor.fetchone()["count"]
+        async with async_db_connection() as conn:
+            # Kiểm tra bảng brands có tồn tại không
+            table_exists = await conn.fetchval(
+                """SELECT EXISTS (
+                    SELECT FROM information_schema.tables 
+                    WHERE table_name = 'brands'
+                )"""
+            )
+            
+            if not table_exists:
+                return {"exists": False, "message": "Brands table does not exist"}
+            
+            # Lấy cấu trúc bảng brands
+            columns = await conn.fetch(
+                """SELECT column_name, data_type 
+                   FROM information_schema.columns 
+                   WHERE table_name = 'brands'"""
+            )
+            
+            # Đếm số lượng brands
+            count = await conn.fetchval("SELECT COUNT(*) FROM brands")
         
         return {
             "exists": True,
@@ -94,6 +81,3 @@ async def check_brands_table():
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-    finally:
-        if conn:
-            conn.close()
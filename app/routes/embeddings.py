@@ -1,10 +1,28 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
 from typing import Optional
 from app.utils.product_embeddings import ProductEmbeddings
+from app.utils.embedding_cache import embedding_cache
+from app.utils.query_cache import query_cache
+from app.utils.ann_index import ann_indexes
+from app.services.embedding_refresher import embedding_refresher
+from app.services.ann_index_syncer import ann_index_syncer
+from app.services.embedding_jobs import embedding_job_manager, JobQueueFullError
 
 router = APIRouter(prefix="/api/embeddings", tags=["embeddings"])
 product_embeddings = ProductEmbeddings()
 
+@router.post("/products/refresh")
+async def refresh_dirty_product_embeddings():
+    """
+    Wake the background worker that re-embeds products changed since their last embedding.
+    
+    Returns:
+        dict: Worker status
+    """
+    embedding_refresher.notify()
+    return {"message": "Refresh scheduled", **embedding_refresher.stats()}
+
 @router.post("/products/{product_id}")
 async def generate_product_embedding(product_id: str):
     """
@@ -16,7 +34,7 @@ async def generate_product_embedding(product_id: str):
     Returns:
         dict: Result of the operation
     """
-    result = product_embeddings.generate_product_embedding(product_id)
+    result = await run_in_threadpool(product_embeddings.generate_product_embedding, product_id)
     
     if not result.get("success"):
         raise HTTPException(status_code=500, detail=result.get("error"))
@@ -24,16 +42,116 @@ async def generate_product_embedding(product_id: str):
     return result
 
 @router.post("/products")
-async def generate_all_product_embeddings():
+async def generate_all_product_embeddings(
+    response: Response,
+    batch_size: Optional[int] = Query(None, ge=1, le=2048, description="Products embedded per API call"),
+    wait: bool = Query(False, description="Run inside the request instead of as a background job")
+):
     """
     Generate and store embeddings for all products without embeddings.
     
+    By default this starts a background job and returns its id right away (202);
+    follow it with GET /api/embeddings/jobs/{job_id}. ``wait=true`` keeps the old
+    behaviour of running the whole backfill inside the request.
+    
+    Args:
+        batch_size (int, optional): Products embedded per API call, defaults to EMBEDDING_BATCH_SIZE
+        wait (bool): Run synchronously
+        
     Returns:
-        dict: Result of the operation
+        dict: The queued job, or the result of the backfill with wait=true
     """
-    result = product_embeddings.generate_all_product_embeddings()
+    if not wait:
+        try:
+            job = await run_in_threadpool(
+                embedding_job_manager.submit, "product_backfill", {"batch_size": batch_size} if batch_size else None
+            )
+        except JobQueueFullError as e:
+            raise HTTPException(status_code=429, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        response.status_code = 202
+        return job
+    
+    # psycopg2 và API embedding chạy đồng bộ: đưa sang threadpool để không chặn event loop
+    if batch_size:
+        result = await run_in_threadpool(product_embeddings.generate_all_product_embeddings, batch_size=batch_size)
+    else:
+        result = await run_in_threadpool(product_embeddings.generate_all_product_embeddings)
     
     if not result.get("success"):
         raise HTTPException(status_code=500, detail=result.get("error"))
     
-    return result 
\ No newline at end of file
+    return result 
+
+@router.get("/jobs")
+def list_embedding_jobs(limit: int = Query(20, ge=1, le=100)):
+    """
+    List the most recent embedding jobs.
+    
+    Returns:
+        list: Jobs with their status and progress, newest first
+    """
+    try:
+        return embedding_job_manager.list(limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+@router.get("/jobs/{job_id}")
+def get_embedding_job(job_id: str):
+    """
+    Status, progress, throughput and recent failures of an embedding job.
+    
+    Args:
+        job_id (str): ID returned when the job was submitted
+        
+    Returns:
+        dict: The job
+    """
+    try:
+        job = embedding_job_manager.get(job_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.post("/jobs/{job_id}/cancel")
+def cancel_embedding_job(job_id: str):
+    """
+    Stop an embedding job after its current batch. Batches already committed are kept.
+    
+    Args:
+        job_id (str): ID of the job to cancel
+        
+    Returns:
+        dict: The job
+    """
+    try:
+        job = embedding_job_manager.cancel(job_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/cache/stats")
+async def get_embedding_cache_stats():
+    """
+    Hit/miss counters of the embedding cache and of the search query cache.
+    
+    Returns:
+        dict: Cache size and counters
+    """
+    return {**embedding_cache.stats(), "query_cache": query_cache.stats()}
+
+
+@router.get("/index/stats")
+async def get_ann_index_stats():
+    """
+    Size and settings of the loaded in-process ANN indexes, and the state of their cross-worker sync.
+    
+    Returns:
+        dict: Stats per table
+    """
+    return {**{table_name: index.stats() for table_name, index in ann_indexes.items()}, "sync": ann_index_syncer.stats()}
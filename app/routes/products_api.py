@@ -1,6 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from app.controllers.auth_controller import AuthController
-from app.utils.database import get_db_connection
+from app.utils.async_database import get_db_session, async_get_projection
+from app.utils.database import select_list
+from app.utils.fields import fields_query, pick_fields
 from typing import List, Dict, Any, Optional
 
 router = APIRouter(prefix="/api/products", tags=["products"])
@@ -9,103 +11,94 @@ auth_controller = AuthController()
 @router.get("/", response_model=List[Dict[str, Any]])
 async def get_user_products(
     brand_id: Optional[str] = Query(None, description="Filter products by brand ID"),
-    current_user = Depends(auth_controller.get_current_user)
+    fields: Optional[set] = Depends(fields_query),
+    current_user = Depends(auth_controller.get_current_user),
+    conn = Depends(get_db_session)
 ):
     """
     Get all products for the authenticated user, optionally filtered by brand.
+
+    Pass ``fields`` (e.g. ``id,name,price``) to receive only those fields.
     """
-    conn = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        # Chỉ lấy các cột cần thiết, không kéo vector embedding qua mạng
+        columns = await async_get_projection("products", fields, conn=conn)
         
         # Xây dựng query dựa trên filter
-        query = """
-            SELECT p.*, b.name as brand_name 
+        query = f"""
+            SELECT {select_list(columns, "p")}, b.name as brand_name 
             FROM products p
             JOIN brands b ON p.brand_id = b.id
-            WHERE p.user_id = %s
+            WHERE p.user_id = $1
         """
         params = [current_user["id"]]
         
         if brand_id:
-            query += " AND p.brand_id = %s"
             params.append(brand_id)
+            query += f" AND p.brand_id = ${len(params)}"
             
         query += " ORDER BY p.created_at DESC"
         
-        cursor.execute(query, params)
-        products = cursor.fetchall()
+        products = await conn.fetch(query, *params)
         
         return [
-            {
-                "id": product["id"],
-                "name": product["name"],
-                "description": product["description"],
-                "brand_id": product["brand_id"],
-                "brand_name": product["brand_name"],
-                "price": product["price"],
-                "image_url": product["image_url"],
-                "features": product["features"],
-                "category": product["category"],
-                "tags": product["tags"],
-                "is_active": product["is_active"],
-                "created_at": product["created_at"],
-                "updated_at": product["updated_at"]
-            }
+            pick_fields({
+                "id": product.get("id"),
+                "name": product.get("name"),
+                "description": product.get("description"),
+                "brand_id": product.get("brand_id"),
+                "brand_name": product.get("brand_name"),
+                "price": product.get("price"),
+                "image_url": product.get("image_url"),
+                "features": product.get("features"),
+                "category": product.get("category"),
+                "tags": product.get("tags"),
+                "is_active": product.get("is_active"),
+                "created_at": product.get("created_at"),
+                "updated_at": product.get("updated_at")
+            }, fields)
             for product in products
         ]
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-    finally:
-        if conn:
-            conn.close()
 
 @router.get("/{product_id}", response_model=Dict[str, Any])
-async def get_product_detail(product_id: str, current_user = Depends(auth_controller.get_current_user)):
+async def get_product_detail(product_id: str, fields: Optional[set] = Depends(fields_query), current_user = Depends(auth_controller.get_current_user), conn = Depends(get_db_session)):
     """
-    Get detail of a specific product.
+    Get detail of a specific product. Pass ``fields`` to receive only those fields.
     """
-    conn = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Lấy thông tin product
-        cursor.execute(
-            """SELECT p.*, b.name as brand_name 
+        # Lấy thông tin product (không gồm vector embedding)
+        columns = await async_get_projection("products", fields, conn=conn)
+        product = await conn.fetchrow(
+            f"""SELECT {select_list(columns, "p")}, b.name as brand_name 
                FROM products p
                JOIN brands b ON p.brand_id = b.id
-               WHERE p.id = %s AND p.user_id = %s""", 
-            (product_id, current_user["id"])
+               WHERE p.id = $1 AND p.user_id = $2""", 
+            product_id, current_user["id"]
         )
         
-        product = cursor.fetchone()
-        
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
         
-        return {
-            "id": product["id"],
-            "name": product["name"],
-            "description": product["description"],
-            "brand_id": product["brand_id"],
-            "brand_name": product["brand_name"],
-            "price": product["price"],
-            "image_url": product["image_url"],
-            "features": product["features"],
-            "category": product["category"],
-            "tags": product["tags"],
-            "is_active": product["is_active"],
-            "created_at": product["created_at"],
-            "updated_at": product["updated_at"]
-        }
+        return pick_fields({
+            "id": product.get("id"),
+            "name": product.get("name"),
+            "description": product.get("description"),
+            "brand_id": product.get("brand_id"),
+            "brand_name": product.get("brand_name"),
+            "price": product.get("price"),
+            "image_url": product.get("image_url"),
+            "features": product.get("features"),
+            "category": product.get("category"),
+            "tags": product.get("tags"),
+            "is_active": product.get("is_active"),
+            "created_at": product.get("created_at"),
+            "updated_at": product.get("updated_at")
+        }, fields)
         
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-    finally:
-        if conn:
-            conn.close()
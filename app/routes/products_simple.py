@@ -1,46 +1,67 @@
-from fastapi import APIRouter, HTTPException, Query
-from app.utils.database import get_db_connection
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from app.utils.async_database import async_db_connection, async_get_projection
+from app.utils.database import select_list
+from app.utils.fields import fields_query, pick_fields
+from app.utils.pagination import PageParams, NEXT_CURSOR_HEADER, keyset_condition, keyset_order, keyset_limit, split_page
 from typing import List, Dict, Any, Optional
 
 router = APIRouter(prefix="/api/products-simple", tags=["products-simple"])
 
 @router.get("/", response_model=List[Dict[str, Any]])
-async def get_all_products(brand_id: Optional[str] = Query(None, description="Filter products by brand ID")):
+async def get_all_products(
+    response: Response,
+    brand_id: Optional[str] = Query(None, description="Filter products by brand ID"),
+    page: PageParams = Depends(),
+    fields: Optional[set] = Depends(fields_query)
+):
     """
-    Get all products without authentication, optionally filtered by brand.
+    Get products without authentication, newest first, optionally filtered by brand.
+
+    Results are paginated; the cursor for the next page is returned in the X-Next-Cursor header.
+    Pass ``fields`` (e.g. ``id,name,price``) to receive only those fields.
     """
-    conn = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         # Xây dựng query dựa trên filter
         query = """
-            SELECT p.*, b.name as brand_name 
+            SELECT {columns}, b.name as brand_name 
             FROM products p
             LEFT JOIN brands b ON p.brand_id = b.id
         """
         params = []
+        conditions = []
         
         if brand_id:
-            query += " WHERE p.brand_id = %s"
             params.append(brand_id)
+            conditions.append(f"p.brand_id = ${len(params)}")
+        
+        if page.cursor:
+            conditions.append(keyset_condition("p", page.cursor, params))
+        
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
             
-        query += " ORDER BY p.created_at DESC"
+        query += keyset_order("p")
+        query += keyset_limit(page.limit, params)
         
-        cursor.execute(query, params)
-        products = cursor.fetchall()
+        async with async_db_connection() as conn:
+            # Chỉ lấy các cột cần thiết, không kéo vector embedding qua mạng
+            columns = await async_get_projection("products", fields, required=("id", "created_at"), conn=conn)
+            products = await conn.fetch(query.format(columns=select_list(columns, "p")), *params)
+        
+        products, next_cursor = split_page(products, page.limit)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
         
         if not products:
             # Nếu không có products, trả về danh sách rỗng
             return []
         
         return [
-            {
-                "id": product["id"],
-                "name": product["name"],
-                "description": product["description"],
-                "brand_id": product["brand_id"],
+            pick_fields({
+                "id": product.get("id"),
+                "name": product.get("name"),
+                "description": product.get("description"),
+                "brand_id": product.get("brand_id"),
                 "brand_name": product.get("brand_name"),
                 "price": product.get("price"),
                 "image_url": product.get("image_url"),
@@ -48,53 +69,44 @@ async def get_all_products(brand_id: Optional[str] = Query(None, description="Fi
                 "category": product.get("category"),
                 "tags": product.get("tags"),
                 "is_active": product.get("is_active", True),
-                "created_at": product["created_at"],
-                "updated_at": product["updated_at"]
-            }
+                "created_at": product.get("created_at"),
+                "updated_at": product.get("updated_at")
+            }, fields)
             for product in products
         ]
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-    finally:
-        if conn:
-            conn.close()
 
 @router.get("/check", response_model=Dict[str, Any])
 async def check_products_table():
     """
     Check if products table exists and return its structure.
     """
-    conn = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Kiểm tra bảng products có tồn tại không
-        cursor.execute(
-            """SELECT EXISTS (
-                SELECT FROM information_schema.tables 
-                WHERE table_name = 'products'
-            )"""
-        )
-        
-        table_exists = cursor.fetchone()["exists"]
-        
-        if not table_exists:
-            return {"exists": False, "message": "Products table does not exist"}
-        
-        # Lấy cấu trúc bảng products
-        cursor.execute(
-            """SELECT column_name, data_type 
-               FROM information_schema.columns 
-               WHERE table_name = 'products'"""
-        )
-        
-        columns = cursor.fetchall()
-        
-        # Đếm số lượng products
-        cursor.execute("SELECT COUNT(*) FROM products")
-        count = cursor.fetchone()["count"]
+        async with async_db_connection() as conn:
+            # Kiểm tra bảng products có tồn tại không
+            table_exists = await conn.fetchval(
+                """SELECT EXISTS (
+                    SELECT FROM information_schema.tables 
+                    WHERE table_name = 'products'
+                )"""
+            )
+            
+            if not table_exists:
+                return {"exists": False, "message": "Products table does not exist"}
+            
+            # Lấy cấu trúc bảng products
+            columns = await conn.fetch(
+                """SELECT column_name, data_type 
+                   FROM information_schema.columns 
+                   WHERE table_name = 'products'"""
+            )
+            
+            # Đếm số lượng products
+            count = await conn.fetchval("SELECT COUNT(*) FROM products")
         
         return {
             "exists": True,
@@ -107,6 +119,3 @@ async def check_products_table():
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-    finally:
-        if conn:
-            conn.close()
@@ -1,8 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from fastapi.concurrency import run_in_threadpool
 from app.controllers.auth_controller import AuthController
-from app.utils.database import get_db_connection
+from app.utils.async_database import get_db_session, async_db_connection, async_insert_rows
 from app.services.rag_service import RAGService
-from typing import List, Dict, Any, Optional
+from app.utils.llm_cache import fresh_responses
+from app.repositories.topic_repository import TopicRepository
+from app.utils.pagination import PageParams, NEXT_CURSOR_HEADER, keyset_condition, keyset_order, keyset_limit, split_page
+from typing import List, Dict, Any, Literal, Optional
 from datetime import datetime
 import uuid
 from pydantic import BaseModel, Field
@@ -10,6 +14,7 @@ from pydantic import BaseModel, Field
 router = APIRouter(prefix="/api/topics", tags=["topics"])
 auth_controller = AuthController()
 rag_service = RAGService()
+topic_repository = TopicRepository()
 
 class PendingTopicData(BaseModel):
     title: str
@@ -24,8 +29,12 @@ class PendingTopicData(BaseModel):
     prompt: Optional[str] = None
     status: Optional[str] = 'approved'
 
+class BulkTopicStatusRequest(BaseModel):
+    topic_ids: List[str] = Field(..., min_length=1, max_length=500)
+    status: Literal['approved', 'rejected']
+
 @router.post("/approve_pending", response_model=Dict[str, Any])
-async def approve_pending_topic(topic_data: PendingTopicData, current_user = Depends(auth_controller.get_current_user)):
+async def approve_pending_topic(topic_data: PendingTopicData, current_user = Depends(auth_controller.get_current_user), conn = Depends(get_db_session)):
     print(f"Received pending topic data for approval: {topic_data.model_dump_json()}")
     
     # Process brand_id
@@ -44,28 +53,17 @@ async def approve_pending_topic(topic_data: PendingTopicData, current_user = Dep
             # If it's a numeric ID, we'll handle it differently
             if topic_data.product_id.isdigit():
                 # For numeric IDs, we need to look up the corresponding UUID in the database
-                product_conn = None
                 try:
-                    product_conn = get_db_connection()
-                    product_cursor = product_conn.cursor()
                     # Try to find a product with this numeric ID or name
-                    product_cursor.execute("SELECT id FROM products WHERE name = %s OR id::text = %s", 
-                                  (topic_data.product_id, topic_data.product_id))
-                    product = product_cursor.fetchone()
+                    product = await conn.fetchrow("SELECT id FROM products WHERE name = $1 OR id::text = $2", 
+                                  topic_data.product_id, topic_data.product_id)
                     if product:
                         product_id = product["id"]
                 except Exception as e:
                     print(f"Error looking up product: {e}")
-                finally:
-                    if product_conn:
-                        product_conn.close()
     
     # Now insert the topic with a new connection
-    conn = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
         new_topic_id = uuid.uuid4()
         now = datetime.now()
         user_id = current_user["id"]
@@ -78,12 +76,12 @@ async def approve_pending_topic(topic_data: PendingTopicData, current_user = Dep
             
             print(f"Inserting topic with ID: {topic_id_str}, brand_id: {brand_id_str}, product_id: {product_id_str}")
             
-            cursor.execute(
-                """INSERT INTO topics 
-                   (id, title, description, brand_id, product_id, user_id, prompt, status, target_audience, keywords, created_at, updated_at)
-                   VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                   RETURNING *""",
-                (
+            async with conn.transaction():
+                inserted_topic = await conn.fetchrow(
+                    """INSERT INTO topics 
+                       (id, title, description, brand_id, product_id, user_id, prompt, status, target_audience, keywords, created_at, updated_at)
+                       VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12)
+                       RETURNING *""",
                     topic_id_str,
                     topic_data.title,
                     topic_data.description,
@@ -97,29 +95,21 @@ async def approve_pending_topic(topic_data: PendingTopicData, current_user = Dep
                     now,
                     now
                 )
-            )
-            
-            inserted_topic = cursor.fetchone()
-            if not inserted_topic:
-                conn.rollback()
-                raise HTTPException(status_code=500, detail="Failed to save and approve pending topic")
-
-            # Get brand name
-            brand_name = None
-            if inserted_topic["brand_id"]:
-                cursor.execute("SELECT name FROM brands WHERE id = %s", (inserted_topic["brand_id"],))
-                brand = cursor.fetchone()
-                brand_name = brand["name"] if brand else None
-            
-            # Get product name
-            product_name = None
-            if inserted_topic["product_id"]:
-                cursor.execute("SELECT name FROM products WHERE id = %s", (inserted_topic["product_id"],))
-                product = cursor.fetchone()
-                product_name = product["name"] if product else None
+                
+                if not inserted_topic:
+                    raise HTTPException(status_code=500, detail="Failed to save and approve pending topic")
 
-            # Commit the transaction
-            conn.commit()
+                # Get brand name
+                brand_name = None
+                if inserted_topic["brand_id"]:
+                    brand = await conn.fetchrow("SELECT name FROM brands WHERE id = $1", inserted_topic["brand_id"])
+                    brand_name = brand["name"] if brand else None
+                
+                # Get product name
+                product_name = None
+                if inserted_topic["product_id"]:
+                    product = await conn.fetchrow("SELECT name FROM products WHERE id = $1", inserted_topic["product_id"])
+                    product_name = product["name"] if product else None
 
             # Return the response
             return {
@@ -140,7 +130,6 @@ async def approve_pending_topic(topic_data: PendingTopicData, current_user = Dep
                 "updated_at": inserted_topic["updated_at"].isoformat()
             }
         except Exception as inner_e:
-            conn.rollback()
             print(f"Inner exception in approve_pending_topic: {str(inner_e)}")
             raise inner_e
 
@@ -150,54 +139,53 @@ async def approve_pending_topic(topic_data: PendingTopicData, current_user = Dep
     except Exception as e:
         print(f"Error in approve_pending_topic: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-    finally:
-        if conn:
-            try:
-                conn.close()
-            except Exception as close_e:
-                print(f"Error closing connection: {str(close_e)}")
-                pass
 
 @router.get("/", response_model=List[Dict[str, Any]])
 async def get_user_topics(
+    response: Response,
     status: Optional[str] = Query(None, description="Filter topics by status (pending, approved, rejected, completed)"),
     brand_id: Optional[str] = Query(None, description="Filter topics by brand ID"),
     product_id: Optional[str] = Query(None, description="Filter topics by product ID"),
-    current_user = Depends(auth_controller.get_current_user)
+    page: PageParams = Depends(),
+    current_user = Depends(auth_controller.get_current_user),
+    conn = Depends(get_db_session)
 ):
     """
-    Get all topics for the authenticated user, optionally filtered by status, brand, or product.
+    Get the topics of the authenticated user, newest first, optionally filtered by status, brand, or product.
+
+    Results are paginated; the cursor for the next page is returned in the X-Next-Cursor header.
     """
-    conn = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         query = """
             SELECT t.*, b.name as brand_name, p.name as product_name 
             FROM topics t
             LEFT JOIN brands b ON t.brand_id = b.id
             LEFT JOIN products p ON t.product_id = p.id
-            WHERE t.user_id = %s
+            WHERE t.user_id = $1
         """
         params = [current_user["id"]]
         
         if status:
-            query += " AND t.status = %s"
             params.append(status)
+            query += f" AND t.status = ${len(params)}"
             
         if brand_id:
-            query += " AND t.brand_id = %s"
             params.append(brand_id)
+            query += f" AND t.brand_id = ${len(params)}"
             
         if product_id:
-            query += " AND t.product_id = %s"
             params.append(product_id)
+            query += f" AND t.product_id = ${len(params)}"
+        
+        if page.cursor:
+            query += " AND " + keyset_condition("t", page.cursor, params)
             
-        query += " ORDER BY t.created_at DESC"
+        query += keyset_order("t")
+        query += keyset_limit(page.limit, params)
         
-        cursor.execute(query, params)
-        topics = cursor.fetchall()
+        topics, next_cursor = split_page(await conn.fetch(query, *params), page.limit)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
         
         return [
             {
@@ -221,11 +209,10 @@ async def get_user_topics(
             for topic in topics
         ]
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-    finally:
-        if conn:
-            conn.close()
 
 @router.post("/generate", response_model=Dict[str, Any])
 async def generate_topics(
@@ -233,38 +220,36 @@ async def generate_topics(
     product_id: Optional[str] = Query(None, description="Product ID to generate topics for"),
     prompt: str = Query(..., description="Prompt for topic generation"),
     count: int = Query(5, description="Number of topics to generate"),
-    current_user = Depends(auth_controller.get_current_user)
+    fresh: bool = Query(False, description="Bypass the LLM response cache"),
+    current_user = Depends(auth_controller.get_current_user_unpinned)
 ):
     """
     Generate topics using RAG service.
+    
+    No database connection is held during the LLM call: the reads and the insert each
+    take one from the pool briefly, and the synchronous generation runs in a worker thread.
     """
-    conn = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT * FROM brands WHERE id = %s AND user_id = %s", (brand_id, current_user["id"]))
-        brand = cursor.fetchone()
-        
-        if not brand:
-            raise HTTPException(status_code=404, detail="Brand not found or does not belong to user")
-        
-        product = None
-        if product_id:
-            cursor.execute("SELECT * FROM products WHERE id = %s AND user_id = %s", (product_id, current_user["id"]))
-            product = cursor.fetchone()
+        async with async_db_connection() as conn:
+            brand = await conn.fetchrow("SELECT * FROM brands WHERE id = $1 AND user_id = $2", brand_id, current_user["id"])
             
-            if not product:
-                raise HTTPException(status_code=404, detail="Product not found or does not belong to user")
-        
-        cursor.execute(
-            """SELECT * FROM topics 
-               WHERE user_id = %s AND status = 'approved' 
-               ORDER BY created_at DESC 
-               LIMIT 5""", 
-            (current_user["id"],)
-        )
-        previous_topics = cursor.fetchall()
+            if not brand:
+                raise HTTPException(status_code=404, detail="Brand not found or does not belong to user")
+            
+            product = None
+            if product_id:
+                product = await conn.fetchrow("SELECT * FROM products WHERE id = $1 AND user_id = $2", product_id, current_user["id"])
+                
+                if not product:
+                    raise HTTPException(status_code=404, detail="Product not found or does not belong to user")
+            
+            previous_topics = await conn.fetch(
+                """SELECT * FROM topics 
+                   WHERE user_id = $1 AND status = 'approved' 
+                   ORDER BY created_at DESC 
+                   LIMIT 5""", 
+                current_user["id"]
+            )
         
         brand_info = f"Brand: {brand['name']}\nDescription: {brand['description']}\nIndustry: {brand['industry']}"
         
@@ -272,53 +257,48 @@ async def generate_topics(
         if product:
             product_context = f"Product: {product['name']}\nDescription: {product['description']}\nCategory: {product['category']}\nFeatures: {product['features']}"
         
-        if product:
-            generated_topics = rag_service.generate_topics_for_brand_product(
-                product_id=product_id,
-                brand_id=brand_id,
-                count=count
-            )
-        else:
-            topic_generator = rag_service.create_multiple_topics_generator(
-                product_context=prompt,
-                brand_info=brand_info,
-                count=count
-            )
-            generated_topics = topic_generator()
-        
-        saved_topics = []
-        for topic_data in generated_topics.get("topics", []):
-            topic_id = str(uuid.uuid4())
-            now = datetime.now()
-            
-            title = topic_data.get("title", "")
-            description = topic_data.get("description", "")
-            target_audience = topic_data.get("target_audience", "")
-            category = topic_data.get("category", "")
-            
-            cursor.execute(
-                """INSERT INTO topics 
-                   (id, title, description, brand_id, product_id, user_id, prompt, category, status, target_audience, created_at, updated_at) 
-                   VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s) 
-                   RETURNING *""", 
-                (
-                    topic_id, 
-                    title, 
-                    description, 
-                    brand_id, 
-                    product_id, 
-                    current_user["id"], 
-                    prompt,
-                    category,
-                    "pending", 
-                    target_audience,
-                    now, 
-                    now
+        def generate():
+            # Chạy trong thread riêng; đặt cờ fresh ngay trong thread đó
+            with fresh_responses(fresh):
+                if product:
+                    return rag_service.generate_topics_for_brand_product(
+                        product_id=product_id,
+                        brand_id=brand_id,
+                        count=count
+                    )
+                topic_generator = rag_service.create_multiple_topics_generator(
+                    product_context=prompt,
+                    brand_info=brand_info,
+                    count=count,
+                    tenant=brand_id
                 )
-            )
-            
-            topic = cursor.fetchone()
-            saved_topics.append({
+                return topic_generator()
+        
+        generated_topics = await run_in_threadpool(generate)
+        
+        # Lưu tất cả topic trong một câu lệnh INSERT nhiều dòng
+        now = datetime.now()
+        rows = [
+            {
+                "id": str(uuid.uuid4()),
+                "title": topic_data.get("title", ""),
+                "description": topic_data.get("description", ""),
+                "brand_id": brand_id,
+                "product_id": product_id,
+                "user_id": current_user["id"],
+                "prompt": prompt,
+                "category": topic_data.get("category", ""),
+                "status": "pending",
+                "target_audience": topic_data.get("target_audience", ""),
+                "created_at": now,
+                "updated_at": now
+            }
+            for topic_data in generated_topics.get("topics", [])
+        ]
+        inserted_topics = await async_insert_rows("topics", rows, returning="*")
+        
+        saved_topics = [
+            {
                 "id": topic["id"],
                 "title": topic["title"],
                 "description": topic["description"],
@@ -331,18 +311,15 @@ async def generate_topics(
                 "target_audience": topic["target_audience"],
                 "created_at": topic["created_at"],
                 "updated_at": topic["updated_at"]
-            })
-        
-        conn.commit()
+            }
+            for topic in inserted_topics
+        ]
         
         return {"topics": saved_topics}
         
     except HTTPException:
         raise
     except Exception as e:
-        if conn:
-            conn.rollback()
-            
         # Check if it's a quota exceeded error from the response
         error_str = str(e).lower()
         if "quota" in error_str or "exceeded" in error_str or "429" in error_str:
@@ -358,16 +335,12 @@ async def generate_topics(
         else:
             # For other errors, return a 500 error
             raise HTTPException(status_code=500, detail=f"Error generating topics: {str(e)}")
-    finally:
-        if conn:
-            conn.close()
 
 @router.post("/approve_by_numeric_id/{topic_id}", response_model=Dict[str, Any])
-async def approve_topic_by_numeric_id(topic_id: str, current_user = Depends(auth_controller.get_current_user)):
+async def approve_topic_by_numeric_id(topic_id: str, current_user = Depends(auth_controller.get_current_user), conn = Depends(get_db_session)):
     """
     Approve a topic using numeric ID.
     """
-    conn = None
     try:
         try:
             uuid_obj = uuid.UUID(topic_id)
@@ -375,39 +348,14 @@ async def approve_topic_by_numeric_id(topic_id: str, current_user = Depends(auth
         except ValueError:
             raise HTTPException(status_code=400, detail=f"Invalid topic ID format: '{topic_id}'. Must be a valid UUID.")
             
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT * FROM topics WHERE id = %s AND user_id = %s", (topic_id, current_user["id"]))
-        existing_topic = cursor.fetchone()
-        
-        if not existing_topic:
-            raise HTTPException(status_code=404, detail="Topic not found")
-        
-        now = datetime.now()
-        cursor.execute(
-            """UPDATE topics 
-               SET status = 'approved', updated_at = %s
-               WHERE id = %s AND user_id = %s
-               RETURNING *""", 
-            (now, topic_id, current_user["id"])
-        )
+        # Kiểm tra quyền sở hữu, cập nhật và lấy tên brand/product trong một câu lệnh
+        updated_topic = await topic_repository.transition_status(conn, topic_id, current_user["id"], "approved")
         
-        updated_topic = cursor.fetchone()
         if not updated_topic:
-            raise HTTPException(status_code=404, detail="Failed to update topic")
-            
-        conn.commit()
-        
-        cursor.execute("SELECT name FROM brands WHERE id = %s", (updated_topic["brand_id"],))
-        brand = cursor.fetchone()
-        brand_name = brand["name"] if brand else None
+            raise HTTPException(status_code=404, detail="Topic not found")
         
-        product_name = None
-        if updated_topic["product_id"]:
-            cursor.execute("SELECT name FROM products WHERE id = %s", (updated_topic["product_id"],))
-            product = cursor.fetchone()
-            product_name = product["name"] if product else None
+        brand_name = updated_topic["brand_name"]
+        product_name = updated_topic["product_name"]
         
         return {
             "id": updated_topic["id"],
@@ -429,19 +377,13 @@ async def approve_topic_by_numeric_id(topic_id: str, current_user = Depends(auth
     except HTTPException:
         raise
     except Exception as e:
-        if conn:
-            conn.rollback()
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-    finally:
-        if conn:
-            conn.close()
 
 @router.post("/{topic_id}/approve", response_model=Dict[str, Any])
-async def approve_topic(topic_id: str, current_user = Depends(auth_controller.get_current_user)):
+async def approve_topic(topic_id: str, current_user = Depends(auth_controller.get_current_user), conn = Depends(get_db_session)):
     """
     Approve a topic.
     """
-    conn = None
     try:
         try:
             uuid_obj = uuid.UUID(topic_id)
@@ -449,39 +391,14 @@ async def approve_topic(topic_id: str, current_user = Depends(auth_controller.ge
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid topic ID format. Must be a valid UUID.")
             
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT * FROM topics WHERE id = %s AND user_id = %s", (topic_id, current_user["id"]))
-        existing_topic = cursor.fetchone()
-        
-        if not existing_topic:
-            raise HTTPException(status_code=404, detail="Topic not found")
-        
-        now = datetime.now()
-        cursor.execute(
-            """UPDATE topics 
-               SET status = 'approved', updated_at = %s
-               WHERE id = %s AND user_id = %s
-               RETURNING *""", 
-            (now, topic_id, current_user["id"])
-        )
+        # Kiểm tra quyền sở hữu, cập nhật và lấy tên brand/product trong một câu lệnh
+        updated_topic = await topic_repository.transition_status(conn, topic_id, current_user["id"], "approved")
         
-        updated_topic = cursor.fetchone()
         if not updated_topic:
-            raise HTTPException(status_code=404, detail="Failed to update topic")
-            
-        conn.commit()
-        
-        cursor.execute("SELECT name FROM brands WHERE id = %s", (updated_topic["brand_id"],))
-        brand = cursor.fetchone()
-        brand_name = brand["name"] if brand else None
+            raise HTTPException(status_code=404, detail="Topic not found")
         
-        product_name = None
-        if updated_topic["product_id"]:
-            cursor.execute("SELECT name FROM products WHERE id = %s", (updated_topic["product_id"],))
-            product = cursor.fetchone()
-            product_name = product["name"] if product else None
+        brand_name = updated_topic["brand_name"]
+        product_name = updated_topic["product_name"]
         
         return {
             "id": updated_topic["id"],
@@ -503,19 +420,13 @@ async def approve_topic(topic_id: str, current_user = Depends(auth_controller.ge
     except HTTPException:
         raise
     except Exception as e:
-        if conn:
-            conn.rollback()
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-    finally:
-        if conn:
-            conn.close()
 
 @router.post("/{topic_id}/reject", response_model=Dict[str, Any])
-async def reject_topic(topic_id: str, current_user = Depends(auth_controller.get_current_user)):
+async def reject_topic(topic_id: str, current_user = Depends(auth_controller.get_current_user), conn = Depends(get_db_session)):
     """
     Reject a topic.
     """
-    conn = None
     try:
         try:
             uuid_obj = uuid.UUID(topic_id)
@@ -523,39 +434,14 @@ async def reject_topic(topic_id: str, current_user = Depends(auth_controller.get
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid topic ID format. Must be a valid UUID.")
             
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT * FROM topics WHERE id = %s AND user_id = %s", (topic_id, current_user["id"]))
-        existing_topic = cursor.fetchone()
-        
-        if not existing_topic:
-            raise HTTPException(status_code=404, detail="Topic not found")
-        
-        now = datetime.now()
-        cursor.execute(
-            """UPDATE topics 
-               SET status = 'rejected', updated_at = %s
-               WHERE id = %s AND user_id = %s
-               RETURNING *""", 
-            (now, topic_id, current_user["id"])
-        )
+        # Kiểm tra quyền sở hữu, cập nhật và lấy tên brand/product trong một câu lệnh
+        updated_topic = await topic_repository.transition_status(conn, topic_id, current_user["id"], "rejected")
         
-        updated_topic = cursor.fetchone()
         if not updated_topic:
-            raise HTTPException(status_code=404, detail="Failed to update topic")
-            
-        conn.commit()
-        
-        cursor.execute("SELECT name FROM brands WHERE id = %s", (updated_topic["brand_id"],))
-        brand = cursor.fetchone()
-        brand_name = brand["name"] if brand else None
+            raise HTTPException(status_code=404, detail="Topic not found")
         
-        product_name = None
-        if updated_topic["product_id"]:
-            cursor.execute("SELECT name FROM products WHERE id = %s", (updated_topic["product_id"],))
-            product = cursor.fetchone()
-            product_name = product["name"] if product else None
+        brand_name = updated_topic["brand_name"]
+        product_name = updated_topic["product_name"]
         
         return {
             "id": updated_topic["id"],
@@ -577,9 +463,72 @@ async def reject_topic(topic_id: str, current_user = Depends(auth_controller.get
     except HTTPException:
         raise
     except Exception as e:
-        if conn:
-            conn.rollback()
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-    finally:
-        if conn:
-            conn.close()
+
+@router.post("/bulk-status", response_model=Dict[str, Any])
+async def bulk_update_topic_status(request: BulkTopicStatusRequest, current_user = Depends(auth_controller.get_current_user), conn = Depends(get_db_session)):
+    """
+    Approve or reject many topics at once.
+
+    All valid ids are updated by one UPDATE scoped to the current user; the response
+    has one result per requested id, in request order.
+    """
+    try:
+        # Chuẩn hoá ID, ghi nhận các ID không hợp lệ thay vì huỷ cả batch
+        normalized_ids = {}
+        for topic_id in request.topic_ids:
+            try:
+                normalized_ids[topic_id] = str(uuid.UUID(topic_id))
+            except ValueError:
+                normalized_ids[topic_id] = None
+        
+        valid_ids = list({topic_id for topic_id in normalized_ids.values() if topic_id})
+        updated_topics = []
+        if valid_ids:
+            updated_topics = await topic_repository.transition_status_many(conn, valid_ids, current_user["id"], request.status)
+        updated_by_id = {str(topic["id"]): topic for topic in updated_topics}
+        
+        results = []
+        for topic_id in request.topic_ids:
+            normalized_id = normalized_ids[topic_id]
+            if normalized_id is None:
+                results.append({"id": topic_id, "success": False, "error": "Invalid topic ID format. Must be a valid UUID."})
+                continue
+            
+            topic = updated_by_id.get(normalized_id)
+            if topic is None:
+                results.append({"id": topic_id, "success": False, "error": "Topic not found"})
+                continue
+            
+            results.append({
+                "id": topic_id,
+                "success": True,
+                "topic": {
+                    "id": topic["id"],
+                    "title": topic["title"],
+                    "description": topic["description"],
+                    "brand_id": topic["brand_id"],
+                    "brand_name": topic["brand_name"],
+                    "product_id": topic["product_id"],
+                    "product_name": topic["product_name"],
+                    "user_id": topic["user_id"],
+                    "prompt": topic["prompt"],
+                    "category": topic["category"],
+                    "status": topic["status"],
+                    "target_audience": topic["target_audience"],
+                    "created_at": topic["created_at"],
+                    "updated_at": topic["updated_at"]
+                }
+            })
+        
+        return {
+            "status": request.status,
+            "updated": len(updated_topics),
+            "failed": len(results) - sum(1 for result in results if result["success"]),
+            "results": results
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -0,0 +1,71 @@
+import threading
+import time
+
+from config.settings import ANN_SYNC_INTERVAL
+from app.utils.ann_index import ann_indexes, sync_ann_index
+
+class AnnIndexSyncer:
+    """
+    Background thread that keeps this process's ANN indexes in step with the vector
+    writes and deletions of every other worker.
+
+    Each uvicorn worker holds its own in-memory indexes, and ann_upsert()/ann_remove()
+    only reach the index of the worker that made the change. Every ``interval`` seconds
+    this thread loads the delta since the last sync (see sync_ann_index()). Unlike the
+    embedding refresher it runs in every worker, since each one has its own indexes.
+    """
+
+    def __init__(self, interval=ANN_SYNC_INTERVAL):
+        self.interval = interval
+        self.last_run_at = None
+        self.last_result = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """
+        Start the background thread (no-op if it is already running).
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ann-index-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.run_once()
+
+    def run_once(self):
+        """
+        Sync every loaded index once in the calling thread. A table that fails is skipped until the next round.
+
+        Returns:
+            dict: Records applied per table (None where tracking is not set up)
+        """
+        result = {}
+        for table_name in list(ann_indexes):
+            try:
+                result[table_name] = sync_ann_index(table_name)
+            except Exception as e:
+                print(f"Error syncing ANN index for {table_name}: {e}")
+                result[table_name] = None
+        self.last_run_at = time.time()
+        self.last_result = result
+        return result
+
+    def stats(self):
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "interval": self.interval,
+            "last_run_at": self.last_run_at,
+            "last_result": self.last_result
+        }
+
+ann_index_syncer = AnnIndexSyncer()
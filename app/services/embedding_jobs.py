@@ -0,0 +1,346 @@
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from config.settings import (
+    EMBEDDING_BATCH_SIZE, EMBEDDING_JOB_WORKERS, EMBEDDING_JOB_MAX_PENDING, EMBEDDING_JOB_STALE_AFTER
+)
+from app.utils.database import db_connection, select_rows, select_one
+
+# Giữ tối đa bấy nhiêu lỗi gần nhất trong mỗi job
+MAX_RECORDED_FAILURES = 100
+
+ACTIVE_STATUSES = ("queued", "running")
+
+class JobQueueFullError(Exception):
+    """Raised when a process already has EMBEDDING_JOB_MAX_PENDING jobs queued or running."""
+
+class EmbeddingJobManager:
+    """
+    Runs embedding backfills as background jobs on a bounded thread pool.
+
+    Jobs live in the ``embedding_jobs`` table (scripts/create_embedding_jobs_table.sql).
+    Products are processed in id order and the job row is updated after every
+    committed batch with its counters and the last product id, so a job interrupted by
+    a restart resumes after its last committed batch. A worker claims a job with a
+    conditional UPDATE and keeps a heartbeat on it; a running job whose heartbeat is
+    older than EMBEDDING_JOB_STALE_AFTER seconds is considered orphaned and can be
+    claimed again.
+    """
+
+    def __init__(self, max_workers=EMBEDDING_JOB_WORKERS, max_pending=EMBEDDING_JOB_MAX_PENDING):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._resume_timer = None
+        self._active = {}
+        self._product_embeddings = None
+        self._runners = {"product_backfill": self._run_product_backfill}
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="embedding-job")
+            return self._executor
+
+    def _get_product_embeddings(self):
+        if self._product_embeddings is None:
+            from app.utils.product_embeddings import ProductEmbeddings
+            self._product_embeddings = ProductEmbeddings()
+        return self._product_embeddings
+
+    def _dispatch(self, job_id):
+        executor = self._get_executor()
+        with self._lock:
+            if job_id in self._active:
+                return
+            self._active[job_id] = executor.submit(self._run, job_id)
+
+    def submit(self, kind, params=None):
+        """
+        Queue a job and return its row right away.
+
+        Args:
+            kind (str): Job type, e.g. "product_backfill"
+            params (dict, optional): Job parameters, e.g. {"batch_size": 100}
+
+        Returns:
+            dict: The created job
+        """
+        if kind not in self._runners:
+            raise ValueError(f"Unknown job kind: {kind}")
+        with self._lock:
+            if len(self._active) >= self.max_pending:
+                raise JobQueueFullError(f"Too many embedding jobs in progress (max {self.max_pending})")
+
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO embedding_jobs (id, kind, params) VALUES (%s, %s, %s) RETURNING *",
+                (str(uuid.uuid4()), kind, json.dumps(params or {}))
+            )
+            job = cursor.fetchone()
+            conn.commit()
+            cursor.close()
+
+        self._dispatch(str(job["id"]))
+        return self.describe(job)
+
+    def _claim(self, job_id):
+        """
+        Mark a job as running in this process. Returns the job row, or None if it is
+        finished or already held by a live worker.
+        """
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                UPDATE embedding_jobs
+                SET status = 'running', started_at = NOW(), heartbeat_at = NOW(), processed_at_start = processed
+                WHERE id = %s
+                  AND (status = 'queued'
+                       OR (status = 'running' AND heartbeat_at < NOW() - make_interval(secs => %s)))
+                RETURNING *
+                """,
+                (job_id, EMBEDDING_JOB_STALE_AFTER)
+            )
+            job = cursor.fetchone()
+            conn.commit()
+            cursor.close()
+        return job
+
+    def _update(self, job_id, **fields):
+        """
+        Write job columns and refresh the heartbeat. Returns whether cancellation was requested.
+        """
+        assignments = ", ".join(f"{column} = %s" for column in fields)
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"UPDATE embedding_jobs SET {assignments}, heartbeat_at = NOW() WHERE id = %s RETURNING cancel_requested",
+                list(fields.values()) + [job_id]
+            )
+            row = cursor.fetchone()
+            conn.commit()
+            cursor.close()
+        return bool(row and row["cancel_requested"])
+
+    def _finish(self, job_id, status, error=None):
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "UPDATE embedding_jobs SET status = %s, error = %s, finished_at = NOW(), heartbeat_at = NOW() WHERE id = %s",
+                (status, error, job_id)
+            )
+            conn.commit()
+            cursor.close()
+
+    def _run(self, job_id):
+        try:
+            job = self._claim(job_id)
+            if job is None:
+                return
+            try:
+                status = self._runners[job["kind"]](job)
+                if status is None:
+                    # Dừng do tắt ứng dụng: trả job về hàng đợi để lần khởi động sau chạy tiếp
+                    self._update(job_id, status="queued")
+                else:
+                    self._finish(job_id, status)
+            except Exception as e:
+                print(f"Embedding job {job_id} failed: {e}")
+                self._finish(job_id, "failed", str(e))
+        except Exception as e:
+            print(f"Error running embedding job {job_id}: {e}")
+        finally:
+            with self._lock:
+                self._active.pop(job_id, None)
+
+    def _count_remaining(self, last_product_id):
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            condition = "embedding IS NULL" + (" AND id > %s" if last_product_id else "")
+            cursor.execute(f"SELECT COUNT(*) AS count FROM products WHERE {condition}", [str(last_product_id)] if last_product_id else [])
+            count = cursor.fetchone()["count"]
+            cursor.close()
+        return count
+
+    def _run_product_backfill(self, job):
+        """
+        Embed every product without an embedding, one committed batch at a time.
+
+        Returns:
+            str: Final status ("completed" or "cancelled"), or None when interrupted by shutdown
+        """
+        job_id = str(job["id"])
+        params = job["params"] or {}
+        batch_size = max(1, int(params.get("batch_size") or EMBEDDING_BATCH_SIZE))
+        product_embeddings = self._get_product_embeddings()
+        columns = product_embeddings.product_columns()
+
+        last_product_id = job["last_product_id"]
+        processed = job["processed"]
+        successful = job["successful"]
+        failed = job["failed"]
+        failures = list(job["failures"] or [])
+        self._update(job_id, total=processed + self._count_remaining(last_product_id))
+
+        while True:
+            filters = {"embedding__isnull": True}
+            if last_product_id:
+                filters["id__gt"] = str(last_product_id)
+            batch = select_rows("products", filters, columns=columns, order_by=["id"], limit=batch_size)
+            if not batch:
+                return "completed"
+
+            result = product_embeddings.embed_products(batch, batch_size)
+            last_product_id = str(batch[-1]["id"])
+            processed += len(batch)
+            successful += result["successful"]
+            failed += result["failed"]
+            failures = (failures + result["failed_products"])[-MAX_RECORDED_FAILURES:]
+
+            cancel_requested = self._update(
+                job_id,
+                processed=processed,
+                successful=successful,
+                failed=failed,
+                failures=json.dumps(failures),
+                last_product_id=last_product_id
+            )
+            if cancel_requested:
+                return "cancelled"
+            if self._stopping.is_set():
+                return None
+
+    def resume_pending(self):
+        """
+        Dispatch queued jobs and running jobs left orphaned by a restart or a crash.
+
+        Called on startup and then every EMBEDDING_JOB_STALE_AFTER seconds, so a job whose
+        worker died is picked up once its heartbeat goes stale. Jobs held by a live
+        worker are skipped when claimed.
+
+        Returns:
+            int: Number of jobs dispatched
+        """
+        self._stopping.clear()
+        try:
+            jobs = select_rows("embedding_jobs", {"status__in": list(ACTIVE_STATUSES)}, columns=["id"], order_by=["created_at"])
+            for job in jobs:
+                self._dispatch(str(job["id"]))
+            return len(jobs)
+        finally:
+            self._schedule_resume()
+
+    def _schedule_resume(self):
+        with self._lock:
+            if self._stopping.is_set():
+                return
+            self._resume_timer = threading.Timer(EMBEDDING_JOB_STALE_AFTER, self._resume_quietly)
+            self._resume_timer.daemon = True
+            self._resume_timer.start()
+
+    def _resume_quietly(self):
+        try:
+            self.resume_pending()
+        except Exception as e:
+            print(f"Error resuming embedding jobs: {e}")
+
+    def cancel(self, job_id):
+        """
+        Ask a job to stop after its current batch. Returns the job, or None if it does not exist.
+        """
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                UPDATE embedding_jobs
+                SET cancel_requested = TRUE,
+                    status = CASE WHEN status = 'queued' THEN 'cancelled' ELSE status END,
+                    finished_at = CASE WHEN status = 'queued' THEN NOW() ELSE finished_at END
+                WHERE id = %s
+                RETURNING *
+                """,
+                (job_id,)
+            )
+            job = cursor.fetchone()
+            conn.commit()
+            cursor.close()
+        return self.describe(job) if job else None
+
+    def describe(self, job):
+        """
+        Public view of a job row, with progress and throughput.
+        """
+        job = dict(job)
+        total = job.get("total") or 0
+        processed = job.get("processed") or 0
+        throughput = None
+        started_at = job.get("started_at")
+        if started_at:
+            end = job.get("finished_at") or job.get("heartbeat_at") or started_at
+            elapsed = (end - started_at).total_seconds()
+            if elapsed > 0:
+                throughput = round((processed - (job.get("processed_at_start") or 0)) / elapsed, 2)
+
+        return {
+            "id": str(job["id"]),
+            "kind": job["kind"],
+            "status": job["status"],
+            "params": job.get("params"),
+            "total": total,
+            "processed": processed,
+            "successful": job.get("successful", 0),
+            "failed": job.get("failed", 0),
+            "progress": round(processed / total, 4) if total else (1.0 if job["status"] == "completed" else 0.0),
+            "throughput_per_second": throughput,
+            "failures": job.get("failures") or [],
+            "error": job.get("error"),
+            "created_at": job.get("created_at"),
+            "started_at": started_at,
+            "finished_at": job.get("finished_at")
+        }
+
+    def get(self, job_id):
+        """
+        A job by id, or None.
+        """
+        job = select_one("embedding_jobs", {"id": job_id})
+        return self.describe(job) if job else None
+
+    def list(self, limit=20):
+        """
+        The most recent jobs, newest first.
+        """
+        return [self.describe(job) for job in select_rows("embedding_jobs", order_by=["-created_at"], limit=limit)]
+
+    def shutdown(self, timeout=30):
+        """
+        Stop taking work. Running jobs stop after their current batch and go back to
+        the queue, so the next start resumes them.
+        """
+        self._stopping.set()
+        with self._lock:
+            executor, self._executor = self._executor, None
+            if self._resume_timer is not None:
+                self._resume_timer.cancel()
+                self._resume_timer = None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+            # Chờ batch đang chạy commit xong
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline:
+                with self._lock:
+                    futures = list(self._active.values())
+                if all(future.done() for future in futures):
+                    break
+                time.sleep(0.1)
+            with self._lock:
+                self._active = {job_id: future for job_id, future in self._active.items() if not future.done()}
+
+embedding_job_manager = EmbeddingJobManager()
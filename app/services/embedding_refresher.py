@@ -0,0 +1,108 @@
+import threading
+import time
+
+from config.settings import EMBEDDING_REFRESH_INTERVAL, EMBEDDING_BATCH_SIZE
+from app.utils.database import dedicated_connection
+
+# Khoá advisory chung cho mọi worker: mỗi lúc chỉ một tiến trình chạy một vòng làm mới
+_REFRESH_LOCK_KEY = "product_embedding_refresh"
+
+class EmbeddingRefresher:
+    """
+    Background thread that re-embeds the products marked dirty by edits.
+
+    Controllers call notify() after an edit that may change a product's embedded
+    text; the thread also polls every ``interval`` seconds so marks made by other
+    processes are picked up. A session-level advisory lock, held on a connection
+    outside the pool, keeps uvicorn workers from running the same round twice.
+    """
+
+    def __init__(self, interval=EMBEDDING_REFRESH_INTERVAL, batch_size=EMBEDDING_BATCH_SIZE):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.last_run_at = None
+        self.last_result = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._product_embeddings = None
+
+    def start(self):
+        """
+        Start the background thread (no-op if it is already running).
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="embedding-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """
+        Ask the thread to finish and wait for it. A round in progress completes its current batch first.
+        """
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def notify(self):
+        """
+        Wake the thread now instead of at the next poll. Safe to call from any thread or coroutine.
+        """
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Error refreshing product embeddings: {e}")
+
+    def run_once(self):
+        """
+        Run one refresh round in the calling thread.
+
+        Returns:
+            dict: Summary of the round, or None if another process is running one
+        """
+        with dedicated_connection() as conn:
+            # Autocommit: khoá advisory mức session không giữ transaction mở trong lúc gọi OpenAI
+            conn.autocommit = True
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT pg_try_advisory_lock(hashtext(%s)) AS locked", (_REFRESH_LOCK_KEY,))
+                if not cursor.fetchone()["locked"]:
+                    return None
+
+                try:
+                    if self._product_embeddings is None:
+                        from app.utils.product_embeddings import ProductEmbeddings
+                        self._product_embeddings = ProductEmbeddings()
+
+                    result = self._product_embeddings.refresh_dirty_product_embeddings(self.batch_size)
+                    self.last_run_at = time.time()
+                    self.last_result = {key: value for key, value in result.items() if key != "batches"}
+                    if result.get("total"):
+                        print(f"Refreshed product embeddings: {result.get('successful', 0)} re-embedded, "
+                              f"{result.get('unchanged', 0)} unchanged, {result.get('failed', 0)} failed")
+                    return result
+                finally:
+                    cursor.execute("SELECT pg_advisory_unlock(hashtext(%s))", (_REFRESH_LOCK_KEY,))
+            finally:
+                cursor.close()
+
+    def stats(self):
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "interval": self.interval,
+            "last_run_at": self.last_run_at,
+            "last_result": self.last_result
+        }
+
+embedding_refresher = EmbeddingRefresher()
@@ -1,32 +1,75 @@
+import uuid
 import numpy as np
-from langchain_openai import OpenAIEmbeddings
-from config.settings import OPENAI_API_KEY, EMBEDDING_MODEL
-from app.utils.database import get_db_connection
+from psycopg2 import extensions
+from config.settings import EMBEDDING_MODEL, EMBEDDING_FETCH_CHUNK_SIZE
+from app.utils.database import db_connection, quote_identifier, database_now
+from app.utils.clients import clients
+from app.utils.embedding_cache import embedding_cache
+from app.utils.vector_search import EmbeddingMatrix
+from app.utils.embedding_snapshot import write_snapshot_chunks, load_or_build_snapshot
 
 class EmbeddingService:
     def __init__(self):
-        self.embeddings = OpenAIEmbeddings(
-            model=EMBEDDING_MODEL,
-            openai_api_key=OPENAI_API_KEY
-        )
+        # Client dùng chung cho cả tiến trình, giữ kết nối HTTP giữa các request
+        self.embeddings = clients.embeddings(EMBEDDING_MODEL)
+        self.model = EMBEDDING_MODEL
+        self.cache = embedding_cache
     
     def generate_embedding(self, text):
         """
         Generate an embedding vector for the given text.
         
+        Identical text (after whitespace/Unicode normalization) is served from the
+        embedding cache instead of calling the API again.
+        
         Args:
             text (str): Text to generate embeddings for
             
         Returns:
             list: Embedding vector
         """
+        cached = self.cache.get(self.model, text)
+        if cached is not None:
+            return cached
         try:
             embedding = self.embeddings.embed_query(text)
+            self.cache.put(self.model, text, embedding)
             return embedding
         except Exception as e:
             print(f"Error generating embedding: {e}")
             raise
     
+    def generate_embeddings(self, texts):
+        """
+        Generate embedding vectors for many texts with one batched API call.
+        
+        Only texts missing from the embedding cache are sent to the API, each
+        distinct text once.
+        
+        Args:
+            texts (list): Texts to generate embeddings for
+            
+        Returns:
+            list: Embedding vectors, in the same order as texts
+        """
+        if not texts:
+            return []
+        hashes, found = self.cache.get_many(self.model, texts)
+        # Mỗi đoạn văn bản chưa có trong cache chỉ gửi lên API một lần
+        pending = {}
+        for key, text in zip(hashes, texts):
+            if key not in found and key not in pending:
+                pending[key] = text
+        try:
+            if pending:
+                generated = dict(zip(pending.keys(), self.embeddings.embed_documents(list(pending.values()))))
+                self.cache.put_many(self.model, generated)
+                found.update(generated)
+            return [found[key] for key in hashes]
+        except Exception as e:
+            print(f"Error generating embeddings: {e}")
+            raise
+    
     def fetch_embeddings_from_db(self, table_name, column_name, condition=None):
         """
         Fetch embeddings from the database.
@@ -38,22 +81,98 @@ class EmbeddingService:
             
         Returns:
             list: List of embedding records
-        """
-        conn = get_db_connection()
-        cursor = conn.cursor()
         
+        For large tables use iter_embeddings_from_db, which streams NumPy blocks instead.
+        """
         query = f"SELECT id, {column_name} FROM {table_name}"
         if condition:
             query += f" WHERE {condition}"
         
-        cursor.execute(query)
-        results = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query)
+            results = cursor.fetchall()
+            cursor.close()
         
         return results
     
+    def iter_embeddings_from_db(self, table_name, column_name="embedding", condition=None, chunk_size=EMBEDDING_FETCH_CHUNK_SIZE):
+        """
+        Stream embeddings from the database as NumPy blocks.
+        
+        Rows come through a named (server-side) cursor ``chunk_size`` at a time as plain
+        tuples, and each vector's text form is parsed straight into a preallocated
+        float32 block, so peak memory is one chunk whatever the table size. Rows
+        without a vector are skipped.
+        
+        Args:
+            table_name (str): Name of the table containing embeddings
+            column_name (str): Name of the column containing embeddings
+            condition (str, optional): SQL WHERE condition
+            chunk_size (int): Rows fetched per round trip
+            
+        Yields:
+            tuple: (ids, matrix) with a list of ID strings and a (len(ids), dim) float32 array
+        """
+        column = quote_identifier(column_name)
+        query = f"SELECT id::text, {column}::text FROM {quote_identifier(table_name)} WHERE {column} IS NOT NULL"
+        if condition:
+            query += f" AND ({condition})"
+        
+        with db_connection() as conn:
+            # Cursor phía server: Postgres giữ kết quả, client chỉ nhận từng chunk
+            cursor = conn.cursor(name=f"embeddings_{uuid.uuid4().hex}", cursor_factory=extensions.cursor)
+            cursor.itersize = chunk_size
+            try:
+                cursor.execute(query)
+                dim = None
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    if dim is None:
+                        dim = np.fromstring(rows[0][1].strip("[]"), dtype=np.float32, sep=",").shape[0]
+                    
+                    ids = []
+                    block = np.empty((len(rows), dim), dtype=np.float32)
+                    for record_id, text in rows:
+                        block[len(ids)] = np.fromstring(text.strip("[]"), dtype=np.float32, sep=",")
+                        ids.append(record_id)
+                    yield ids, block
+            finally:
+                cursor.close()
+    
+    def build_embedding_snapshot(self, table_name, column_name="embedding"):
+        """
+        Read every stored vector of a table and write it as a memory-mappable snapshot.
+        
+        The vectors are streamed with iter_embeddings_from_db, so the table is never
+        held in memory as Python objects. The database time taken before the scan is
+        stored with the snapshot, so later loads know which writes it may be missing.
+        
+        Args:
+            table_name (str): Name of the table containing embeddings
+            column_name (str): Name of the column containing embeddings
+            
+        Returns:
+            int: Number of vectors written
+        """
+        synced_at = database_now()
+        return write_snapshot_chunks(table_name, self.iter_embeddings_from_db(table_name, column_name), synced_at=synced_at)
+    
+    def load_embedding_snapshot(self, table_name, column_name="embedding"):
+        """
+        Memory-map the embedding snapshot of a table read-only, building it first if it is missing or stale.
+        
+        Args:
+            table_name (str): Name of the table containing embeddings
+            column_name (str): Name of the column containing embeddings
+            
+        Returns:
+            EmbeddingSnapshot: IDs and the shared read-only matrix of normalized vectors
+        """
+        return load_or_build_snapshot(table_name, lambda: self.build_embedding_snapshot(table_name, column_name))
+    
     def store_embedding(self, table_name, data):
         """
         Store embedding in the database.
@@ -65,20 +184,17 @@ class EmbeddingService:
         Returns:
             dict: Created record
         """
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         columns = ", ".join(data.keys())
         placeholders = ", ".join(["%s"] * len(data))
         
         query = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders}) RETURNING *"
         
-        cursor.execute(query, list(data.values()))
-        result = cursor.fetchone()
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, list(data.values()))
+            result = cursor.fetchone()
+            conn.commit()
+            cursor.close()
         
         return result
     
@@ -104,32 +220,54 @@ class EmbeddingService:
         similarity = dot_product / (query_norm * doc_norm)
         return similarity
     
-    def search_by_similarity(self, query, stored_embeddings, threshold=0.7):
+    def search_by_similarity(self, query, stored_embeddings, threshold=0.7, top_k=None):
         """
         Search for similar documents by comparing embeddings.
         
+        Stored vectors are stacked into one normalized float32 matrix and scored with
+        a single matrix multiplication; top_k uses a partial sort.
+        
         Args:
             query (str): Query text
-            stored_embeddings (list): List of stored embeddings with metadata
+            stored_embeddings (list or EmbeddingMatrix): Stored embeddings with metadata,
+                or a matrix built once with EmbeddingMatrix.from_items for reuse
             threshold (float): Minimum similarity score
+            top_k (int, optional): Return at most this many results
             
         Returns:
             list: List of similar documents with scores
         """
-        query_embedding = self.generate_embedding(query)
-        results = []
-        
-        for item in stored_embeddings:
-            document_embedding = item.get('embedding')
-            if document_embedding:
-                similarity = self.calculate_similarity(query_embedding, document_embedding)
-                if similarity >= threshold:
-                    results.append({
-                        "id": item.get("id"),
-                        "score": similarity,
-                        "data": item
-                    })
-        
-        # Sort by similarity score (descending)
-        results.sort(key=lambda x: x["score"], reverse=True)
-        return results 
\ No newline at end of file
+        return self.search_by_similarity_batch([query], stored_embeddings, threshold, top_k)[0]
+    
+    def search_by_similarity_batch(self, queries, stored_embeddings, threshold=0.7, top_k=None):
+        """
+        Run search_by_similarity for many queries at once.
+        
+        Query embeddings are generated in one batched call and all queries are
+        scored against the stored vectors in one matrix multiplication.
+        
+        Args:
+            queries (list): Query texts
+            stored_embeddings (list or EmbeddingMatrix): Stored embeddings with metadata
+            threshold (float): Minimum similarity score
+            top_k (int, optional): Return at most this many results per query
+            
+        Returns:
+            list: One list of similar documents with scores per query, in query order
+        """
+        if not queries:
+            return []
+        matrix = stored_embeddings if isinstance(stored_embeddings, EmbeddingMatrix) else EmbeddingMatrix.from_items(stored_embeddings)
+        query_embeddings = self.generate_embeddings(list(queries))
+        
+        return [
+            [
+                {
+                    "id": matrix.items[index].get("id"),
+                    "score": score,
+                    "data": matrix.items[index]
+                }
+                for index, score in matches
+            ]
+            for matches in matrix.search(query_embeddings, threshold, top_k)
+        ]
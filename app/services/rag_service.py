@@ -1,30 +1,60 @@
 from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
-from langchain_openai import ChatOpenAI
-from langchain_community.vectorstores import SupabaseVectorStore
-from langchain_openai import OpenAIEmbeddings
-from config.settings import OPENAI_API_KEY, MODEL_NAME, EMBEDDING_MODEL
-from app.utils.database import get_supabase_client, fetch_data
+from config.settings import (
+    MODEL_NAME, EMBEDDING_MODEL, HYBRID_VECTOR_WEIGHT, HYBRID_LEXICAL_WEIGHT,
+    HYBRID_CANDIDATE_FACTOR, HYBRID_SEARCH_WORKERS
+)
+from app.utils.database import select_rows, get_projection
+from app.utils.clients import clients
+from app.utils.llm_cache import llm_cache, CachedChatModel
+from app.utils.semantic_cache import semantic_cache, canonical_request, exact_key
 from app.services.embedding_service import EmbeddingService
+from app.utils.ann_index import get_ann_index
+from app.utils.bm25_index import get_bm25_index
+from app.utils.product_embeddings import ProductEmbeddings
+from app.utils.query_cache import query_cache
+from app.utils.rank_fusion import reciprocal_rank_fusion
+from concurrent.futures import ThreadPoolExecutor
 import json
+import time
 import requests
 import base64
-from openai import OpenAI
+
+# Cột đủ để dựng văn bản ngữ cảnh (không đọc preview_image base64 hay embedding)
+PRODUCT_TEXT_FIELDS = ("name", "description", "features")
+CONTENT_TEXT_FIELDS = ("content",)
+
+# Luồng dùng chung để chạy song song các bộ truy xuất của hybrid_search
+_retrieval_executor = ThreadPoolExecutor(max_workers=HYBRID_SEARCH_WORKERS, thread_name_prefix="retrieval")
 
 class RAGService:
     def __init__(self):
-        self.openai = ChatOpenAI(
-            model_name=MODEL_NAME,
-            openai_api_key=OPENAI_API_KEY,
-            temperature=0.7
-        )
         self.embedding_service = EmbeddingService()
-        self.supabase = get_supabase_client()
+    
+    @property
+    def openai(self):
+        """
+        Shared chat model client (see app/utils/clients.py); created on first use.
+        """
+        return self.chat_model(0.7)
+    
+    def chat_model(self, temperature):
+        """
+        Shared chat model client for a given temperature, behind the LLM response cache.
+        """
+        return CachedChatModel(clients.chat_model(MODEL_NAME, temperature), llm_cache)
+    
+    @property
+    def supabase(self):
+        return clients.supabase()
         
     def setup_vector_store(self, table_name, embedding_column="embedding"):
         """
         Setup a vector store using Supabase.
         
+        The store and its embeddings and Supabase clients are created once per table and
+        shared by every RAGService, so their HTTP connections are reused across requests.
+        
         Args:
             table_name (str): The table name to use
             embedding_column (str): The column name containing embeddings
@@ -32,19 +62,7 @@ class RAGService:
         Returns:
             SupabaseVectorStore: A vector store instance
         """
-        embeddings = OpenAIEmbeddings(
-            model=EMBEDDING_MODEL,
-            openai_api_key=OPENAI_API_KEY
-        )
-        
-        vector_store = SupabaseVectorStore(
-            client=self.supabase,
-            embedding=embeddings,
-            table_name=table_name,
-            query_name="match_embeddings"
-        )
-        
-        return vector_store
+        return clients.vector_store(table_name, model=EMBEDDING_MODEL)
     
     def create_topic_generator(self, product_context, brand_info=None, previous_topics=None):
         """
@@ -113,14 +131,19 @@ class RAGService:
         
         return generate_topic
     
-    def create_multiple_topics_generator(self, product_context, brand_info, count=3):
+    def create_multiple_topics_generator(self, product_context, brand_info, count=3, tenant=None, product_id=None):
         """
         Create a generator for multiple topics based on product and brand information.
         
+        Results are served from the semantic cache when the tenant recently made a
+        near-identical request for the same product and number of topics.
+        
         Args:
             product_context (str): Product information to base topics on
             brand_info (str): Brand information to provide context
             count (int): Number of topics to generate
+            tenant (str, optional): Cache scope, e.g. the brand ID; no caching without one
+            product_id (str, optional): Product the topics are for, part of the cache scope
             
         Returns:
             function: A function that generates multiple topics in JSON format
@@ -172,7 +195,7 @@ class RAGService:
             input_variables=["product_info", "brand_info", "count"]
         )
         
-        def generate_topics():
+        def generate_topics_uncached():
             try:
                 formatted_prompt = topic_prompt.format(
                     product_info=product_context,
@@ -246,6 +269,16 @@ class RAGService:
                     "topics": []
                 }
         
+        def generate_topics():
+            return semantic_cache.get_or_compute(
+                (tenant, "topics", product_id, count),
+                canonical_request(product_info=product_context, brand_info=brand_info),
+                self.embedding_service.generate_embedding,
+                generate_topics_uncached,
+                # Không cache kết quả lỗi (kể cả chủ đề mẫu khi hết quota)
+                cacheable=lambda result: isinstance(result, dict) and not result.get("error")
+            )
+        
         return generate_topics
     
     def create_content_generator(self, topic, related_content=None):
@@ -298,15 +331,9 @@ class RAGService:
                 formatted_prompt = content_prompt.format(topic=topic, context=context)
                 
                 # Set a lower temperature to reduce token usage and improve consistency
-                original_temp = self.openai.temperature
-                self.openai.temperature = 0.5
-                
-                try:
-                    response = self.openai.invoke(formatted_prompt)
-                    return response.content
-                finally:
-                    # Restore original temperature
-                    self.openai.temperature = original_temp
+                # (client riêng cho temperature 0.5, không sửa client dùng chung)
+                response = self.chat_model(0.5).invoke(formatted_prompt)
+                return response.content
             except RateLimitError as e:
                 print(f"OpenAI API rate limit exceeded: {str(e)}")
                 raise
@@ -319,10 +346,107 @@ class RAGService:
         
         return generate_content
     
+    def _vector_ranking(self, table_name, query, limit, timings):
+        """
+        Record IDs nearest to the query embedding in the table's ANN index, or None when no index is loaded.
+        """
+        index = get_ann_index(table_name)
+        if index is None or not len(index):
+            return None
+        started = time.perf_counter()
+        query_embedding = self.embedding_service.generate_embedding(query)
+        embedded = time.perf_counter()
+        ranking = [record_id for record_id, _ in index.search(query_embedding, k=limit)]
+        timings["embedding_ms"] = round((embedded - started) * 1000, 2)
+        timings["vector_ms"] = round((time.perf_counter() - embedded) * 1000, 2)
+        return ranking
+    
+    def _lexical_ranking(self, table_name, query, limit, timings):
+        """
+        Best BM25 matches for the query in the table's keyword index, or None when no index is loaded.
+        """
+        index = get_bm25_index(table_name)
+        if index is None or not len(index):
+            return None
+        started = time.perf_counter()
+        ranking = [record_id for record_id, _ in index.search(query, k=limit)]
+        timings["lexical_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return ranking
+    
+    def hybrid_search(self, table_name, query, limit=5, weights=None):
+        """
+        Search a table with the lexical (BM25) and vector (ANN) retrievers at once and fuse their rankings.
+        
+        Both retrievers run concurrently, each returning ``limit * HYBRID_CANDIDATE_FACTOR``
+        candidates, and their rankings are merged with reciprocal rank fusion. A retriever
+        whose index is not loaded is skipped; one that fails is skipped and reported.
+        
+        Args:
+            table_name (str): Table to search, e.g. "products" or "content"
+            query (str): The search query
+            limit (int): Maximum number of records to return
+            weights (dict, optional): Weight per source ("vector", "lexical"); 0 disables a source
+            
+        Returns:
+            dict: ids (best first), matches with fused score and per-source ranks,
+                the sources used, errors and timings in milliseconds; None when neither index is loaded
+        """
+        started = time.perf_counter()
+        weights = {"vector": HYBRID_VECTOR_WEIGHT, "lexical": HYBRID_LEXICAL_WEIGHT, **(weights or {})}
+        candidates = max(limit, limit * HYBRID_CANDIDATE_FACTOR)
+        retrievers = {"vector": self._vector_ranking, "lexical": self._lexical_ranking}
+        
+        timings = {}
+        futures = {
+            source: _retrieval_executor.submit(retriever, table_name, query, candidates, timings)
+            for source, retriever in retrievers.items()
+            if weights.get(source, 0) > 0
+        }
+        rankings = {}
+        errors = {}
+        for source, future in futures.items():
+            try:
+                ranking = future.result()
+            except Exception as e:
+                print(f"Error in {source} retrieval on {table_name}: {str(e)}")
+                errors[source] = str(e)
+                continue
+            if ranking is not None:
+                rankings[source] = ranking
+        if not rankings and not errors:
+            return None
+        
+        fusion_started = time.perf_counter()
+        fused = reciprocal_rank_fusion(rankings, weights, limit=limit)
+        timings["fusion_ms"] = round((time.perf_counter() - fusion_started) * 1000, 2)
+        timings["total_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        
+        return {
+            "ids": [record_id for record_id, _, _ in fused],
+            "matches": [{"id": record_id, "score": score, "ranks": ranks} for record_id, score, ranks in fused],
+            "sources": list(rankings),
+            "errors": errors,
+            "timings": timings
+        }
+    
+    def _fetch_in_order(self, table_name, record_ids, fields):
+        """
+        Rows of the given IDs in the same order, with only ``fields`` (and id); IDs no longer in the table are left out.
+        """
+        if not record_ids:
+            return []
+        rows = select_rows(table_name, {"id__in": record_ids}, columns=get_projection(table_name, fields=fields))
+        rows_by_id = {str(row["id"]): row for row in rows}
+        return [rows_by_id[record_id] for record_id in record_ids if record_id in rows_by_id]
+    
     def retrieve_relevant_products(self, query, limit=5):
         """
         Retrieve relevant products for a given query.
         
+        Uses hybrid search over the in-process indexes when the ANN index is loaded,
+        otherwise the Supabase vector store. The query embedding comes from the embedding cache and
+        the matching product IDs are cached per normalized query; the IDs are dropped whenever products are re-indexed.
+        
         Args:
             query (str): The search query
             limit (int): Maximum number of products to retrieve
@@ -330,10 +454,47 @@ class RAGService:
         Returns:
             list: List of relevant products
         """
+        product_ids = query_cache.get_results("products", query, limit)
+        if product_ids is None:
+            result = self.hybrid_search("products", query, limit)
+            # Không có ANN index thì dùng vector store của Supabase thay vì chỉ tìm theo từ khoá
+            if result is not None and "vector" in result["sources"]:
+                product_ids = result["ids"]
+                query_cache.put_results("products", query, limit, product_ids)
+        
+        if product_ids is not None:
+            # Giữ thứ tự theo thứ hạng sau khi hợp nhất
+            return [ProductEmbeddings.build_product_text(product) for product in self._fetch_in_order("products", product_ids, PRODUCT_TEXT_FIELDS)]
+        
         vector_store = self.setup_vector_store("products")
-        results = vector_store.similarity_search(query, k=limit)
+        results = vector_store.similarity_search_by_vector(self.embedding_service.generate_embedding(query), k=limit)
         return [doc.page_content for doc in results]
     
+    def _content_text(self, item):
+        """
+        Text of a content record used as context: the social posts if the content is JSON, capped at 500 characters.
+        """
+        content_text = item.get("content", "")
+        if not isinstance(content_text, str):
+            return None
+        
+        # Try to parse JSON if it looks like JSON
+        try:
+            if content_text.strip().startswith('{'):
+                content_json = json.loads(content_text)
+                # Extract text from various fields if available
+                extracted_text = ""
+                for field in ['facebook', 'instagram', 'linkedin', 'tiktok']:
+                    if field in content_json:
+                        extracted_text += " " + str(content_json.get(field, ""))
+                content_text = extracted_text if extracted_text else content_text
+        except:
+            # If JSON parsing fails, use the original text
+            pass
+        
+        # Limit content text to reduce token usage
+        return content_text[:500]  # Limit to 500 chars
+    
     def retrieve_related_content(self, topic, limit=3):
         """
         Retrieve related content for a given topic.
@@ -346,9 +507,14 @@ class RAGService:
             list: List of related content
         """
         try:
-            # Skip vector search entirely since it's not working
+            # Tìm kết hợp từ khoá (BM25) và vector khi chỉ mục của content đã được nạp
+            result = self.hybrid_search("content", topic, limit)
+            if result is not None and result["sources"]:
+                texts = [self._content_text(item) for item in self._fetch_in_order("content", result["ids"], CONTENT_TEXT_FIELDS)]
+                return [text for text in texts if text]
+            
             # Use a simple keyword-based approach instead
-            content_items = fetch_data("content", limit=20)  # Get more items to filter
+            content_items = select_rows("content", limit=20)  # Get more items to filter
             
             if not content_items:
                 # If no content items found, return empty list
@@ -360,25 +526,8 @@ class RAGService:
             # Score content items by keyword overlap
             scored_items = []
             for item in content_items:
-                content_text = item.get("content", "")
-                if isinstance(content_text, str):
-                    # Try to parse JSON if it looks like JSON
-                    try:
-                        if content_text.strip().startswith('{'):
-                            content_json = json.loads(content_text)
-                            # Extract text from various fields if available
-                            extracted_text = ""
-                            for field in ['facebook', 'instagram', 'linkedin', 'tiktok']:
-                                if field in content_json:
-                                    extracted_text += " " + str(content_json.get(field, ""))
-                            content_text = extracted_text if extracted_text else content_text
-                    except:
-                        # If JSON parsing fails, use the original text
-                        pass
-                        
-                    # Limit content text to reduce token usage
-                    content_text = content_text[:500]  # Limit to 500 chars
-                    
+                content_text = self._content_text(item)
+                if content_text is not None:
                     content_words = set(content_text.lower().split())
                     # Score is the number of overlapping words
                     overlap = len(topic_words.intersection(content_words))
@@ -401,14 +550,14 @@ class RAGService:
         Returns:
             str: Formatted brand information
         """
-        brand_data = fetch_data("brands", f"id = '{brand_id}'")
+        brand_data = select_rows("brands", {"id": brand_id})
         if not brand_data:
             return None
         
         brand = brand_data[0]
         
         # Get brand knowledge if available
-        brand_knowledge = fetch_data("brand_knowledge", f"brand_id = '{brand_id}'")
+        brand_knowledge = select_rows("brand_knowledge", {"brand_id": brand_id})
         
         brand_info = f"Tên thương hiệu: {brand.get('name', '')}\n"
         brand_info += f"Mô tả: {brand.get('description', '')}\n"
@@ -434,8 +583,7 @@ class RAGService:
         
         if product_id:
             # Fetch specific product from database
-            from app.utils.database import fetch_data
-            products = fetch_data("products", f"id = '{product_id}'")
+            products = select_rows("products", {"id": product_id}, columns=get_projection("products"))
             if products:
                 product = products[0]
                 product_context = f"Tên sản phẩm: {product.get('name', '')}\nMô tả: {product.get('description', '')}"
@@ -451,7 +599,7 @@ class RAGService:
         topic_generator = self.create_topic_generator(product_context)
         return topic_generator()
     
-    def generate_topics_for_brand_product(self, product_id, brand_id, count=3):
+    def generate_topics_for_brand_product(self, product_id, brand_id, count=3, tenant=None):
         """
         Generate multiple topics for a product from a specific brand.
         
@@ -459,12 +607,13 @@ class RAGService:
             product_id (str): ID of the product to base topics on
             brand_id (str): ID of the brand
             count (int): Number of topics to generate
+            tenant (str, optional): Semantic cache scope, defaults to the brand ID
             
         Returns:
             dict: JSON object with generated topics
         """
         # Fetch product information
-        product_data = fetch_data("products", f"id = '{product_id}'")
+        product_data = select_rows("products", {"id": product_id}, columns=get_projection("products"))
         if not product_data:
             return {
                 "error": "Không tìm thấy sản phẩm",
@@ -493,7 +642,9 @@ class RAGService:
             brand_info = "Không có thông tin về thương hiệu."
         
         # Create and execute multiple topics generator
-        topics_generator = self.create_multiple_topics_generator(product_context, brand_info, count)
+        topics_generator = self.create_multiple_topics_generator(
+            product_context, brand_info, count, tenant=tenant or brand_id, product_id=product_id
+        )
         return topics_generator()
     
     def generate_content_from_topic(self, topic, with_related=True, max_retries=3):
@@ -546,34 +697,50 @@ class RAGService:
                 print(f"Unexpected error in content generation: {str(e)}")
                 raise
 
-    def generate_topic_from_context(self, product_context, brand_info=None, previous_topics=None, prompt=None):
+    def generate_topic_from_context(self, product_context, brand_info=None, previous_topics=None, prompt=None, tenant=None,
+                                    product_id=None):
         """
         Generate a topic based on all available context.
         
+        A near-identical earlier request of the same tenant for the same product, prompt
+        and set of previous topics (in any order) is answered from the semantic cache.
+        
         Args:
             product_context (str): Product information
             brand_info (str, optional): Brand information
             previous_topics (list, optional): List of previous topics
             prompt (str, optional): Additional prompt instructions
+            tenant (str, optional): Cache scope, e.g. the brand ID; no caching without one
+            product_id (str, optional): Product the topic is for, part of the cache scope
             
         Returns:
             str: Generated topic
         """
-        # Create topic generator with all context
-        topic_generator = self.create_topic_generator(
-            product_context=product_context,
-            brand_info=brand_info,
-            previous_topics=previous_topics
+        def generate():
+            # Create topic generator with all context
+            topic_generator = self.create_topic_generator(
+                product_context=product_context,
+                brand_info=brand_info,
+                previous_topics=previous_topics
+            )
+            
+            # Generate topic
+            topic = topic_generator()
+            
+            # If prompt is provided, validate/refine the topic
+            if prompt:
+                topic = self.refine_topic_with_prompt(topic, prompt)
+            
+            return topic
+        
+        return semantic_cache.get_or_compute(
+            (tenant, "topic", product_id, exact_key(prompt), exact_key(previous_topics)),
+            canonical_request(product_info=product_context, brand_info=brand_info),
+            self.embedding_service.generate_embedding,
+            generate,
+            # create_topic_generator trả lỗi dưới dạng chuỗi, không cache các chuỗi này
+            cacheable=lambda topic: bool(topic) and not topic.startswith(("Error generating topic", "OpenAI API quota exceeded"))
         )
-        
-        # Generate topic
-        topic = topic_generator()
-        
-        # If prompt is provided, validate/refine the topic
-        if prompt:
-            topic = self.refine_topic_with_prompt(topic, prompt)
-        
-        return topic 
 
     def refine_topic_with_prompt(self, topic, prompt):
         """
@@ -652,7 +819,7 @@ class RAGService:
             image_description = self.openai.invoke(formatted_prompt).content
             
             # Sử dụng OpenAI API để tạo ảnh
-            client = OpenAI(api_key=OPENAI_API_KEY)
+            client = clients.openai()
             response = client.images.generate(
                 model="dall-e-3",
                 prompt=image_description,
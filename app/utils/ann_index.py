@@ -0,0 +1,460 @@
+import threading
+from datetime import timedelta
+
+import numpy as np
+
+from config.settings import (
+    ANN_NLIST, ANN_NPROBE, ANN_MIN_TRAIN_SIZE, ANN_INDEX_TABLES, ANN_SYNC_OVERLAP, EMBEDDING_SNAPSHOT_ENABLED,
+    EMBEDDING_QUANTIZATION
+)
+from app.utils.database import db_connection, database_now, has_column, quote_identifier
+from app.utils.query_cache import query_cache
+from app.utils.embedding_snapshot import invalidate_snapshot
+from app.utils.vector_search import parse_embedding, normalize_rows, top_k_indices, QuantizedMatrix, select_matches
+
+# Các dòng đã xoá được giữ lại trong embedding_deletions trong khoảng này để mọi worker kịp đồng bộ
+DELETION_RETENTION = "1 day"
+
+class IVFFlatIndex:
+    """
+    In-process approximate nearest-neighbour index (IVF-flat, cosine similarity).
+
+    Vectors are normalized and grouped into ``nlist`` clusters with spherical k-means.
+    A query scores the centroids, then only the vectors of the ``nprobe`` closest
+    clusters. Raising ``nprobe`` trades latency for recall; ``nprobe >= nlist`` is an
+    exact search. Below ``min_train_size`` vectors the index is not clustered at all and
+    every search is exact.
+
+    Vectors can be added, replaced and removed one at a time, so the index follows the
+    embedding writes without a rebuild. Clusters are not retrained on updates; call
+    build() again (e.g. on restart) if the data drifts a lot.
+
+    With ``quantization`` "float16" or "int8" the vectors are held in that compact form
+    and the candidates are ranked on approximate scores. The best ``k * rescore_factor``
+    are then rescored in float32 against the array given to build(normalized=True)
+    (the shared snapshot mmap, so only the shortlisted rows are paged in) or, for
+    vectors upserted later, against a float32 copy kept for them. An index built from
+    in-memory vectors keeps no float32 source and returns the approximate scores.
+    """
+
+    def __init__(self, nlist=ANN_NLIST, nprobe=ANN_NPROBE, min_train_size=ANN_MIN_TRAIN_SIZE,
+                 quantization=EMBEDDING_QUANTIZATION):
+        """
+        Args:
+            nlist (int): Number of clusters, 0 picks about sqrt(n) at build time
+            nprobe (int): Default number of clusters scanned per query
+            min_train_size (int): Stay exact (one cluster) below this many vectors
+            quantization (str): Storage of the vectors: "float32", "float16" or "int8"
+        """
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.quantization = quantization
+        self.dim = None
+        self._lock = threading.RLock()
+        self._vectors = QuantizedMatrix(quantization)
+        # Nguồn float32 để chấm lại điểm khi lượng tử hoá: ma trận snapshot + vector ghi sau build
+        self._rescore_source = None
+        self._exact = {}
+        self._ids = []
+        self._rows = {}
+        self._free_rows = []
+        self._centroids = None
+        self._assignments = np.empty(0, dtype=np.int32)
+        self._members = [[]]
+        self._member_arrays = {}
+        # Thời điểm (theo đồng hồ database) mà index đã phản ánh đủ các thay đổi, xem sync_ann_index()
+        self.synced_at = None
+
+    def __len__(self):
+        return len(self._rows)
+
+    @property
+    def trained(self):
+        return self._centroids is not None
+
+    def _reserve(self, rows_needed):
+        # Tăng dung lượng theo cấp số nhân để thêm từng vector vẫn rẻ
+        capacity = len(self._vectors)
+        if rows_needed <= capacity:
+            return
+        self._vectors.reserve(rows_needed)
+        assignments = np.full(len(self._vectors), -1, dtype=np.int32)
+        assignments[:capacity] = self._assignments
+        self._assignments = assignments
+
+    def _kmeans(self, vectors, nlist, iterations=10, seed=0):
+        """
+        Spherical k-means on a sample of the (normalized) vectors. Returns the centroids.
+        """
+        rng = np.random.default_rng(seed)
+        sample_size = min(len(vectors), nlist * 64)
+        sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))], dtype=np.float32)
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for cluster in range(nlist):
+                members = sample[labels == cluster]
+                # Cụm rỗng giữ nguyên centroid cũ
+                if len(members):
+                    centroids[cluster] = members.sum(axis=0)
+            centroids = normalize_rows(centroids)
+        return centroids
+
+    def _assign(self, vectors, chunk_size=8192):
+        if self._centroids is None:
+            return np.zeros(len(vectors), dtype=np.int32)
+        labels = [
+            np.argmax(np.asarray(vectors[start:start + chunk_size], dtype=np.float32) @ self._centroids.T, axis=1)
+            for start in range(0, len(vectors), chunk_size)
+        ]
+        return np.concatenate(labels).astype(np.int32) if labels else np.empty(0, dtype=np.int32)
+
+    def _rebuild_members(self):
+        nlist = len(self._centroids) if self._centroids is not None else 1
+        self._members = [[] for _ in range(nlist)]
+        for row in self._rows.values():
+            self._members[self._assignments[row]].append(row)
+        self._member_arrays = {}
+
+    def _train(self, vectors, size):
+        """
+        Cluster ``vectors`` (normalized, array-like) and reassign every stored row.
+        """
+        nlist = self.nlist or int(np.sqrt(size))
+        if size >= self.min_train_size and nlist > 1:
+            self._centroids = self._kmeans(vectors, min(nlist, size))
+        else:
+            self._centroids = None
+        self._assignments = self._assign(self._vectors)
+        for row in self._free_rows:
+            self._assignments[row] = -1
+        self._rebuild_members()
+
+    def build(self, ids, vectors, normalized=False):
+        """
+        Replace the index contents and train the clusters.
+
+        Args:
+            ids (list): Record IDs, one per vector
+            vectors: 2-D array-like of embeddings
+            normalized (bool): The rows are already unit length; the array (e.g. a
+                read-only snapshot mmap) is then used as is in float32 mode (float32 or
+                float16 snapshot), and as the rescoring source when quantized. Later
+                upserts never write to it, see QuantizedMatrix
+        """
+        ids = [str(record_id) for record_id in ids]
+        if not ids:
+            vectors = None
+        elif normalized:
+            vectors = np.asarray(vectors)
+        else:
+            vectors = normalize_rows(np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1))
+
+        with self._lock:
+            self._ids = list(ids)
+            self._rows = {record_id: row for row, record_id in enumerate(ids)}
+            self._free_rows = []
+            self._exact = {}
+            if vectors is None:
+                self._vectors = QuantizedMatrix(self.quantization, self.dim or 0)
+                self._rescore_source = None
+                self._assignments = np.empty(0, dtype=np.int32)
+                self._centroids = None
+                self._rebuild_members()
+                return
+
+            self.dim = vectors.shape[1]
+            self._vectors = QuantizedMatrix.encode(vectors, self.quantization)
+            self._rescore_source = vectors if normalized and self.quantization != "float32" else None
+            self._train(vectors, len(ids))
+
+    def upsert(self, record_id, vector):
+        """
+        Add a vector, or replace the vector stored for ``record_id``.
+        """
+        record_id = str(record_id)
+        vector = normalize_rows(np.asarray(vector, dtype=np.float32).reshape(1, -1))
+
+        with self._lock:
+            if self.dim is None:
+                self.dim = vector.shape[1]
+                self._vectors = QuantizedMatrix(self.quantization, self.dim)
+            if vector.shape[1] != self.dim:
+                raise ValueError(f"Expected a vector of dimension {self.dim}, got {vector.shape[1]}")
+
+            row = self._rows.get(record_id)
+            if row is not None:
+                self._detach(row)
+            elif self._free_rows:
+                row = self._free_rows.pop()
+            else:
+                row = len(self._ids)
+                self._ids.append(None)
+                self._reserve(row + 1)
+
+            self._ids[row] = record_id
+            self._rows[record_id] = row
+            # Ma trận từ snapshot mmap chỉ đọc: set_row ghi vào overlay, không sao chép mmap
+            self._vectors.set_row(row, vector[0])
+            if self.quantization != "float32":
+                self._exact[row] = vector[0]
+            cluster = int(self._assign(vector)[0])
+            self._assignments[row] = cluster
+            self._members[cluster].append(row)
+            self._member_arrays.pop(cluster, None)
+
+            # Đủ dữ liệu thì phân cụm lần đầu
+            if self._centroids is None and len(self._rows) >= self.min_train_size and (self.nlist or 2) > 1:
+                live_rows = np.asarray(sorted(self._rows.values()), dtype=np.int64)
+                self._train(self._vectors.decode(live_rows), len(live_rows))
+
+    def _detach(self, row):
+        cluster = int(self._assignments[row])
+        self._members[cluster].remove(row)
+        self._member_arrays.pop(cluster, None)
+        self._assignments[row] = -1
+
+    def remove(self, record_id):
+        """
+        Drop the vector stored for ``record_id`` (no-op if absent).
+        """
+        with self._lock:
+            row = self._rows.pop(str(record_id), None)
+            if row is None:
+                return
+            self._detach(row)
+            self._ids[row] = None
+            self._exact.pop(row, None)
+            self._free_rows.append(row)
+
+    def _cluster_rows(self, cluster):
+        rows = self._member_arrays.get(cluster)
+        if rows is None:
+            rows = np.asarray(self._members[cluster], dtype=np.int64)
+            self._member_arrays[cluster] = rows
+        return rows
+
+    def _exact_vectors(self, rows):
+        """
+        Float32 vectors of the given rows for rescoring: the upserted copy, else the
+        build source, else the decoded codes.
+        """
+        vectors = self._vectors.decode(rows)
+        source = self._rescore_source
+        for position, row in enumerate(rows):
+            row = int(row)
+            exact = self._exact.get(row)
+            if exact is not None:
+                vectors[position] = exact
+            elif source is not None and row < len(source):
+                vectors[position] = source[row]
+        return vectors
+
+    def search(self, query_vector, k=10, nprobe=None, threshold=None):
+        """
+        Approximate top-k cosine search.
+
+        Args:
+            query_vector: Query embedding
+            k (int): Number of neighbours to return
+            nprobe (int, optional): Clusters to scan, defaults to the index setting
+            threshold (float, optional): Minimum similarity score
+
+        Returns:
+            list: (record id, score) pairs, best first
+        """
+        query = normalize_rows(np.asarray(query_vector, dtype=np.float32).reshape(1, -1))[0]
+
+        with self._lock:
+            if not self._rows:
+                return []
+            if self._centroids is None:
+                candidates = self._cluster_rows(0)
+            else:
+                probes = top_k_indices(self._centroids @ query, max(1, nprobe or self.nprobe))
+                candidates = np.concatenate([self._cluster_rows(int(cluster)) for cluster in probes])
+            if not len(candidates):
+                return []
+
+            scores = self._vectors.scores(query.reshape(1, -1), candidates)[0]
+            exact_scores = None
+            if self.quantization != "float32" and (self._rescore_source is not None or self._exact):
+                exact_scores = lambda positions: self._exact_vectors(candidates[positions]) @ query
+            matches = select_matches(scores, exact_scores, threshold, k)
+            return [(self._ids[candidates[position]], score) for position, score in matches]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._rows),
+                "dim": self.dim,
+                "trained": self._centroids is not None,
+                "nlist": len(self._members),
+                "nprobe": self.nprobe,
+                "quantization": self.quantization,
+                "rescoring": self.quantization != "float32" and (self._rescore_source is not None or bool(self._exact)),
+                "memory_bytes": int(self._vectors.nbytes),
+                "overlay_rows": self._vectors.overlay_rows,
+                "synced_at": self.synced_at.isoformat() if self.synced_at is not None else None
+            }
+
+ann_indexes = {}
+_embedding_service = None
+
+def get_ann_index(table_name):
+    """
+    The loaded index for a table, or None if it was never loaded.
+    """
+    return ann_indexes.get(table_name)
+
+def load_ann_index(table_name, column="embedding"):
+    """
+    Build the ANN index of a table from the vectors stored in the database.
+
+    With EMBEDDING_SNAPSHOT_ENABLED the vectors come from the shared memory-mapped
+    snapshot (built from the table only when missing or stale) instead of a table scan,
+    and the rows written or deleted since the snapshot was taken are applied on top
+    (see sync_ann_index()).
+
+    Args:
+        table_name (str): Table with an ``id`` and a vector column
+        column (str): Name of the vector column
+
+    Returns:
+        IVFFlatIndex: The loaded index, also registered for get_ann_index()
+    """
+    global _embedding_service
+    if _embedding_service is None:
+        from app.services.embedding_service import EmbeddingService
+        _embedding_service = EmbeddingService()
+    index = IVFFlatIndex()
+
+    if EMBEDDING_SNAPSHOT_ENABLED:
+        snapshot = _embedding_service.load_embedding_snapshot(table_name, column)
+        index.build(snapshot.ids, snapshot.matrix, normalized=True)
+        started_at = snapshot.synced_at
+    else:
+        # Lấy mốc trước khi đọc vector: các thay đổi xảy ra trong lúc nạp sẽ được đồng bộ sau
+        started_at = database_now()
+        ids = []
+        blocks = []
+        for chunk_ids, block in _embedding_service.iter_embeddings_from_db(table_name, column):
+            ids.extend(chunk_ids)
+            blocks.append(block)
+        index.build(ids, np.concatenate(blocks) if blocks else [])
+
+    index.synced_at = started_at
+    ann_indexes[table_name] = index
+    if EMBEDDING_SNAPSHOT_ENABLED:
+        # Snapshot có thể đã cũ: nạp ngay các vector được ghi hoặc xoá sau khi nó được tạo
+        applied = sync_ann_index(table_name, column)
+        if applied is None:
+            print(f"Embedding snapshot of {table_name} may miss recent writes: run scripts/add_embedding_sync_tracking.sql")
+    print(f"ANN index for {table_name}: {len(index)} vectors, {index.stats()['nlist']} clusters")
+    return index
+
+def load_ann_indexes(tables=ANN_INDEX_TABLES):
+    """
+    Load the indexes of all configured tables. A table that fails to load is skipped
+    and retrieval on it falls back to the database path.
+    """
+    for table_name in tables:
+        try:
+            load_ann_index(table_name)
+        except Exception as e:
+            print(f"Error loading ANN index for {table_name}: {e}")
+
+def ann_upsert(table_name, record_id, embedding):
+    """
+    Keep a loaded index in step with an embedding write. Never raises.
+    """
+    _snapshot_outdated(table_name)
+    index = ann_indexes.get(table_name)
+    if index is None or embedding is None:
+        return
+    try:
+        index.upsert(record_id, parse_embedding(embedding))
+    except Exception as e:
+        print(f"Error updating ANN index for {table_name}: {e}")
+
+def ann_remove(table_name, record_id):
+    """
+    Drop a deleted record from a loaded index. Never raises.
+    """
+    _snapshot_outdated(table_name)
+    index = ann_indexes.get(table_name)
+    if index is None:
+        return
+    try:
+        index.remove(record_id)
+        query_cache.invalidate(table_name)
+    except Exception as e:
+        print(f"Error updating ANN index for {table_name}: {e}")
+
+def _snapshot_outdated(table_name):
+    """
+    Without change tracking a reused snapshot cannot be caught up, so a write through
+    this process makes the next startup rebuild it instead.
+    """
+    if not EMBEDDING_SNAPSHOT_ENABLED:
+        return
+    try:
+        if not has_column(table_name, "embedding_updated_at"):
+            invalidate_snapshot(table_name)
+    except Exception as e:
+        print(f"Error invalidating the embedding snapshot of {table_name}: {e}")
+
+def sync_ann_index(table_name, column="embedding", overlap=ANN_SYNC_OVERLAP):
+    """
+    Apply the vector writes and deletions made since the last sync (by any process) to a loaded index.
+
+    ann_upsert() only updates the index of the process that did the write; this
+    catches up with the others. Needs scripts/add_embedding_sync_tracking.sql: rows
+    whose ``embedding_updated_at`` is newer than the index's ``synced_at`` are re-read
+    and rows listed in ``embedding_deletions`` are dropped. The window reaches back
+    ``overlap`` extra seconds, so writes that committed late are not missed; applying
+    a write twice is harmless.
+
+    Returns:
+        int: Records upserted or removed, or None if the index is not loaded or tracking is not set up
+    """
+    index = ann_indexes.get(table_name)
+    if index is None or index.synced_at is None or not has_column(table_name, "embedding_updated_at"):
+        return None
+
+    since = index.synced_at - timedelta(seconds=overlap)
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            # NOW() là thời điểm bắt đầu transaction, trước cả hai truy vấn bên dưới
+            cursor.execute("SELECT NOW() AS now")
+            synced_at = cursor.fetchone()["now"]
+            cursor.execute(
+                f"SELECT id::text AS id, {quote_identifier(column)}::text AS embedding "
+                f"FROM {quote_identifier(table_name)} WHERE embedding_updated_at > %s",
+                (since,)
+            )
+            changed = cursor.fetchall()
+            cursor.execute(
+                "SELECT record_id FROM embedding_deletions WHERE table_name = %s AND deleted_at > %s",
+                (table_name, since)
+            )
+            deleted = [row["record_id"] for row in cursor.fetchall()]
+            cursor.execute(f"DELETE FROM embedding_deletions WHERE deleted_at < NOW() - INTERVAL '{DELETION_RETENTION}'")
+            conn.commit()
+        finally:
+            cursor.close()
+
+    for row in changed:
+        if row["embedding"] is None:
+            index.remove(row["id"])
+        else:
+            index.upsert(row["id"], parse_embedding(row["embedding"]))
+    for record_id in deleted:
+        index.remove(record_id)
+    index.synced_at = synced_at
+    if changed or deleted:
+        query_cache.invalidate(table_name)
+    return len(changed) + len(deleted)
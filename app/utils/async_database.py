@@ -0,0 +1,253 @@
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+
+import asyncpg
+from config.settings import (
+    DB_HOST, DB_NAME, DB_USER, DB_PASSWORD, DB_PORT,
+    DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT, DB_POOL_MAX_LIFETIME,
+    DB_STATEMENT_CACHE_SIZE
+)
+from app.utils.database import (
+    build_select, build_insert, restore_input_order, resolve_projection, schema_cache, has_list_filter,
+    SCHEMA_COLUMNS_QUERY, MAX_QUERY_PARAMS
+)
+
+_pool = None
+_pool_lock = asyncio.Lock()
+
+class AgedConnection(asyncpg.Connection):
+    """
+    asyncpg connection that remembers when it was opened, so it can be recycled by age.
+
+    asyncpg's ``max_inactive_connection_lifetime`` only closes connections that sit
+    idle; a busy connection would otherwise live forever.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.created_at = time.monotonic()
+
+def _is_expired(conn):
+    created_at = getattr(conn, "created_at", None)
+    return DB_POOL_MAX_LIFETIME > 0 and created_at is not None and time.monotonic() - created_at > DB_POOL_MAX_LIFETIME
+
+async def _init_connection(conn):
+    """
+    Register type codecs so rows look the same as the psycopg2 RealDictCursor rows
+    the rest of the code base expects: UUIDs as strings and JSON already decoded.
+    """
+    await conn.set_type_codec("uuid", encoder=str, decoder=str, schema="pg_catalog", format="text")
+    for json_type in ("json", "jsonb"):
+        await conn.set_type_codec(json_type, encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+async def get_async_pool():
+    """
+    Return the process-wide asyncpg pool, creating it on first use.
+    """
+    global _pool
+    if _pool is None:
+        async with _pool_lock:
+            if _pool is None:
+                try:
+                    _pool = await asyncpg.create_pool(
+                        host=DB_HOST,
+                        port=int(DB_PORT),
+                        database=DB_NAME if DB_NAME else 'postgres',
+                        user=DB_USER,
+                        password=DB_PASSWORD,
+                        ssl='require',
+                        min_size=DB_POOL_MIN_SIZE,
+                        max_size=DB_POOL_MAX_SIZE,
+                        timeout=DB_POOL_TIMEOUT,
+                        statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+                        server_settings={'statement_timeout': '60000'},  # 60 seconds timeout
+                        init=_init_connection,
+                        connection_class=AgedConnection
+                    )
+                except Exception as e:
+                    print(f"Error creating the async database pool: {e}")
+                    raise
+    return _pool
+
+async def close_async_pool():
+    """
+    Close the asyncpg pool. Called on application shutdown.
+    """
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+@asynccontextmanager
+async def async_db_connection():
+    """
+    Acquire a connection from the asyncpg pool for the duration of the block.
+
+    Use ``async with conn.transaction():`` inside the block for writes that must commit together.
+    A connection older than DB_POOL_MAX_LIFETIME is closed instead of going back to
+    the pool; the pool opens a fresh one on a later acquire.
+
+    Example:
+        async with async_db_connection() as conn:
+            brand = await conn.fetchrow("SELECT * FROM brands WHERE id = $1", brand_id)
+    """
+    pool = await get_async_pool()
+    conn = await pool.acquire(timeout=DB_POOL_TIMEOUT)
+    try:
+        yield conn
+    finally:
+        if _is_expired(conn) and not conn.is_closed():
+            try:
+                await conn.close(timeout=DB_POOL_TIMEOUT)
+            except Exception:
+                conn.terminate()
+        await pool.release(conn)
+
+async def get_db_session():
+    """
+    FastAPI dependency yielding one pooled connection for the whole request.
+
+    FastAPI caches dependencies per request, so the auth dependency and the handler
+    that both declare ``Depends(get_db_session)`` receive the same connection. It goes
+    back to the pool once the request is done. Wrap multi-statement writes in
+    ``async with conn.transaction():`` so they commit atomically.
+
+    Example:
+        @router.get("/")
+        async def handler(current_user = Depends(auth_controller.get_current_user),
+                          conn = Depends(get_db_session)):
+            ...
+    """
+    async with async_db_connection() as conn:
+        yield conn
+
+def record_to_dict(record):
+    """
+    Convert an asyncpg Record to a plain dict (None stays None).
+    """
+    return dict(record) if record is not None else None
+
+def records_to_dicts(records):
+    """
+    Convert a list of asyncpg Records to a list of dicts.
+    """
+    return [dict(record) for record in records]
+
+async def async_fetch_data(table_name, condition=None, limit=None, params=()):
+    """
+    Async equivalent of fetch_data: fetch rows from a table without blocking the event loop.
+
+    Args:
+        table_name (str): The name of the table to query
+        condition (str, optional): SQL WHERE condition, may use $1, $2... placeholders
+        limit (int, optional): Limit the number of records to return
+        params (sequence, optional): Values for the placeholders in condition
+
+    Returns:
+        list: List of records as dictionaries
+    """
+    query = f"SELECT * FROM {table_name}"
+    if condition:
+        query += f" WHERE {condition}"
+    if limit:
+        query += f" LIMIT {int(limit)}"
+
+    async with async_db_connection() as conn:
+        rows = await conn.fetch(query, *params)
+
+    return records_to_dicts(rows)
+
+async def async_select_rows(table_name, filters=None, columns=None, order_by=None, limit=None, offset=None, conn=None):
+    """
+    Async equivalent of select_rows: parameterized filters, projection and ordering.
+
+    asyncpg keeps a prepared statement per SQL text on each connection, and
+    build_select() produces one SQL text per query shape, so repeated lookups are
+    parsed and planned once per connection.
+
+    Args:
+        conn (optional): Connection to run on (e.g. the request session), a pooled one is used if omitted
+
+    Returns:
+        list: List of records as dictionaries
+    """
+    column_types = await async_get_column_types(table_name, conn) if has_list_filter(filters) else None
+    query, params = build_select(table_name, filters, columns, order_by, limit, offset, column_types)
+    if conn is not None:
+        return records_to_dicts(await conn.fetch(query, *params))
+    async with async_db_connection() as conn:
+        return records_to_dicts(await conn.fetch(query, *params))
+
+async def async_select_one(table_name, filters=None, columns=None, order_by=None, conn=None):
+    """
+    Fetch the first matching row as a dict, or None.
+    """
+    rows = await async_select_rows(table_name, filters, columns, order_by, limit=1, conn=conn)
+    return rows[0] if rows else None
+
+async def async_insert_rows(table_name, rows, returning=None, conn=None):
+    """
+    Insert many rows in one multi-row INSERT statement (split only past the bind parameter limit).
+
+    All rows must have the same keys. The statements run in one transaction, so
+    either every row is written or none is.
+
+    Args:
+        table_name (str): The name of the table
+        rows (list): List of dicts mapping column name to value
+        returning (list or str, optional): Columns to return, or "*"
+        conn (optional): Connection to run on (e.g. the request session), a pooled one is used if omitted
+
+    Returns:
+        list: Returned rows as dicts, in input order when the rows carry an ``id``
+    """
+    if not rows:
+        return []
+    columns = list(rows[0].keys())
+    rows_per_statement = max(MAX_QUERY_PARAMS // len(columns), 1)
+
+    async def run(conn):
+        returned = []
+        async with conn.transaction():
+            for start in range(0, len(rows), rows_per_statement):
+                chunk = rows[start:start + rows_per_statement]
+                query = build_insert(table_name, columns, len(chunk), returning)
+                params = [row[column] for row in chunk for column in columns]
+                returned.extend(await conn.fetch(query, *params))
+        return restore_input_order(rows, records_to_dicts(returned))
+
+    if conn is not None:
+        return await run(conn)
+    async with async_db_connection() as conn:
+        return await run(conn)
+
+async def async_get_column_types(table_name, conn=None):
+    """
+    Async lookup in the shared schema cache; loads column names and data types through asyncpg on a miss.
+    """
+    column_types = schema_cache.peek_types(table_name)
+    if column_types is not None:
+        return column_types
+
+    if conn is not None:
+        rows = await conn.fetch(SCHEMA_COLUMNS_QUERY, table_name)
+    else:
+        async with async_db_connection() as conn:
+            rows = await conn.fetch(SCHEMA_COLUMNS_QUERY, table_name)
+
+    column_types = {row["column_name"]: row["data_type"] for row in rows}
+    schema_cache.store(table_name, column_types)
+    return column_types
+
+async def async_get_table_columns(table_name, conn=None):
+    """
+    Async lookup of the column set of a table in the shared schema cache.
+    """
+    return frozenset(await async_get_column_types(table_name, conn))
+
+async def async_get_projection(table_name, fields=None, required=("id",), conn=None, include=()):
+    """
+    Column list for reading ``table_name`` without the embedding vector. See resolve_projection().
+    """
+    return resolve_projection(await async_get_table_columns(table_name, conn), fields, required, include)
@@ -0,0 +1,287 @@
+import json
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter
+
+import numpy as np
+
+from config.settings import BM25_K1, BM25_B, BM25_INDEX_TABLES
+from app.utils.database import select_rows, get_projection
+from app.utils.vector_search import top_k_indices
+from app.utils.query_cache import query_cache
+
+_WORD = re.compile(r"\w+")
+
+# Hư từ tiếng Việt phổ biến, không mang nghĩa khi tìm kiếm
+STOPWORDS = frozenset("""
+    và của là các những cho với có được trong này một để từ không thì đã rất cũng như khi
+    đến về bị nên vì nhưng hay hoặc mà thế theo tại trên dưới ra vào lại đó nào sẽ đang
+    the a an of and or to in on for with is are
+""".split())
+
+def fold_diacritics(text):
+    """
+    Strip Vietnamese diacritics ("sữa tươi" -> "sua tuoi"), so queries typed without accents still match.
+    """
+    decomposed = unicodedata.normalize("NFD", text.replace("đ", "d").replace("Đ", "D"))
+    return "".join(char for char in decomposed if unicodedata.category(char) != "Mn")
+
+def tokenize(text):
+    """
+    Vietnamese-aware terms of a text.
+
+    Vietnamese words are made of space-separated syllables ("sản phẩm"), so besides
+    every syllable the terms include each pair of adjacent syllables ("sản_phẩm"),
+    which favours documents containing the whole word. Syllables are lowercased and
+    NFC-normalized, and an accent-free form is added for each accented term. Stopwords
+    are dropped from the syllables but still form pairs.
+
+    Returns:
+        list: Terms, with repeats (term frequencies matter)
+    """
+    syllables = _WORD.findall(unicodedata.normalize("NFC", text or "").lower())
+    folded = [fold_diacritics(syllable) for syllable in syllables]
+    terms = []
+    for syllable, plain in zip(syllables, folded):
+        if syllable in STOPWORDS:
+            continue
+        terms.append(syllable)
+        if plain != syllable:
+            terms.append(plain)
+    for position in range(len(syllables) - 1):
+        pair = f"{syllables[position]}_{syllables[position + 1]}"
+        terms.append(pair)
+        plain_pair = f"{folded[position]}_{folded[position + 1]}"
+        if plain_pair != pair:
+            terms.append(plain_pair)
+    return terms
+
+def content_document(item):
+    """
+    Searchable text of a content record: its title plus its body, with the text of
+    every platform post when the body is JSON.
+    """
+    body = item.get("content") or ""
+    if isinstance(body, str) and body.strip().startswith("{"):
+        try:
+            body = json.loads(body)
+        except ValueError:
+            pass
+    if isinstance(body, dict):
+        body = " ".join(str(value) for value in body.values() if isinstance(value, (str, int, float)))
+    return f"{item.get('title') or ''}\n{body}"
+
+def product_document(product):
+    """
+    Searchable text of a product: the same text its embedding is built from.
+    """
+    from app.utils.product_embeddings import ProductEmbeddings
+    return ProductEmbeddings.build_product_text(product)
+
+class BM25Index:
+    """
+    In-process BM25 inverted index.
+
+    Postings map each term to {row: term frequency}, so a query only touches the
+    documents that share a term with it; scores are accumulated in a numpy array. Documents can be added, replaced and removed
+    one at a time; document frequencies and the average length follow every change.
+    """
+
+    def __init__(self, k1=BM25_K1, b=BM25_B):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._postings = {}
+        self._ids = []
+        self._rows = {}
+        self._lengths = np.zeros(0, dtype=np.float32)
+        self._terms = {}
+        self._free_rows = []
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self._rows)
+
+    def upsert(self, record_id, text):
+        """
+        Index a document, or replace the text indexed for ``record_id``.
+        """
+        record_id = str(record_id)
+        counts = Counter(tokenize(text))
+        with self._lock:
+            row = self._rows.get(record_id)
+            if row is not None:
+                self._detach(row)
+            elif self._free_rows:
+                row = self._free_rows.pop()
+            else:
+                row = len(self._ids)
+                self._ids.append(None)
+                if row >= len(self._lengths):
+                    lengths = np.zeros(max(64, 2 * len(self._lengths)), dtype=np.float32)
+                    lengths[:len(self._lengths)] = self._lengths
+                    self._lengths = lengths
+
+            self._ids[row] = record_id
+            self._rows[record_id] = row
+            for term, frequency in counts.items():
+                self._postings.setdefault(term, {})[row] = frequency
+            self._terms[row] = tuple(counts)
+            length = sum(counts.values())
+            self._lengths[row] = length
+            self._total_length += length
+
+    def _detach(self, row):
+        for term in self._terms.pop(row, ()):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(row, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= int(self._lengths[row])
+        self._lengths[row] = 0
+
+    def remove(self, record_id):
+        """
+        Drop the document indexed for ``record_id`` (no-op if absent).
+        """
+        with self._lock:
+            row = self._rows.pop(str(record_id), None)
+            if row is None:
+                return
+            self._detach(row)
+            self._ids[row] = None
+            self._free_rows.append(row)
+
+    def build(self, documents):
+        """
+        Replace the index contents.
+
+        Args:
+            documents (iterable): (record id, text) pairs
+        """
+        with self._lock:
+            self._reset()
+            for record_id, text in documents:
+                self.upsert(record_id, text)
+
+    def search(self, query, k=10):
+        """
+        Top-k documents by BM25 score.
+
+        Args:
+            query (str): Search text
+            k (int): Number of documents to return
+
+        Returns:
+            list: (record id, score) pairs, best first; documents sharing no term are left out
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            count = len(self._rows)
+            if not count or not terms:
+                return []
+            average_length = self._total_length / count or 1.0
+            norms = self.k1 * (1 - self.b + self.b * self._lengths[:len(self._ids)] / average_length)
+            scores = np.zeros(len(self._ids), dtype=np.float32)
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                rows = np.fromiter(postings.keys(), dtype=np.int64, count=len(postings))
+                frequencies = np.fromiter(postings.values(), dtype=np.float32, count=len(postings))
+                scores[rows] += idf * frequencies * (self.k1 + 1) / (frequencies + norms[rows])
+            matched = np.flatnonzero(scores)
+            best = matched[top_k_indices(scores[matched], k)]
+            return [(self._ids[row], float(scores[row])) for row in best]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._rows),
+                "terms": len(self._postings),
+                "average_length": self._total_length / len(self._rows) if self._rows else 0.0,
+                "k1": self.k1,
+                "b": self.b
+            }
+
+# Cách dựng văn bản tìm kiếm cho từng bảng
+DOCUMENT_BUILDERS = {
+    "content": content_document,
+    "products": product_document
+}
+
+bm25_indexes = {}
+
+def get_bm25_index(table_name):
+    """
+    The loaded BM25 index for a table, or None if it was never loaded.
+    """
+    return bm25_indexes.get(table_name)
+
+def load_bm25_index(table_name, chunk_size=1000):
+    """
+    Build the BM25 index of a table from every row, reading it in id order ``chunk_size`` rows at a time.
+
+    Returns:
+        BM25Index: The loaded index, also registered for get_bm25_index()
+    """
+    build_document = DOCUMENT_BUILDERS[table_name]
+    columns = get_projection(table_name)
+    index = BM25Index()
+    last_id = None
+    while True:
+        filters = {"id__gt": last_id} if last_id else None
+        rows = select_rows(table_name, filters, columns=columns, order_by=["id"], limit=chunk_size)
+        for row in rows:
+            index.upsert(row["id"], build_document(row))
+        if len(rows) < chunk_size:
+            break
+        last_id = str(rows[-1]["id"])
+
+    bm25_indexes[table_name] = index
+    print(f"BM25 index for {table_name}: {len(index)} documents, {index.stats()['terms']} terms")
+    return index
+
+def load_bm25_indexes(tables=BM25_INDEX_TABLES):
+    """
+    Load the BM25 indexes of all configured tables. A table that fails to load is
+    skipped and retrieval on it falls back to the database path.
+    """
+    for table_name in tables:
+        try:
+            load_bm25_index(table_name)
+        except Exception as e:
+            print(f"Error loading BM25 index for {table_name}: {e}")
+
+def bm25_upsert(table_name, record):
+    """
+    Keep a loaded index in step with a saved record. Never raises.
+    """
+    index = bm25_indexes.get(table_name)
+    if index is None or not record or record.get("id") is None:
+        return
+    try:
+        index.upsert(record["id"], DOCUMENT_BUILDERS[table_name](record))
+        query_cache.invalidate(table_name)
+    except Exception as e:
+        print(f"Error updating BM25 index for {table_name}: {e}")
+
+def bm25_remove(table_name, record_id):
+    """
+    Drop a deleted record from a loaded index. Never raises.
+    """
+    index = bm25_indexes.get(table_name)
+    if index is None:
+        return
+    try:
+        index.remove(record_id)
+        query_cache.invalidate(table_name)
+    except Exception as e:
+        print(f"Error updating BM25 index for {table_name}: {e}")
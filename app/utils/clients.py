@@ -0,0 +1,78 @@
+import threading
+
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from langchain_community.vectorstores import SupabaseVectorStore
+from openai import OpenAI
+
+from config.settings import OPENAI_API_KEY, EMBEDDING_MODEL
+from app.utils.database import get_supabase_client
+
+class ClientRegistry:
+    """
+    Process-wide registry of API clients, each created on first use and then reused.
+
+    OpenAI and Supabase clients hold their own HTTP connection pools, so building one
+    per request or per service instance throws away keep-alive connections and TLS
+    sessions. Clients are keyed by what makes them differ (model, temperature, table),
+    and every caller asking for the same key gets the same instance.
+    """
+
+    def __init__(self):
+        self._clients = {}
+        # Reentrant: a factory may ask for other clients (vector_store needs supabase and embeddings)
+        self._lock = threading.RLock()
+
+    def get(self, key, factory):
+        """
+        The client registered under ``key``, created with ``factory()`` on first use.
+        """
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = factory()
+                self._clients[key] = client
+            return client
+
+    def supabase(self):
+        return self.get(("supabase",), get_supabase_client)
+
+    def openai(self):
+        """
+        Raw OpenAI client (used for image generation).
+        """
+        return self.get(("openai",), lambda: OpenAI(api_key=OPENAI_API_KEY))
+
+    def chat_model(self, model, temperature):
+        return self.get(
+            ("chat", model, temperature),
+            lambda: ChatOpenAI(model_name=model, openai_api_key=OPENAI_API_KEY, temperature=temperature)
+        )
+
+    def embeddings(self, model=EMBEDDING_MODEL):
+        return self.get(("embeddings", model), lambda: OpenAIEmbeddings(model=model, openai_api_key=OPENAI_API_KEY))
+
+    def vector_store(self, table_name, query_name="match_embeddings", model=EMBEDDING_MODEL):
+        """
+        SupabaseVectorStore over ``table_name``, sharing the Supabase client and the embeddings client.
+        """
+        return self.get(
+            ("vector_store", table_name, query_name, model),
+            lambda: SupabaseVectorStore(
+                client=self.supabase(),
+                embedding=self.embeddings(model),
+                table_name=table_name,
+                query_name=query_name
+            )
+        )
+
+    def clear(self):
+        """
+        Forget every client, e.g. after rotating API keys; the next call creates new ones.
+        """
+        with self._lock:
+            self._clients.clear()
+
+clients = ClientRegistry()
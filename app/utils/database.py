@@ -1,7 +1,22 @@
+import itertools
+import os
+import re
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+from psycopg2.extras import RealDictCursor, execute_values
 from supabase import create_client
-from config.settings import SUPABASE_URL, SUPABASE_KEY, DB_HOST, DB_NAME, DB_USER, DB_PASSWORD, DB_PORT
+from config.settings import (
+    SUPABASE_URL, SUPABASE_KEY, DB_HOST, DB_NAME, DB_USER, DB_PASSWORD, DB_PORT,
+    DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT, DB_POOL_MAX_LIFETIME,
+    DB_POOL_HEALTH_CHECK_INTERVAL, DB_STATEMENT_CACHE_SIZE, DB_SCHEMA_CACHE_TTL
+)
 
 def get_supabase_client():
     """
@@ -9,54 +24,723 @@ def get_supabase_client():
     """
     return create_client(SUPABASE_URL, SUPABASE_KEY)
 
+class PooledConnection(extensions.connection):
+    """
+    psycopg2 connection that returns itself to its pool when closed.
+
+    Existing callers keep calling ``conn.close()`` in their ``finally`` blocks;
+    for a pooled connection that hands it back instead of tearing down the TLS session.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = None
+        self.in_use = False
+        self.created_at = time.monotonic()
+        self.last_used_at = self.created_at
+        self.finalizer = None
+        # SQL text -> server-side prepared statement name, in LRU order
+        self.prepared_statements = OrderedDict()
+
+    def close(self):
+        if self.pool is not None and self.in_use:
+            self.pool.release(self)
+        elif self.pool is None:
+            super().close()
+
+    def discard(self):
+        """Close the underlying connection for real."""
+        self.pool = None
+        self.in_use = False
+        super().close()
+
+class ConnectionPool:
+    """
+    Thread-safe pool of PostgreSQL connections.
+
+    Connections are checked for health when taken from the pool, recycled once they
+    exceed ``max_lifetime`` seconds and rolled back when returned with an open transaction.
+    A checked-out connection that is garbage collected without being closed gives its
+    slot back, so an error path that forgets ``close()`` cannot exhaust the pool.
+    """
+    def __init__(self, min_size, max_size, timeout, max_lifetime, health_check_interval, **connect_params):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_interval = health_check_interval
+        self.connect_params = connect_params
+        self._idle = []
+        self._size = 0
+        self._warmed = False
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def _connect(self):
+        conn = psycopg2.connect(connection_factory=PooledConnection, **self.connect_params)
+        conn.pool = self
+        return conn
+
+    def _is_expired(self, conn):
+        return self.max_lifetime > 0 and time.monotonic() - conn.created_at > self.max_lifetime
+
+    def _is_healthy(self, conn):
+        if conn.closed or self._is_expired(conn):
+            return False
+        if time.monotonic() - conn.last_used_at < self.health_check_interval:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _forget(self):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def _drop(self, conn):
+        try:
+            conn.discard()
+        except Exception:
+            pass
+        self._forget()
+
+    def _warm(self):
+        """Open ``min_size`` connections up front so the first requests find them warm."""
+        with self._cond:
+            if self._warmed:
+                return
+            self._warmed = True
+            missing = max(self.min_size - self._size, 0)
+            self._size += missing
+        opened = []
+        try:
+            for _ in range(missing):
+                opened.append(self._connect())
+        except Exception as e:
+            print(f"Error warming up the connection pool: {e}")
+        with self._cond:
+            self._size -= missing - len(opened)
+            self._idle.extend(opened)
+            self._cond.notify_all()
+
+    def getconn(self):
+        """
+        Take a healthy connection from the pool, opening a new one if below ``max_size``.
+
+        Raises:
+            PoolError: If no connection becomes available within ``timeout`` seconds
+        """
+        if not self._warmed:
+            self._warm()
+
+        deadline = time.monotonic() + self.timeout
+        while True:
+            conn = None
+            with self._cond:
+                if self._closed:
+                    raise PoolError("connection pool is closed")
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolError(f"no database connection available after {self.timeout}s")
+                    self._cond.wait(remaining)
+                if self._idle:
+                    conn = self._idle.pop()
+                else:
+                    self._size += 1
+
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._is_healthy(conn):
+                self._drop(conn)
+                continue
+
+            conn.in_use = True
+            conn.finalizer = weakref.finalize(conn, self._forget)
+            return conn
+
+    def release(self, conn):
+        """Return a connection to the pool, discarding it if it is broken or too old."""
+        conn.in_use = False
+        if conn.finalizer is not None:
+            conn.finalizer.detach()
+            conn.finalizer = None
+        if conn.closed or self._closed or self._is_expired(conn):
+            self._drop(conn)
+            return
+
+        if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except Exception:
+                self._drop(conn)
+                return
+
+        conn.last_used_at = time.monotonic()
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def closeall(self):
+        """Close every idle connection and refuse further checkouts."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._drop(conn)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "max_size": self.max_size
+            }
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def get_connection_pool():
+    """
+    Return the process-wide connection pool, creating it on first use.
+
+    The pool is rebuilt after a fork so uvicorn workers never share sockets.
+    """
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                _pool = ConnectionPool(
+                    min_size=DB_POOL_MIN_SIZE,
+                    max_size=DB_POOL_MAX_SIZE,
+                    timeout=DB_POOL_TIMEOUT,
+                    max_lifetime=DB_POOL_MAX_LIFETIME,
+                    health_check_interval=DB_POOL_HEALTH_CHECK_INTERVAL,
+                    host=DB_HOST,
+                    port=DB_PORT,  # Connection pooler port from settings
+                    database=DB_NAME if DB_NAME else 'postgres',
+                    user=DB_USER,
+                    password=DB_PASSWORD,
+                    sslmode='require',
+                    options='-c statement_timeout=60000',  # 60 seconds timeout
+                    cursor_factory=RealDictCursor
+                )
+                _pool_pid = pid
+    return _pool
+
+def close_connection_pool():
+    """
+    Close the process-wide connection pool. Called on application shutdown.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
 def get_db_connection():
     """
-    Create and return a connection to the PostgreSQL database using connection pooler.
+    Check out a connection to the PostgreSQL database from the connection pool.
+
+    Calling ``close()`` on the returned connection gives it back to the pool.
     """
     try:
-        # Connection parameters
-        params = {
-            'host': DB_HOST,
-            'port': DB_PORT,  # Connection pooler port from settings
-            'database': DB_NAME if DB_NAME else 'postgres',
-            'user': DB_USER,
-            'password': DB_PASSWORD,
-            'sslmode': 'require',
-            'options': '-c statement_timeout=60000',  # 60 seconds timeout
-            'cursor_factory': RealDictCursor
-        }
-        
-        conn = psycopg2.connect(**params)
-        return conn
+        return get_connection_pool().getconn()
     except Exception as e:
         print(f"Error connecting to the database: {e}")
         raise
 
+@contextmanager
+def db_connection():
+    """
+    Context manager that checks out a pooled connection and always returns it.
+
+    Uncommitted work is rolled back when the connection goes back to the pool,
+    so callers only need to call ``conn.commit()`` on success.
+
+    Example:
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+    """
+    conn = get_db_connection()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+@contextmanager
+def dedicated_connection():
+    """
+    Context manager for a connection opened outside the pool and closed on exit.
+
+    For work that keeps a connection for a long time or holds session-level state,
+    such as an advisory lock, without taking a pool slot or leaking the state into
+    a pooled connection.
+    """
+    conn = psycopg2.connect(**get_connection_pool().connect_params)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+def database_now():
+    """
+    Current time on the database clock (timezone-aware), for watermarks compared with database timestamps.
+    """
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT NOW() AS now")
+            return cursor.fetchone()["now"]
+        finally:
+            cursor.close()
+
 def fetch_data(table_name, condition=None, limit=None):
     """
     Fetch data from a specified table with optional conditions and limit.
-    
+
+    Prefer select_rows() for new code: it takes parameterized filters instead of
+    a raw SQL fragment and reuses a prepared statement per query shape.
+
     Args:
         table_name (str): The name of the table to query
         condition (str, optional): SQL WHERE condition
         limit (int, optional): Limit the number of records to return
-        
+
     Returns:
         list: List of records as dictionaries
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     query = f"SELECT * FROM {table_name}"
     if condition:
         query += f" WHERE {condition}"
     if limit:
         query += f" LIMIT {limit}"
-    
-    cursor.execute(query)
-    data = cursor.fetchall()
-    
-    cursor.close()
-    conn.close()
-    
-    return data 
\ No newline at end of file
+
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query)
+        data = cursor.fetchall()
+        cursor.close()
+
+    return data
+
+_IDENTIFIER_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_PLACEHOLDER_RE = re.compile(r"\$\d+")
+_FILTER_OPERATORS = {
+    "eq": "=",
+    "ne": "!=",
+    "lt": "<",
+    "lte": "<=",
+    "gt": ">",
+    "gte": ">=",
+}
+_statement_ids = itertools.count()
+
+def quote_identifier(name):
+    if not _IDENTIFIER_RE.match(name):
+        raise ValueError(f"Invalid SQL identifier: {name!r}")
+    return f'"{name}"'
+
+# Kiểu mảng cần ép rõ: psycopg2 gửi list chuỗi dưới dạng text[], Postgres không tự đổi sang uuid[]
+_ARRAY_CASTS = {"uuid": "uuid[]"}
+
+def _is_list_filter(key, value):
+    operator = key.partition("__")[2] or "eq"
+    return operator == "in" or (operator == "eq" and isinstance(value, (list, tuple)))
+
+def has_list_filter(filters):
+    """
+    Whether build_select() will turn any of ``filters`` into ``= ANY(...)``.
+    """
+    return any(_is_list_filter(key, value) for key, value in (filters or {}).items())
+
+def build_select(table_name, filters=None, columns=None, order_by=None, limit=None, offset=None, column_types=None):
+    """
+    Build a parameterized SELECT statement.
+
+    Filters map a column to a value, e.g. ``{"id": product_id}``. A list or tuple value
+    becomes ``= ANY(...)`` and None becomes ``IS NULL``. List filters on a uuid column
+    (per ``column_types``) become ``= ANY($n::uuid[])``: psycopg2 sends a list of strings
+    as text[], which Postgres does not compare with uuid. A ``__ne``, ``__lt``, ``__lte``,
+    ``__gt``, ``__gte``, ``__in`` or ``__isnull`` suffix on the column picks another
+    operator (``{"embedding__isnull": True}``). ``order_by`` takes column names, with a
+    leading ``-`` for descending order.
+
+    The SQL text depends only on the shape of the query (table, columns, filter keys,
+    ordering, whether limit/offset are set), never on the values, so the same statement
+    can be prepared once per connection and reused.
+
+    Args:
+        table_name (str): The name of the table to query
+        filters (dict, optional): Column filters, combined with AND
+        columns (list, optional): Columns to return, all columns if omitted
+        order_by (list, optional): Columns to sort by
+        limit (int, optional): Limit the number of records to return
+        offset (int, optional): Number of records to skip
+        column_types (dict, optional): Column name -> data type, see SchemaCache.get_column_types()
+
+    Returns:
+        tuple: (SQL with $1, $2... placeholders, list of parameter values)
+    """
+    params = []
+    select_list = ", ".join(quote_identifier(column) for column in columns) if columns else "*"
+    query = f"SELECT {select_list} FROM {quote_identifier(table_name)}"
+
+    column_types = column_types or {}
+    conditions = []
+    for key, value in (filters or {}).items():
+        name, _, operator = key.partition("__")
+        column = quote_identifier(name)
+        operator = operator or "eq"
+
+        if operator == "isnull":
+            conditions.append(f"{column} IS NULL" if value else f"{column} IS NOT NULL")
+        elif _is_list_filter(key, value):
+            params.append(list(value))
+            cast = _ARRAY_CASTS.get(column_types.get(name))
+            placeholder = f"${len(params)}::{cast}" if cast else f"${len(params)}"
+            conditions.append(f"{column} = ANY({placeholder})")
+        elif operator == "eq" and value is None:
+            conditions.append(f"{column} IS NULL")
+        elif operator in _FILTER_OPERATORS:
+            params.append(value)
+            conditions.append(f"{column} {_FILTER_OPERATORS[operator]} ${len(params)}")
+        else:
+            raise ValueError(f"Unsupported filter operator: {operator!r}")
+
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+
+    if order_by:
+        ordering = []
+        for column in order_by:
+            if column.startswith("-"):
+                ordering.append(f"{quote_identifier(column[1:])} DESC")
+            else:
+                ordering.append(quote_identifier(column))
+        query += " ORDER BY " + ", ".join(ordering)
+
+    if limit is not None:
+        params.append(int(limit))
+        query += f" LIMIT ${len(params)}"
+    if offset is not None:
+        params.append(int(offset))
+        query += f" OFFSET ${len(params)}"
+
+    return query, params
+
+def _execute_prepared(conn, query, params):
+    """
+    Run a $n-style query through a server-side prepared statement cached on the connection.
+
+    Falls back to a plain execute when the statement cache is disabled
+    (DB_STATEMENT_CACHE_SIZE=0, e.g. behind a transaction-mode pooler) or the
+    connection is not a pooled one.
+    """
+    cursor = conn.cursor()
+    try:
+        statements = getattr(conn, "prepared_statements", None)
+        if statements is None or DB_STATEMENT_CACHE_SIZE <= 0:
+            cursor.execute(_PLACEHOLDER_RE.sub("%s", query), params)
+            return cursor.fetchall()
+
+        name = statements.get(query)
+        if name is None:
+            name = f"select_{next(_statement_ids)}"
+            cursor.execute(f"PREPARE {name} AS {query}")
+            statements[query] = name
+            if len(statements) > DB_STATEMENT_CACHE_SIZE:
+                _, evicted = statements.popitem(last=False)
+                cursor.execute(f"DEALLOCATE {evicted}")
+        else:
+            statements.move_to_end(query)
+
+        try:
+            if params:
+                cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+            else:
+                cursor.execute(f"EXECUTE {name}")
+        except Exception:
+            statements.pop(query, None)
+            raise
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+def select_rows(table_name, filters=None, columns=None, order_by=None, limit=None, offset=None, conn=None):
+    """
+    Fetch rows with parameterized filters. See build_select() for the filter syntax.
+
+    Example:
+        products = select_rows("products", {"id": product_id}, columns=["id", "name"])
+
+    Args:
+        conn (optional): Connection to run on, a pooled connection is used if omitted
+
+    Returns:
+        list: List of records as dictionaries
+    """
+    column_types = schema_cache.get_column_types(table_name, conn) if has_list_filter(filters) else None
+    query, params = build_select(table_name, filters, columns, order_by, limit, offset, column_types)
+    if conn is not None:
+        return _execute_prepared(conn, query, params)
+    with db_connection() as conn:
+        return _execute_prepared(conn, query, params)
+
+def select_one(table_name, filters=None, columns=None, order_by=None, conn=None):
+    """
+    Fetch the first matching row, or None. Handy for primary key lookups.
+    """
+    rows = select_rows(table_name, filters, columns, order_by, limit=1, conn=conn)
+    return rows[0] if rows else None
+
+# Postgres accepts at most 32767 bind parameters per statement
+MAX_QUERY_PARAMS = 32767
+
+def _returning_clause(returning):
+    if not returning:
+        return ""
+    if returning == "*":
+        return " RETURNING *"
+    return " RETURNING " + ", ".join(quote_identifier(column) for column in returning)
+
+def build_insert(table_name, columns, row_count, returning=None):
+    """
+    Build one multi-row INSERT statement with $1, $2... placeholders.
+
+    Args:
+        table_name (str): The name of the table
+        columns (list): Column names, in the order values are passed
+        row_count (int): Number of rows in the VALUES list
+        returning (list or str, optional): Columns to return, or "*"
+
+    Returns:
+        str: The INSERT statement
+    """
+    width = len(columns)
+    values = ", ".join(
+        "(" + ", ".join(f"${row * width + i + 1}" for i in range(width)) + ")"
+        for row in range(row_count)
+    )
+    column_list = ", ".join(quote_identifier(column) for column in columns)
+    return f"INSERT INTO {quote_identifier(table_name)} ({column_list}) VALUES {values}{_returning_clause(returning)}"
+
+def restore_input_order(rows, returned, key="id"):
+    """
+    Put RETURNING rows back in the order of the input rows, matched on ``key``.
+
+    Postgres does not promise RETURNING order for multi-row inserts, so bulk inserts
+    that need positional results should set ``key`` (usually a client-generated id).
+    """
+    if not returned or any(key not in row for row in rows) or key not in returned[0]:
+        return returned
+    by_key = {str(row[key]): row for row in returned}
+    return [by_key.get(str(row[key])) for row in rows]
+
+def insert_rows(table_name, rows, returning=None, conn=None, page_size=1000):
+    """
+    Insert many rows with psycopg2's execute_values: one statement per ``page_size`` rows.
+
+    All rows must have the same keys. Without ``conn`` the insert runs on a pooled
+    connection and is committed; with ``conn`` the caller commits.
+
+    Args:
+        table_name (str): The name of the table
+        rows (list): List of dicts mapping column name to value
+        returning (list or str, optional): Columns to return, or "*"
+        conn (optional): Connection to run on
+        page_size (int): Rows per INSERT statement
+
+    Returns:
+        list: Returned rows in input order (empty when ``returning`` is not set)
+    """
+    if not rows:
+        return []
+    columns = list(rows[0].keys())
+    column_list = ", ".join(quote_identifier(column) for column in columns)
+    query = f"INSERT INTO {quote_identifier(table_name)} ({column_list}) VALUES %s{_returning_clause(returning)}"
+    values = [tuple(row[column] for column in columns) for row in rows]
+
+    def run(conn):
+        cursor = conn.cursor()
+        try:
+            returned = execute_values(cursor, query, values, page_size=page_size, fetch=bool(returning))
+        finally:
+            cursor.close()
+        return restore_input_order(rows, returned or [])
+
+    if conn is not None:
+        return run(conn)
+    with db_connection() as conn:
+        returned = run(conn)
+        conn.commit()
+    return returned
+
+# Chỉ lấy bảng trong schema hiện tại: bảng cùng tên ở schema khác (vd. auth, storage) không được trộn cột vào
+SCHEMA_COLUMNS_QUERY = (
+    "SELECT column_name, data_type FROM information_schema.columns "
+    "WHERE table_schema = current_schema() AND table_name = $1"
+)
+
+class SchemaCache:
+    """
+    Cache of the column names and data types of each table, loaded from information_schema.
+
+    Columns are loaded once per table and reloaded after ``ttl`` seconds or
+    after invalidate(), e.g. when a migration adds columns.
+    """
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._columns = {}
+        self._lock = threading.Lock()
+
+    def _load(self, table_name, conn):
+        cursor = conn.cursor()
+        try:
+            cursor.execute(_PLACEHOLDER_RE.sub("%s", SCHEMA_COLUMNS_QUERY), (table_name,))
+            return {row["column_name"]: row["data_type"] for row in cursor.fetchall()}
+        finally:
+            cursor.close()
+
+    def get_column_types(self, table_name, conn=None):
+        """
+        Return a dict mapping each column of a table to its data type (e.g. "uuid", "text").
+
+        Args:
+            table_name (str): The name of the table
+            conn (optional): Connection to load with on a cache miss, a pooled one is used if omitted
+        """
+        column_types = self.peek_types(table_name)
+        if column_types is not None:
+            return column_types
+
+        if conn is not None:
+            column_types = self._load(table_name, conn)
+        else:
+            with db_connection() as conn:
+                column_types = self._load(table_name, conn)
+
+        self.store(table_name, column_types)
+        return column_types
+
+    def get_columns(self, table_name, conn=None):
+        """
+        Return the set of column names of a table.
+        """
+        return frozenset(self.get_column_types(table_name, conn))
+
+    def has_column(self, table_name, column_name, conn=None):
+        return column_name in self.get_column_types(table_name, conn)
+
+    def peek_types(self, table_name):
+        """Return the cached column -> data type dict if it is still fresh, else None (never hits the database)."""
+        with self._lock:
+            entry = self._columns.get(table_name)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl:
+            return entry[1]
+        return None
+
+    def peek(self, table_name):
+        """Return the cached column set if it is still fresh, else None (never hits the database)."""
+        column_types = self.peek_types(table_name)
+        return frozenset(column_types) if column_types is not None else None
+
+    def store(self, table_name, columns):
+        """
+        Cache columns loaded elsewhere (e.g. by the asyncpg layer): a column -> data type
+        dict, or just the column names when the types are unknown.
+        """
+        column_types = dict(columns) if isinstance(columns, dict) else dict.fromkeys(columns)
+        with self._lock:
+            self._columns[table_name] = (time.monotonic(), column_types)
+
+    def invalidate(self, table_name=None):
+        """Forget one table, or every table when no name is given."""
+        with self._lock:
+            if table_name is None:
+                self._columns.clear()
+            else:
+                self._columns.pop(table_name, None)
+
+schema_cache = SchemaCache(DB_SCHEMA_CACHE_TTL)
+
+def get_table_columns(table_name, conn=None):
+    """
+    Return the cached set of column names of a table.
+    """
+    return schema_cache.get_columns(table_name, conn)
+
+def has_column(table_name, column_name, conn=None):
+    """
+    Check whether a table has a column, using the cached schema metadata.
+
+    Example:
+        if has_column("content", "preview_image"):
+            ...
+    """
+    return schema_cache.has_column(table_name, column_name, conn)
+
+def invalidate_schema_cache(table_name=None):
+    """
+    Drop cached column lists so the next lookup reloads them. Call after schema changes.
+    """
+    schema_cache.invalidate(table_name)
+
+# Cột nặng (vector 1536 chiều, ~12 KB mỗi dòng) không trả về trong các API đọc thông thường
+HEAVY_COLUMNS = frozenset({"embedding"})
+
+# Cột nội bộ theo dõi embedding cũ (scripts/add_embedding_dirty_tracking.sql), không trả về cho client
+INTERNAL_COLUMNS = frozenset({"embedding_text_hash", "embedding_dirty_at", "embedding_attempts", "embedding_retry_at"})
+
+def resolve_projection(table_columns, fields=None, required=("id",), include=()):
+    """
+    Pick the columns to SELECT: every column except HEAVY_COLUMNS and INTERNAL_COLUMNS,
+    narrowed to ``fields`` when a sparse fieldset is requested.
+
+    Args:
+        table_columns (set): Columns the table actually has
+        fields (set, optional): Requested fields; unknown names are ignored
+        required (tuple): Columns always selected (e.g. keys used for pagination)
+        include (tuple): Excluded columns to select anyway, if the table has them
+
+    Returns:
+        list: Column names in a stable order
+    """
+    columns = set(table_columns) - HEAVY_COLUMNS - INTERNAL_COLUMNS
+    if fields:
+        columns = (columns & set(fields)) | (set(required) & set(table_columns))
+    return sorted(columns | (set(include) & set(table_columns)))
+
+def get_projection(table_name, fields=None, required=("id",), conn=None, include=()):
+    """
+    Column list for reading ``table_name`` without the embedding vector. See resolve_projection().
+    """
+    return resolve_projection(get_table_columns(table_name, conn), fields, required, include)
+
+def select_list(columns, alias=None):
+    """
+    Render a column list for a SELECT clause, e.g. ``p."id", p."name"``.
+    """
+    prefix = f"{alias}." if alias else ""
+    return ", ".join(f"{prefix}{quote_identifier(column)}" for column in columns)
+
+def format_vector(embedding):
+    """
+    Format an embedding as a pgvector literal, e.g. ``[0.1,0.2,...]``.
+    """
+    return "[" + ",".join(str(float(x)) for x in embedding) + "]"
@@ -0,0 +1,190 @@
+import hashlib
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+from psycopg2.errors import UndefinedTable
+from psycopg2.extras import execute_values
+from config.settings import EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_PERSIST
+from app.utils.database import db_connection
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_text(text):
+    """
+    Normalize text before hashing so that only meaningful differences miss the cache.
+
+    Unicode is NFC-normalized (Vietnamese diacritics can arrive composed or decomposed)
+    and runs of whitespace collapse to one space. Case is kept, the embedding model
+    is case-sensitive.
+    """
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text or "")).strip()
+
+def text_hash(text):
+    """
+    SHA-256 hex digest of the normalized text.
+    """
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """
+    Two-tier cache of embedding vectors keyed on (model, normalized-text hash).
+
+    An in-memory LRU sits in front of the ``embedding_cache`` table (see
+    scripts/create_embedding_cache.sql), so vectors survive restarts and are shared
+    between workers. If the table is missing the cache keeps working in memory only;
+    other database errors (pool timeouts, dropped connections) only skip the table for
+    that call. The memory tier holds float32 arrays, about 6 KB per 1536-dimensional
+    vector instead of about 49 KB as a list of Python floats; callers still get lists.
+    """
+
+    def __init__(self, max_size=EMBEDDING_CACHE_SIZE, persist=EMBEDDING_CACHE_PERSIST):
+        self.max_size = max_size
+        self.persist = persist
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.db_errors = 0
+
+    def _remember(self, key, embedding):
+        # Gọi khi đang giữ self._lock
+        if self.max_size <= 0:
+            return
+        self._entries[key] = np.asarray(embedding, dtype=np.float32)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _db_error(self, error):
+        self.db_errors += 1
+        if not isinstance(error, UndefinedTable):
+            print(f"Embedding cache table skipped for this call: {error}")
+        elif self.persist:
+            print(f"Embedding cache table missing, caching in memory only: {error}")
+            self.persist = False
+
+    def _load(self, model, hashes):
+        """
+        Read the given hashes from the embedding_cache table. Returns {hash: embedding}.
+        """
+        if not self.persist or not hashes:
+            return {}
+        try:
+            with db_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT text_hash, embedding FROM embedding_cache WHERE model = %s AND text_hash = ANY(%s)",
+                    (model, list(hashes))
+                )
+                rows = cursor.fetchall()
+                cursor.close()
+            return {row["text_hash"]: list(row["embedding"]) for row in rows}
+        except Exception as e:
+            self._db_error(e)
+            return {}
+
+    def _save(self, model, embeddings_by_hash):
+        if not self.persist or not embeddings_by_hash:
+            return
+        try:
+            with db_connection() as conn:
+                cursor = conn.cursor()
+                execute_values(
+                    cursor,
+                    "INSERT INTO embedding_cache (model, text_hash, embedding) VALUES %s ON CONFLICT (model, text_hash) DO NOTHING",
+                    [(model, key, embedding) for key, embedding in embeddings_by_hash.items()]
+                )
+                conn.commit()
+                cursor.close()
+        except Exception as e:
+            self._db_error(e)
+
+    def get_many(self, model, texts):
+        """
+        Look up cached embeddings for many texts.
+
+        Args:
+            model (str): Embedding model name
+            texts (list): Texts to look up
+
+        Returns:
+            tuple: (hashes, found) where hashes[i] is the key of texts[i] and found maps hash -> embedding
+        """
+        hashes = [text_hash(text) for text in texts]
+        found = {}
+        missing = []
+        with self._lock:
+            for key in dict.fromkeys(hashes):
+                embedding = self._entries.get((model, key))
+                if embedding is not None:
+                    self._entries.move_to_end((model, key))
+                    found[key] = embedding.tolist()
+                else:
+                    missing.append(key)
+
+        loaded = self._load(model, missing)
+        with self._lock:
+            for key in hashes:
+                if key in found:
+                    self.memory_hits += 1
+                elif key in loaded:
+                    self.db_hits += 1
+                else:
+                    self.misses += 1
+            for key, embedding in loaded.items():
+                self._remember((model, key), embedding)
+        found.update(loaded)
+        return hashes, found
+
+    def get(self, model, text):
+        """
+        Cached embedding for one text, or None.
+        """
+        hashes, found = self.get_many(model, [text])
+        return found.get(hashes[0])
+
+    def put_many(self, model, embeddings_by_hash):
+        """
+        Store freshly generated embeddings in both tiers.
+
+        Args:
+            model (str): Embedding model name
+            embeddings_by_hash (dict): Text hash -> embedding vector
+        """
+        with self._lock:
+            for key, embedding in embeddings_by_hash.items():
+                self._remember((model, key), embedding)
+        self._save(model, embeddings_by_hash)
+
+    def put(self, model, text, embedding):
+        self.put_many(model, {text_hash(text): embedding})
+
+    def clear(self):
+        """
+        Drop the in-memory tier (the table is left untouched).
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Hit/miss counters for monitoring.
+        """
+        with self._lock:
+            lookups = self.memory_hits + self.db_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "persistent": self.persist,
+                "memory_hits": self.memory_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "db_errors": self.db_errors,
+                "hit_rate": (self.memory_hits + self.db_hits) / lookups if lookups else 0.0
+            }
+
+embedding_cache = EmbeddingCache()
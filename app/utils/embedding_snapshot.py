@@ -0,0 +1,203 @@
+import fcntl
+import json
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+
+import numpy as np
+
+from config.settings import EMBEDDING_SNAPSHOT_DIR, EMBEDDING_SNAPSHOT_DTYPE, EMBEDDING_SNAPSHOT_MAX_AGE
+from app.utils.vector_search import normalize_rows
+
+SNAPSHOT_VERSION = 1
+
+class EmbeddingSnapshot:
+    """
+    A table's vectors as a read-only memory-mapped matrix plus the record ID of each row.
+
+    Every worker that maps the same file shares its pages through the OS page cache,
+    so N workers hold one copy of the vectors instead of N.
+    """
+
+    def __init__(self, table_name, ids, matrix, created_at, synced_at=None):
+        self.table_name = table_name
+        self.ids = ids
+        self.matrix = matrix
+        self.created_at = created_at
+        # Thời điểm (đồng hồ database) bắt đầu quét bảng: mọi thay đổi sau mốc này chưa có trong snapshot
+        self.synced_at = synced_at or datetime.fromtimestamp(created_at, timezone.utc)
+        # Vị trí (offset) của từng id trong ma trận
+        self.offsets = {record_id: row for row, record_id in enumerate(ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def vector(self, record_id):
+        """
+        Stored (normalized) vector of a record, or None.
+        """
+        row = self.offsets.get(str(record_id))
+        return self.matrix[row] if row is not None else None
+
+def _meta_path(table_name, directory):
+    return os.path.join(directory, f"{table_name}.meta.json")
+
+def write_snapshot_chunks(table_name, chunks, dtype=EMBEDDING_SNAPSHOT_DTYPE, directory=EMBEDDING_SNAPSHOT_DIR,
+                          synced_at=None):
+    """
+    Write a snapshot of a table's vectors from a stream of (ids, matrix) chunks.
+
+    The snapshot is two files: ``<table>.<version>.npy`` with the row-normalized
+    matrix (float32 or float16) and ``<table>.meta.json`` with the ID of each row, the
+    shape and the name of the matrix file. Chunks are appended to a raw file as they
+    arrive, so only one chunk is in memory at a time. The matrix is written first and
+    the meta file is swapped in atomically, so readers never see a half-written snapshot.
+
+    Args:
+        table_name (str): Table the vectors come from
+        chunks (iterable): (ids, vectors) pairs, e.g. from EmbeddingService.iter_embeddings_from_db
+        dtype (str): "float32" or "float16"
+        directory (str): Where snapshots are stored
+        synced_at (datetime, optional): Database time the scan started at; changes after it are
+            loaded on top of the snapshot (see ann_index.sync_ann_index)
+
+    Returns:
+        int: Number of vectors written
+    """
+    os.makedirs(directory, exist_ok=True)
+    dtype = np.dtype(dtype)
+    matrix_name = f"{table_name}.{uuid.uuid4().hex[:12]}.npy"
+    matrix_path = os.path.join(directory, matrix_name)
+    raw_path = matrix_path + ".raw"
+
+    ids = []
+    dim = 0
+    try:
+        with open(raw_path, "wb") as raw:
+            for chunk_ids, vectors in chunks:
+                if not len(chunk_ids):
+                    continue
+                block = normalize_rows(np.asarray(vectors, dtype=np.float32).reshape(len(chunk_ids), -1))
+                if dim and block.shape[1] != dim:
+                    raise ValueError(f"Mixed vector dimensions in {table_name}: {dim} and {block.shape[1]}")
+                dim = block.shape[1]
+                block.astype(dtype, copy=False).tofile(raw)
+                ids.extend(str(record_id) for record_id in chunk_ids)
+
+        # Ghi lại thành .npy: np.save đọc qua mmap nên không nạp toàn bộ vào RAM
+        if ids:
+            matrix = np.memmap(raw_path, dtype=dtype, mode="r", shape=(len(ids), dim))
+        else:
+            matrix = np.empty((0, 0), dtype=dtype)
+        with open(matrix_path + ".tmp", "wb") as f:
+            np.save(f, matrix)
+        del matrix
+        os.replace(matrix_path + ".tmp", matrix_path)
+    finally:
+        if os.path.exists(raw_path):
+            os.remove(raw_path)
+
+    meta = {
+        "version": SNAPSHOT_VERSION,
+        "table": table_name,
+        "matrix": matrix_name,
+        "dtype": dtype.name,
+        "count": len(ids),
+        "dim": int(dim),
+        "normalized": True,
+        "created_at": time.time(),
+        "synced_at": synced_at.isoformat() if synced_at is not None else None,
+        "ids": ids
+    }
+    meta_path = _meta_path(table_name, directory)
+    with open(meta_path + ".tmp", "w") as f:
+        json.dump(meta, f)
+    os.replace(meta_path + ".tmp", meta_path)
+
+    # Xoá các ma trận cũ; worker nào còn đang map file cũ vẫn đọc được cho tới khi unmap
+    for name in os.listdir(directory):
+        if name.startswith(f"{table_name}.") and name.endswith(".npy") and name != matrix_name:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+    return len(ids)
+
+def write_snapshot(table_name, ids, vectors, dtype=EMBEDDING_SNAPSHOT_DTYPE, directory=EMBEDDING_SNAPSHOT_DIR):
+    """
+    Write a snapshot from vectors already in memory. See write_snapshot_chunks().
+    """
+    return write_snapshot_chunks(table_name, [(ids, vectors)], dtype, directory)
+
+def read_snapshot(table_name, max_age=None, directory=EMBEDDING_SNAPSHOT_DIR):
+    """
+    Memory-map the snapshot of a table read-only.
+
+    Args:
+        table_name (str): Table the vectors come from
+        max_age (float, optional): Ignore snapshots older than this many seconds
+        directory (str): Where snapshots are stored
+
+    Returns:
+        EmbeddingSnapshot: The snapshot, or None if it is missing, stale or unreadable
+    """
+    try:
+        with open(_meta_path(table_name, directory)) as f:
+            meta = json.load(f)
+        if meta.get("version") != SNAPSHOT_VERSION:
+            return None
+        if max_age is not None and time.time() - meta["created_at"] > max_age:
+            return None
+        matrix = np.load(os.path.join(directory, meta["matrix"]), mmap_mode="r")
+        if matrix.shape[0] != meta["count"]:
+            return None
+        synced_at = datetime.fromisoformat(meta["synced_at"]) if meta.get("synced_at") else None
+        return EmbeddingSnapshot(table_name, meta["ids"], matrix, meta["created_at"], synced_at)
+    except (OSError, ValueError, KeyError) as e:
+        if not isinstance(e, FileNotFoundError):
+            print(f"Ignoring unreadable embedding snapshot for {table_name}: {e}")
+        return None
+
+def invalidate_snapshot(table_name, directory=EMBEDDING_SNAPSHOT_DIR):
+    """
+    Make the next load rebuild the snapshot of a table. Workers that already mapped it keep their copy.
+    """
+    try:
+        os.remove(_meta_path(table_name, directory))
+    except FileNotFoundError:
+        pass
+
+def load_or_build_snapshot(table_name, build, max_age=EMBEDDING_SNAPSHOT_MAX_AGE, directory=EMBEDDING_SNAPSHOT_DIR):
+    """
+    Map a fresh snapshot, or build one first if it is missing or older than ``max_age``.
+
+    A reused snapshot does not contain the writes made after its ``synced_at``;
+    callers load that delta on top of it (load_ann_index does). A file lock makes sure
+    only one worker scans the table when several start at once; the others wait and
+    then map the file it wrote.
+
+    Args:
+        table_name (str): Table the vectors come from
+        build (callable): Writes the snapshot (e.g. EmbeddingService.build_embedding_snapshot)
+        max_age (float): Rebuild snapshots older than this many seconds
+
+    Returns:
+        EmbeddingSnapshot: The mapped snapshot
+    """
+    snapshot = read_snapshot(table_name, max_age, directory)
+    if snapshot is not None:
+        return snapshot
+
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f"{table_name}.lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            # Worker khác có thể vừa tạo xong snapshot trong lúc chờ khoá
+            snapshot = read_snapshot(table_name, max_age, directory)
+            if snapshot is not None:
+                return snapshot
+            build()
+            return read_snapshot(table_name, directory=directory)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,23 @@
+from typing import Optional
+
+from fastapi import Query
+
+def fields_query(fields: Optional[str] = Query(None, description="Comma-separated list of fields to return, e.g. id,name,price")):
+    """
+    FastAPI dependency parsing the ``fields`` query parameter of a sparse fieldset.
+
+    Returns:
+        set: Requested field names, or None when every field should be returned
+    """
+    if not fields:
+        return None
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    return requested or None
+
+def pick_fields(item, fields):
+    """
+    Keep only the requested fields of a response item (all of them when ``fields`` is None).
+    """
+    if not fields:
+        return item
+    return {key: value for key, value in item.items() if key in fields}
@@ -0,0 +1,102 @@
+import hashlib
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from config.settings import LLM_CACHE_ENABLED, LLM_CACHE_SIZE, LLM_CACHE_TTL
+from app.utils.query_cache import TTLCache
+
+# Đặt bởi route khi request có fresh=true: bỏ qua cache nhưng vẫn lưu kết quả mới
+_fresh = ContextVar("llm_cache_fresh", default=False)
+
+@contextmanager
+def fresh_responses(enabled=True):
+    """
+    Within the block, chat model calls skip the response cache (their results still refresh it).
+
+    The flag lives in a context variable, so it follows the current request through
+    awaits and asyncio.to_thread without being passed down every call.
+    """
+    token = _fresh.set(bool(enabled))
+    try:
+        yield
+    finally:
+        _fresh.reset(token)
+
+def fresh_requested():
+    """
+    Whether the current request asked for fresh results (see fresh_responses()).
+    """
+    return _fresh.get()
+
+def prompt_hash(prompt):
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+class LLMResponseCache:
+    """
+    Exact-match cache of chat model responses keyed on (model, temperature, prompt hash).
+
+    Entries are evicted least-recently-used beyond ``max_size`` and expire after
+    ``ttl`` seconds. Only successful responses are stored; errors are raised as before.
+    """
+
+    def __init__(self, max_size=LLM_CACHE_SIZE, ttl=LLM_CACHE_TTL, enabled=LLM_CACHE_ENABLED):
+        self.enabled = enabled
+        self._entries = TTLCache(max_size, ttl)
+        self._lock = threading.Lock()
+        self.bypassed = 0
+
+    def get(self, model, temperature, prompt):
+        if not self.enabled:
+            return None
+        if fresh_requested():
+            with self._lock:
+                self.bypassed += 1
+            return None
+        return self._entries.get((model, temperature, prompt_hash(prompt)))
+
+    def put(self, model, temperature, prompt, response):
+        if self.enabled:
+            self._entries.put((model, temperature, prompt_hash(prompt)), response)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        stats = self._entries.stats()
+        with self._lock:
+            stats["bypassed"] = self.bypassed
+        stats["enabled"] = self.enabled
+        return stats
+
+class CachedChatModel:
+    """
+    Chat model wrapper whose invoke() goes through the response cache.
+
+    Only plain string prompts without extra arguments are cached; anything else, and
+    every other attribute, goes straight to the wrapped client.
+    """
+
+    def __init__(self, client, cache):
+        self.client = client
+        self.cache = cache
+
+    def invoke(self, prompt, *args, fresh=False, **kwargs):
+        if args or kwargs or not isinstance(prompt, str):
+            return self.client.invoke(prompt, *args, **kwargs)
+
+        model = getattr(self.client, "model_name", None)
+        temperature = getattr(self.client, "temperature", None)
+        if not fresh:
+            response = self.cache.get(model, temperature, prompt)
+            if response is not None:
+                return response
+
+        response = self.client.invoke(prompt)
+        self.cache.put(model, temperature, prompt, response)
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+llm_cache = LLMResponseCache()
@@ -0,0 +1,98 @@
+import base64
+import json
+from datetime import datetime
+
+from fastapi import HTTPException, Query
+from config.settings import PAGINATION_DEFAULT_LIMIT, PAGINATION_MAX_LIMIT
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+class PageParams:
+    """
+    FastAPI dependency for keyset pagination query parameters (``limit`` and ``cursor``).
+    """
+    def __init__(
+        self,
+        limit: int = Query(PAGINATION_DEFAULT_LIMIT, ge=1, le=PAGINATION_MAX_LIMIT, description="Number of items per page"),
+        cursor: str = Query(None, description=f"Opaque cursor from the {NEXT_CURSOR_HEADER} header of the previous page")
+    ):
+        self.limit = limit
+        self.cursor = cursor
+
+def encode_cursor(row):
+    """
+    Encode the (created_at, id) position of a row as an opaque URL-safe cursor.
+
+    ``created_at`` may be NULL; such rows sort first (see keyset_order()).
+    """
+    created_at = row["created_at"]
+    payload = json.dumps({"created_at": created_at.isoformat() if created_at is not None else None, "id": str(row["id"])})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor().
+
+    Returns:
+        tuple: (created_at or None, id)
+
+    Raises:
+        HTTPException: 400 if the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        created_at = payload["created_at"]
+        return (datetime.fromisoformat(created_at) if created_at is not None else None), payload["id"]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+def keyset_condition(alias, cursor, params):
+    """
+    SQL condition selecting the rows after ``cursor`` in keyset_order() order.
+
+    Appends the cursor values to ``params`` and returns a condition using $n placeholders.
+    A row comparison with a NULL ``created_at`` is never true, so rows without one
+    (sorted first) are handled by their own branch.
+
+    Args:
+        alias (str): Table alias, e.g. "t"
+        cursor (str): Cursor from the previous page
+        params (list): Query parameters, extended in place
+    """
+    created_at, row_id = decode_cursor(cursor)
+    if created_at is None:
+        # Con trỏ nằm trong nhóm created_at NULL: phần còn lại của nhóm đó, rồi mọi dòng có created_at
+        params.append(row_id)
+        return f"(({alias}.created_at IS NULL AND {alias}.id < ${len(params)}) OR {alias}.created_at IS NOT NULL)"
+    params.append(created_at)
+    params.append(row_id)
+    return f"({alias}.created_at, {alias}.id) < (${len(params) - 1}, ${len(params)})"
+
+def keyset_order(alias):
+    """
+    ORDER BY clause matching keyset_condition().
+
+    NULLS FIRST is the PostgreSQL default for DESC, spelled out because keyset_condition()
+    relies on it; it matches the (created_at DESC, id DESC) pagination indexes.
+    """
+    return f" ORDER BY {alias}.created_at DESC NULLS FIRST, {alias}.id DESC"
+
+def keyset_limit(limit, params):
+    """
+    LIMIT clause fetching one extra row so split_page() knows whether a next page exists.
+    """
+    params.append(limit + 1)
+    return f" LIMIT ${len(params)}"
+
+def split_page(rows, limit):
+    """
+    Trim the extra row fetched by keyset_limit().
+
+    Returns:
+        tuple: (rows of this page, cursor for the next page or None on the last page)
+    """
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
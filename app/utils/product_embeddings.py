@@ -1,11 +1,143 @@
 from app.services.embedding_service import EmbeddingService
-from app.utils.database import get_db_connection, fetch_data
+from app.utils.database import db_connection, select_rows, get_projection, select_list, format_vector, has_column, INTERNAL_COLUMNS
+from app.utils.ann_index import ann_upsert
+from app.utils.query_cache import query_cache
+from app.utils.embedding_cache import text_hash
+from config.settings import (
+    EMBEDDING_BATCH_SIZE, EMBEDDING_REFRESH_MAX_ATTEMPTS, EMBEDDING_REFRESH_RETRY_DELAY, EMBEDDING_REFRESH_MAX_RETRY_DELAY
+)
+from psycopg2.extras import execute_values
 import json
 
 class ProductEmbeddings:
     def __init__(self):
         self.embedding_service = EmbeddingService()
     
+    @staticmethod
+    def build_product_text(product):
+        """
+        Build the text representation of a product that gets embedded.
+        
+        Args:
+            product (dict): Product record
+            
+        Returns:
+            str: Text to embed
+        """
+        product_text = f"Product: {product.get('name', '')}\n"
+        product_text += f"Description: {product.get('description', '')}\n"
+        
+        if product.get('features'):
+            features = product.get('features')
+            if isinstance(features, str):
+                try:
+                    features = json.loads(features)
+                except:
+                    pass
+            
+            if isinstance(features, list):
+                product_text += "Features:\n"
+                for feature in features:
+                    product_text += f"- {feature}\n"
+        
+        return product_text
+    
+    def build_product_texts(self, products):
+        """
+        Build the texts to embed for many products.
+        
+        Args:
+            products (list): Product records
+            
+        Returns:
+            list: Texts to embed, in the same order as products
+        """
+        return [self.build_product_text(product) for product in products]
+    
+    def product_columns(self):
+        """
+        Columns to read for embedding: the usual projection plus the dirty-tracking columns, if present.
+        """
+        return get_projection("products", include=INTERNAL_COLUMNS)
+    
+    def store_product_embeddings(self, products, embeddings, texts):
+        """
+        Write many product embeddings back with one bulk UPDATE.
+        
+        When the dirty-tracking columns exist (scripts/add_embedding_dirty_tracking.sql)
+        the hash of the embedded text is stored with the vector and the dirty mark is
+        cleared, unless the product was marked again while it was being embedded.
+        
+        Args:
+            products (list): Product records the embeddings belong to
+            embeddings (list): Embedding vectors, one per product
+            texts (list): Texts the embeddings were generated from
+            
+        Returns:
+            set: IDs of the products that were updated
+        """
+        if not products:
+            return set()
+        
+        if has_column("products", "embedding_dirty_at"):
+            query = """
+            UPDATE products AS p
+            SET embedding = v.embedding::vector,
+                embedding_text_hash = v.text_hash,
+                embedding_dirty_at = CASE WHEN p.embedding_dirty_at IS DISTINCT FROM v.dirty_at THEN p.embedding_dirty_at END
+            FROM (VALUES %s) AS v(id, embedding, text_hash, dirty_at)
+            WHERE p.id = v.id::uuid
+            RETURNING p.id
+            """
+            template = "(%s, %s, %s, %s::timestamptz)"
+            values = [
+                (str(product["id"]), format_vector(embedding), text_hash(text), product.get("embedding_dirty_at"))
+                for product, embedding, text in zip(products, embeddings, texts)
+            ]
+        else:
+            query = """
+            UPDATE products AS p
+            SET embedding = v.embedding::vector
+            FROM (VALUES %s) AS v(id, embedding)
+            WHERE p.id = v.id::uuid
+            RETURNING p.id
+            """
+            template = None
+            values = [(str(product["id"]), format_vector(embedding)) for product, embedding in zip(products, embeddings)]
+        
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            results = execute_values(cursor, query, values, template=template, page_size=len(values), fetch=True)
+            conn.commit()
+            cursor.close()
+        
+        updated_ids = {str(row["id"]) for row in results}
+        for product, embedding in zip(products, embeddings):
+            if str(product["id"]) in updated_ids:
+                ann_upsert("products", product["id"], embedding)
+        if updated_ids:
+            # Kết quả tìm kiếm đã cache có thể không còn đúng
+            query_cache.invalidate("products")
+        return updated_ids
+    
+    def _clear_dirty(self, products):
+        """
+        Clear the dirty mark of products whose text did not actually change.
+        """
+        query = """
+        UPDATE products AS p
+        SET embedding_dirty_at = NULL
+        FROM (VALUES %s) AS v(id, dirty_at)
+        WHERE p.id = v.id::uuid AND p.embedding_dirty_at = v.dirty_at
+        """
+        values = [(str(product["id"]), product["embedding_dirty_at"]) for product in products]
+        
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            execute_values(cursor, query, values, template="(%s, %s::timestamptz)", page_size=len(values))
+            conn.commit()
+            cursor.close()
+    
     def generate_product_embedding(self, product_id):
         """
         Generate and store embedding for a product.
@@ -18,58 +150,26 @@ class ProductEmbeddings:
         """
         try:
             # Fetch product data
-            products = fetch_data("products", f"id = '{product_id}'")
+            products = select_rows("products", {"id": product_id}, columns=self.product_columns())
             if not products:
                 return {
                     "success": False,
                     "error": f"Product with ID {product_id} not found"
                 }
             
-            product = products[0]
-            
             # Create text representation of product
-            product_text = f"Product: {product.get('name', '')}\n"
-            product_text += f"Description: {product.get('description', '')}\n"
-            
-            if product.get('features'):
-                features = product.get('features')
-                if isinstance(features, str):
-                    try:
-                        features = json.loads(features)
-                    except:
-                        pass
-                
-                if isinstance(features, list):
-                    product_text += "Features:\n"
-                    for feature in features:
-                        product_text += f"- {feature}\n"
+            texts = self.build_product_texts(products)
             
             # Generate embedding
-            embedding = self.embedding_service.generate_embedding(product_text)
+            embedding = self.embedding_service.generate_embedding(texts[0])
             
             # Store embedding in database
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Update product with embedding
-            query = """
-            UPDATE products
-            SET embedding = %s
-            WHERE id = %s
-            RETURNING id
-            """
-            
-            cursor.execute(query, (embedding, product_id))
-            result = cursor.fetchone()
-            
-            conn.commit()
-            cursor.close()
-            conn.close()
+            updated_ids = self.store_product_embeddings(products, [embedding], texts)
             
-            if result:
+            if updated_ids:
                 return {
                     "success": True,
-                    "product_id": result["id"]
+                    "product_id": str(products[0]["id"])
                 }
             else:
                 return {
@@ -83,16 +183,125 @@ class ProductEmbeddings:
                 "error": str(e)
             }
     
-    def generate_all_product_embeddings(self):
+    def _record_failures(self, product_ids):
+        """
+        Count a failed re-embed and push the product's next attempt back exponentially.
+        """
+        if not product_ids:
+            return
+        
+        query = """
+        UPDATE products
+        SET embedding_attempts = embedding_attempts + 1,
+            embedding_retry_at = NOW() + LEAST(%s * POWER(2, embedding_attempts), %s) * INTERVAL '1 second'
+        WHERE id = ANY(%s::uuid[]) AND embedding_dirty_at IS NOT NULL
+        """
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, (EMBEDDING_REFRESH_RETRY_DELAY, EMBEDDING_REFRESH_MAX_RETRY_DELAY, list(product_ids)))
+            conn.commit()
+            cursor.close()
+    
+    def embed_products(self, products, batch_size, progress_callback=None, skip_unchanged=False):
+        """
+        Embed and store products ``batch_size`` at a time.
+        
+        A failing batch is reported and skipped; the other batches still go through.
+        With ``skip_unchanged``, dirty products whose stored text hash still matches
+        their current text are only marked clean, without calling the embedding API.
+        
+        Returns:
+            dict: Counters, failed products and per-batch summaries
+        """
+        batch_size = max(1, int(batch_size))
+        total_batches = (len(products) + batch_size - 1) // batch_size
+        success_count = 0
+        unchanged_count = 0
+        failed_products = []
+        batches = []
+        
+        for batch_number, start in enumerate(range(0, len(products), batch_size), start=1):
+            batch = products[start:start + batch_size]
+            batch_summary = {
+                "batch": batch_number,
+                "total_batches": total_batches,
+                "size": len(batch),
+                "successful": 0,
+                "unchanged": 0,
+                "failed": 0
+            }
+            
+            try:
+                texts = self.build_product_texts(batch)
+                
+                # Văn bản không đổi so với lần embed trước thì chỉ cần bỏ đánh dấu
+                unchanged = [
+                    product for product, text in zip(batch, texts)
+                    if skip_unchanged and product.get("embedding_dirty_at") and product.get("embedding_text_hash") == text_hash(text)
+                ]
+                if unchanged:
+                    self._clear_dirty(unchanged)
+                    batch_summary["unchanged"] = len(unchanged)
+                    unchanged_count += len(unchanged)
+                
+                unchanged_ids = {str(product["id"]) for product in unchanged}
+                pending = [(product, text) for product, text in zip(batch, texts) if str(product["id"]) not in unchanged_ids]
+                if pending:
+                    pending_products = [product for product, _ in pending]
+                    pending_texts = [text for _, text in pending]
+                    
+                    # Một lần gọi API cho cả batch thay vì từng sản phẩm
+                    embeddings = self.embedding_service.generate_embeddings(pending_texts)
+                    updated_ids = self.store_product_embeddings(pending_products, embeddings, pending_texts)
+                    
+                    for product in pending_products:
+                        if str(product["id"]) in updated_ids:
+                            success_count += 1
+                            batch_summary["successful"] += 1
+                        else:
+                            failed_products.append({
+                                "id": str(product["id"]),
+                                "error": "Failed to update product embedding"
+                            })
+                            batch_summary["failed"] += 1
+            except Exception as e:
+                batch_summary["error"] = str(e)
+                batch_summary["failed"] = len(batch) - batch_summary["unchanged"]
+                failed_products.extend({"id": str(product["id"]), "error": str(e)} for product in batch)
+            
+            batches.append(batch_summary)
+            print(f"Embedding batch {batch_number}/{total_batches}: {batch_summary['successful']} ok, {batch_summary['unchanged']} unchanged, {batch_summary['failed']} failed")
+            if progress_callback:
+                progress_callback(batch_summary)
+        
+        return {
+            "success": True,
+            "total": len(products),
+            "successful": success_count,
+            "unchanged": unchanged_count,
+            "failed": len(failed_products),
+            "failed_products": failed_products,
+            "batches": batches
+        }
+    
+    def generate_all_product_embeddings(self, batch_size=EMBEDDING_BATCH_SIZE, progress_callback=None):
         """
         Generate and store embeddings for all products without embeddings.
         
+        Products are read with one query, embedded ``batch_size`` at a time through
+        ``embed_documents`` and written back with one bulk UPDATE per batch. A failing
+        batch is reported and skipped; the other batches still go through.
+        
+        Args:
+            batch_size (int): Number of products embedded per API call
+            progress_callback (callable, optional): Called with the summary dict of each finished batch
+            
         Returns:
             dict: Result of the operation
         """
         try:
             # Fetch products without embeddings
-            products = fetch_data("products", "embedding IS NULL")
+            products = select_rows("products", {"embedding__isnull": True}, columns=self.product_columns())
             
             if not products:
                 return {
@@ -101,31 +310,65 @@ class ProductEmbeddings:
                     "count": 0
                 }
             
-            success_count = 0
-            failed_products = []
-            
-            # Generate embeddings for each product
-            for product in products:
-                result = self.generate_product_embedding(product["id"])
+            return self.embed_products(products, batch_size, progress_callback)
                 
-                if result["success"]:
-                    success_count += 1
-                else:
-                    failed_products.append({
-                        "id": product["id"],
-                        "error": result["error"]
-                    })
-            
+        except Exception as e:
             return {
-                "success": True,
-                "total": len(products),
-                "successful": success_count,
-                "failed": len(failed_products),
-                "failed_products": failed_products
+                "success": False,
+                "error": str(e)
             }
+    
+    def refresh_dirty_product_embeddings(self, batch_size=EMBEDDING_BATCH_SIZE, progress_callback=None):
+        """
+        Re-embed only the products marked dirty by an edit, oldest mark first.
+        
+        A product whose re-embed fails is retried after a delay that doubles with
+        each failure, and is left alone after ``EMBEDDING_REFRESH_MAX_ATTEMPTS``
+        failures until its next edit resets the counter.
+        
+        Args:
+            batch_size (int): Number of products embedded per API call
+            progress_callback (callable, optional): Called with the summary dict of each finished batch
+            
+        Returns:
+            dict: Result of the operation
+        """
+        try:
+            if not has_column("products", "embedding_attempts"):
+                return {
+                    "success": False,
+                    "error": "Dirty tracking is not set up, run scripts/add_embedding_dirty_tracking.sql"
+                }
+            
+            query = f"""
+            SELECT {select_list(self.product_columns())}
+            FROM products
+            WHERE embedding_dirty_at IS NOT NULL
+              AND embedding_attempts < %s
+              AND (embedding_retry_at IS NULL OR embedding_retry_at <= NOW())
+            ORDER BY embedding_dirty_at
+            """
+            with db_connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute(query, (EMBEDDING_REFRESH_MAX_ATTEMPTS,))
+                    products = cursor.fetchall()
+                finally:
+                    cursor.close()
+            
+            if not products:
+                return {
+                    "success": True,
+                    "message": "No dirty products",
+                    "count": 0
+                }
+            
+            result = self.embed_products(products, batch_size, progress_callback, skip_unchanged=True)
+            self._record_failures([product["id"] for product in result["failed_products"]])
+            return result
                 
         except Exception as e:
             return {
                 "success": False,
                 "error": str(e)
-            } 
\ No newline at end of file
+            }
@@ -0,0 +1,115 @@
+import threading
+import time
+from collections import OrderedDict
+
+from config.settings import QUERY_CACHE_SIZE, QUERY_CACHE_TTL
+from app.utils.embedding_cache import normalize_text
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire ``ttl`` seconds after they are stored.
+
+    ``max_size <= 0`` or ``ttl <= 0`` disables the cache (every get misses).
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        The cached value, or None when missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, predicate=None):
+        """
+        Drop the entries whose key matches ``predicate``, or every entry.
+        """
+        with self._lock:
+            if predicate is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def clear(self):
+        self.invalidate()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+def normalize_query(query):
+    """
+    Case-insensitive form of a text: Unicode NFC, collapsed whitespace, case-folded.
+
+    For comparing request fields where case carries no meaning; search queries are
+    keyed with ``normalize_text`` alone, like the embeddings computed from them.
+    """
+    return normalize_text(query).casefold()
+
+class QueryCache:
+    """
+    Cache of search results in front of retrieval for repeated search queries.
+
+    ``results`` holds the ordered record IDs of a search keyed on (table, normalized
+    query, limit); invalidate(table) drops them when the table's embeddings change.
+    The query is normalized like the embedding cache does (case kept), since the
+    ranking depends on the embedding of that exact text; the query embeddings
+    themselves live in the embedding cache. Invalidation is per process: other
+    workers see the change once their entries expire after QUERY_CACHE_TTL seconds.
+    """
+
+    def __init__(self, max_size=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL):
+        self.results = TTLCache(max_size, ttl)
+
+    def get_results(self, table_name, query, limit):
+        return self.results.get((table_name, normalize_text(query), limit))
+
+    def put_results(self, table_name, query, limit, record_ids):
+        self.results.put((table_name, normalize_text(query), limit), list(record_ids))
+
+    def invalidate(self, table_name):
+        """
+        Forget the cached search results of a table.
+        """
+        self.results.invalidate(lambda key: key[0] == table_name)
+
+    def stats(self):
+        return {"results": self.results.stats()}
+
+query_cache = QueryCache()
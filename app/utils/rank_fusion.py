@@ -0,0 +1,37 @@
+from config.settings import RRF_K
+
+def reciprocal_rank_fusion(rankings, weights=None, k=RRF_K, limit=None):
+    """
+    Merge several rankings with weighted reciprocal rank fusion.
+
+    Each record scores ``sum(weight / (k + rank))`` over the rankings it appears in
+    (ranks start at 1). Only ranks are used, so retrievers with incomparable scores
+    (BM25, cosine similarity) can be merged without calibration.
+
+    Args:
+        rankings (dict): Source name -> list of record IDs, best first
+        weights (dict, optional): Source name -> weight, 1.0 for sources not listed
+        k (int): Damping constant; larger values flatten the gap between top ranks
+        limit (int, optional): Keep at most this many records
+
+    Returns:
+        list: (record id, fused score, {source: rank}) tuples, best first
+    """
+    weights = weights or {}
+    scores = {}
+    ranks = {}
+    for source, record_ids in rankings.items():
+        weight = weights.get(source, 1.0)
+        if weight <= 0:
+            continue
+        for rank, record_id in enumerate(record_ids, start=1):
+            # Chỉ tính lần xuất hiện đầu tiên của một bản ghi trong mỗi nguồn
+            if source in ranks.setdefault(record_id, {}):
+                continue
+            ranks[record_id][source] = rank
+            scores[record_id] = scores.get(record_id, 0.0) + weight / (k + rank)
+
+    fused = sorted(scores.items(), key=lambda entry: (-entry[1], min(ranks[entry[0]].values())))
+    if limit is not None:
+        fused = fused[:limit]
+    return [(record_id, score, ranks[record_id]) for record_id, score in fused]
@@ -0,0 +1,201 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from config.settings import (
+    SEMANTIC_CACHE_ENABLED, SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_MAX_AGE, SEMANTIC_CACHE_MAX_ENTRIES,
+    SEMANTIC_CACHE_MAX_SCOPES
+)
+from app.utils.embedding_cache import text_hash
+from app.utils.llm_cache import fresh_requested
+from app.utils.query_cache import normalize_query
+from app.utils.vector_search import normalize_rows
+
+def canonical_request(**fields):
+    """
+    Canonical text of a generation request, so trivially different requests compare equal.
+
+    Fields are listed in name order, text is NFC-normalized, whitespace-collapsed and
+    case-folded, and list values are de-duplicated and sorted.
+    Empty fields are left out.
+    """
+    lines = []
+    for name in sorted(fields):
+        value = fields[name]
+        if isinstance(value, (list, tuple, set)):
+            value = " | ".join(sorted({normalize_query(str(item)) for item in value if item}))
+        elif value is not None:
+            value = normalize_query(str(value))
+        if value:
+            lines.append(f"{name}: {value}")
+    return "\n".join(lines)
+
+def exact_key(value):
+    """
+    Hash of a value that must match exactly (up to case and whitespace), for use in a scope.
+
+    A list (e.g. previous topics) is hashed as a set, so its order does not matter.
+    Two requests that differ in a single word ("summer" vs "winter") or in one
+    previous topic can still be very close in embedding space, so such fields belong
+    in the scope rather than in the semantically compared text.
+    """
+    if isinstance(value, (list, tuple, set)):
+        text = "\n".join(sorted({normalize_query(str(item)) for item in value if item}))
+    else:
+        text = normalize_query(value or "")
+    return text_hash(text) if text else None
+
+class SemanticCache:
+    """
+    Cache of generation results looked up by embedding similarity of the canonical request.
+
+    Entries live in per-scope buckets (a scope is e.g. (tenant, kind, product id, prompt
+    hash, previous topics hash)), so a result is only ever served to requests of the
+    same tenant, product, exact fields and shape. Requests without a tenant are never cached. A lookup
+    first tries the exact canonical text, then embeds it and takes the closest entry
+    whose cosine similarity is at least ``threshold``. Entries older than ``max_age``
+    seconds are never served. Each scope keeps at most ``max_entries`` entries and at
+    most ``max_scopes`` scopes are kept, both evicted least-recently-used.
+    """
+
+    def __init__(self, threshold=SEMANTIC_CACHE_THRESHOLD, max_age=SEMANTIC_CACHE_MAX_AGE,
+                 max_entries=SEMANTIC_CACHE_MAX_ENTRIES, max_scopes=SEMANTIC_CACHE_MAX_SCOPES,
+                 enabled=SEMANTIC_CACHE_ENABLED):
+        self.threshold = threshold
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.max_scopes = max_scopes
+        self.enabled = enabled
+        self._scopes = OrderedDict()
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    def _bucket(self, scope):
+        # Gọi khi đang giữ self._lock; bỏ các mục đã quá hạn
+        bucket = self._scopes.get(scope)
+        if bucket is None:
+            return None
+        self._scopes.move_to_end(scope)
+        now = time.time()
+        for key in [key for key, entry in bucket.items() if now - entry["created_at"] > self.max_age]:
+            del bucket[key]
+        return bucket
+
+    def _find(self, scope, key, vector):
+        with self._lock:
+            bucket = self._bucket(scope)
+            if not bucket:
+                return None
+            entry = bucket.get(key)
+            if entry is not None:
+                bucket.move_to_end(key)
+                self.exact_hits += 1
+                return entry["value"]
+            if vector is None:
+                return None
+
+            keys = list(bucket)
+            scores = np.stack([bucket[k]["vector"] for k in keys]) @ vector
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            bucket.move_to_end(keys[best])
+            self.semantic_hits += 1
+            return bucket[keys[best]]["value"]
+
+    def _store(self, scope, key, vector, value):
+        with self._lock:
+            bucket = self._scopes.get(scope)
+            if bucket is None:
+                bucket = self._scopes[scope] = OrderedDict()
+            self._scopes.move_to_end(scope)
+            bucket[key] = {"created_at": time.time(), "vector": vector, "value": copy.deepcopy(value)}
+            bucket.move_to_end(key)
+            while len(bucket) > self.max_entries:
+                bucket.popitem(last=False)
+            while len(self._scopes) > self.max_scopes:
+                self._scopes.popitem(last=False)
+
+    def _embed(self, embed, text):
+        try:
+            return normalize_rows(np.asarray(embed(text), dtype=np.float32).reshape(1, -1))[0]
+        except Exception as e:
+            print(f"Semantic cache lookup skipped, embedding failed: {e}")
+            return None
+
+    def get_or_compute(self, scope, request_text, embed, compute, cacheable=None):
+        """
+        Return a cached result for a request close enough to ``request_text``, or compute and cache it.
+
+        Args:
+            scope (tuple): Bucket the request belongs to, tenant first; a None tenant bypasses the cache
+            request_text (str): Canonical request, see canonical_request()
+            embed (callable): Text -> embedding vector
+            compute (callable): Produces the result on a miss
+            cacheable (callable, optional): Result -> bool; errors should not be cached
+
+        Returns:
+            The cached or computed result (a copy, so callers may modify it)
+        """
+        # Không có tenant thì không cô lập được kết quả giữa các khách hàng
+        if not self.enabled or scope[0] is None:
+            return compute()
+
+        key = text_hash(request_text)
+        fresh = fresh_requested()
+        if fresh:
+            with self._lock:
+                self.bypassed += 1
+        else:
+            value = self._find(scope, key, None)
+            if value is not None:
+                return copy.deepcopy(value)
+
+        vector = self._embed(embed, request_text)
+        if not fresh and vector is not None:
+            value = self._find(scope, key, vector)
+            if value is not None:
+                return copy.deepcopy(value)
+        if not fresh:
+            with self._lock:
+                self.misses += 1
+
+        value = compute()
+        if vector is not None and (cacheable is None or cacheable(value)):
+            self._store(scope, key, vector, value)
+        return value
+
+    def invalidate(self, tenant=None):
+        """
+        Drop the entries of one tenant (the first element of its scopes), or everything.
+        """
+        with self._lock:
+            if tenant is None:
+                self._scopes.clear()
+                return
+            for scope in [scope for scope in self._scopes if scope[0] == tenant]:
+                del self._scopes[scope]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "scopes": len(self._scopes),
+                "size": sum(len(bucket) for bucket in self._scopes.values()),
+                "threshold": self.threshold,
+                "max_age": self.max_age,
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0
+            }
+
+semantic_cache = SemanticCache()
@@ -0,0 +1,413 @@
+import json
+
+import numpy as np
+
+from config.settings import EMBEDDING_QUANTIZATION, EMBEDDING_RESCORE_FACTOR
+
+QUANTIZATION_MODES = ("float32", "float16", "int8")
+
+# Sai số tối đa (cosine) chấp nhận khi lọc theo ngưỡng trên điểm xấp xỉ trước khi chấm lại
+QUANTIZATION_MARGIN = 0.02
+
+def parse_embedding(value):
+    """
+    Convert an embedding as stored in the database to a list of floats.
+
+    psycopg2 returns pgvector columns as their text form (``"[0.1,0.2,...]"``)
+    unless a vector adapter is registered; lists and arrays pass through.
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return json.loads(value)
+    return value
+
+def normalize_rows(matrix):
+    """
+    Scale every row of a 2-D float32 matrix to unit length, so a dot product is the cosine similarity.
+
+    All-zero rows are left as zeros (they score 0 against everything).
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def top_k_indices(scores, k):
+    """
+    Indices of the ``k`` largest scores, best first.
+
+    Uses argpartition so only the selected k entries get sorted.
+    """
+    n = scores.shape[0]
+    if k is None or k >= n:
+        return np.argsort(-scores, kind="stable")
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+class QuantizedMatrix:
+    """
+    Row-normalized vectors stored as float32, float16 or int8.
+
+    int8 keeps one float32 scale per row (max |x| / 127), so a 1536-dimensional
+    vector takes 1.5 KB instead of 6 KB in float32 (12 KB as the float64 arrays numpy
+    builds by default); float16 takes 3 KB. Scores computed on the compact codes are
+    approximate; rescore a shortlist against float32 vectors when exact ranking matters.
+
+    A matrix wrapping a read-only array (the snapshot memmap shared by every worker)
+    never writes to it: rows set or added later live in a small overlay that takes
+    precedence over the shared rows when decoding and scoring.
+    """
+
+    def __init__(self, mode="float32", dim=0, capacity=0):
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization mode: {mode}")
+        self.mode = mode
+        self.dim = dim
+        self.codes = np.zeros((capacity, dim), dtype=self._code_dtype(mode))
+        self.scales = np.ones(capacity, dtype=np.float32) if mode == "int8" else None
+        self._size = capacity
+        # row -> vị trí trong overlay (-1 nếu dòng nằm ở mảng gốc); chỉ tạo khi mảng gốc chỉ đọc
+        self._overlay_positions = None
+        self._overlay_codes = None
+        self._overlay_scales = None
+        self._overlay_count = 0
+
+    @staticmethod
+    def _code_dtype(mode):
+        return {"float32": np.float32, "float16": np.float16, "int8": np.int8}[mode]
+
+    @staticmethod
+    def _quantize(vectors, mode):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if mode != "int8":
+            return vectors.astype(QuantizedMatrix._code_dtype(mode), copy=False), None
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    @classmethod
+    def encode(cls, vectors, mode="float32", chunk_size=8192):
+        """
+        Quantize normalized vectors (any array-like, e.g. a snapshot memmap).
+
+        A float32 input in float32 mode, or a float16 input in float32 or float16 mode,
+        is wrapped without a copy (a float16 snapshot holds no more precision than
+        float16 codes). Other inputs are converted ``chunk_size`` rows at a time, so a
+        memmap is never loaded whole.
+        """
+        vectors = np.asarray(vectors)
+        n, dim = vectors.shape
+        if mode != "int8" and (vectors.dtype == cls._code_dtype(mode) or (mode == "float32" and vectors.dtype == np.float16)):
+            matrix = cls("float16" if vectors.dtype == np.float16 else mode, dim)
+            matrix.codes = vectors
+            matrix._size = n
+            return matrix
+
+        matrix = cls(mode, dim, n)
+        for start in range(0, n, chunk_size):
+            codes, scales = cls._quantize(vectors[start:start + chunk_size], mode)
+            matrix.codes[start:start + chunk_size] = codes
+            if scales is not None:
+                matrix.scales[start:start + chunk_size] = scales
+        return matrix
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, rows):
+        return self.decode(rows)
+
+    @property
+    def nbytes(self):
+        total = self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+        if self._overlay_positions is not None:
+            total += self._overlay_positions.nbytes + self._overlay_codes.nbytes
+            total += self._overlay_scales.nbytes if self._overlay_scales is not None else 0
+        return total
+
+    @property
+    def overlay_rows(self):
+        """
+        Number of rows held in the overlay instead of the shared array.
+        """
+        return self._overlay_count
+
+    def _shared(self):
+        # Mảng gốc chỉ đọc: không bao giờ ghi vào, kể cả khi thêm dòng
+        return not self.codes.flags.writeable
+
+    def reserve(self, rows_needed):
+        """
+        Grow the storage (doubling) so it holds at least ``rows_needed`` rows.
+
+        Over a read-only array only the overlay index grows; the array is left as is.
+        """
+        capacity = len(self)
+        if rows_needed <= capacity:
+            return
+        new_capacity = max(rows_needed, capacity * 2, 64)
+        if self._shared():
+            if self._overlay_positions is not None:
+                positions = np.full(new_capacity, -1, dtype=np.int64)
+                positions[:capacity] = self._overlay_positions
+                self._overlay_positions = positions
+        else:
+            codes = np.zeros((new_capacity, self.dim), dtype=self._code_dtype(self.mode))
+            codes[:capacity] = self.codes
+            self.codes = codes
+            if self.scales is not None:
+                scales = np.ones(new_capacity, dtype=np.float32)
+                scales[:capacity] = self.scales
+                self.scales = scales
+        self._size = new_capacity
+
+    def _overlay_slot(self, row):
+        if self._overlay_positions is None:
+            self._overlay_positions = np.full(len(self), -1, dtype=np.int64)
+            self._overlay_codes = np.zeros((64, self.dim), dtype=self._code_dtype(self.mode))
+            self._overlay_scales = np.ones(64, dtype=np.float32) if self.mode == "int8" else None
+        position = int(self._overlay_positions[row])
+        if position >= 0:
+            return position
+
+        position = self._overlay_count
+        if position >= len(self._overlay_codes):
+            codes = np.zeros((2 * len(self._overlay_codes), self.dim), dtype=self._overlay_codes.dtype)
+            codes[:position] = self._overlay_codes
+            self._overlay_codes = codes
+            if self._overlay_scales is not None:
+                scales = np.ones(len(codes), dtype=np.float32)
+                scales[:position] = self._overlay_scales
+                self._overlay_scales = scales
+        self._overlay_positions[row] = position
+        self._overlay_count += 1
+        return position
+
+    def set_row(self, row, vector):
+        """
+        Store one normalized vector at ``row``; over a read-only array it goes to the overlay.
+        """
+        codes, scales = self._quantize(np.asarray(vector, dtype=np.float32).reshape(1, -1), self.mode)
+        if self._shared():
+            # _overlay_slot có thể tạo hoặc nới rộng overlay, nên lấy mảng sau khi gọi
+            row = self._overlay_slot(row)
+            target_codes, target_scales = self._overlay_codes, self._overlay_scales
+        else:
+            target_codes, target_scales = self.codes, self.scales
+        target_codes[row] = codes[0]
+        if scales is not None:
+            target_scales[row] = scales[0]
+
+    def _layered(self):
+        return self._overlay_positions is not None or len(self) != len(self.codes)
+
+    def _row_array(self, rows):
+        if rows is None:
+            return np.arange(len(self))
+        if isinstance(rows, slice):
+            return np.arange(len(self))[rows]
+        return np.asarray(rows, dtype=np.int64).reshape(-1)
+
+    @staticmethod
+    def _decode_block(codes, scales, rows=None):
+        codes = codes if rows is None else codes[rows]
+        vectors = codes.astype(np.float32)
+        if scales is not None:
+            vectors *= (scales if rows is None else scales[rows])[:, None]
+        return vectors
+
+    def decode(self, rows=None):
+        """
+        Float32 (approximate) vectors of the given rows, or of all rows.
+        """
+        if not self._layered():
+            return self._decode_block(self.codes, self.scales, rows)
+
+        rows = self._row_array(rows)
+        vectors = np.zeros((len(rows), self.dim), dtype=np.float32)
+        in_base = rows < len(self.codes)
+        vectors[in_base] = self._decode_block(self.codes, self.scales, rows[in_base])
+        if self._overlay_positions is not None:
+            positions = self._overlay_positions[rows]
+            hit = positions >= 0
+            vectors[hit] = self._decode_block(self._overlay_codes, self._overlay_scales, positions[hit])
+        return vectors
+
+    @staticmethod
+    def _score_block(queries, codes, scales, rows, chunk_size):
+        codes = codes if rows is None else codes[rows]
+        if codes.dtype == np.float32:
+            return queries @ codes.T
+
+        # Đổi từng khối sang float32 để không tạo bản sao float32 của cả ma trận
+        out = np.empty((queries.shape[0], codes.shape[0]), dtype=np.float32)
+        for start in range(0, codes.shape[0], chunk_size):
+            out[:, start:start + chunk_size] = queries @ codes[start:start + chunk_size].astype(np.float32).T
+        if scales is not None:
+            out *= scales if rows is None else scales[rows]
+        return out
+
+    def scores(self, queries, rows=None, chunk_size=4096):
+        """
+        Dot products of normalized queries with the stored rows.
+
+        Args:
+            queries: (m, dim) float32 query vectors
+            rows (array, optional): Row indices to score, all rows if omitted
+            chunk_size (int): Rows converted to float32 at a time
+
+        Returns:
+            np.ndarray: (m, len(rows)) float32 scores
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        if not self._layered():
+            return self._score_block(queries, self.codes, self.scales, rows, chunk_size)
+
+        # Chấm điểm mảng gốc như thường, rồi ghi đè điểm của các dòng nằm trong overlay
+        all_rows = rows is None
+        rows = self._row_array(rows)
+        out = np.zeros((queries.shape[0], len(rows)), dtype=np.float32)
+        base_size = len(self.codes)
+        if all_rows:
+            out[:, :base_size] = self._score_block(queries, self.codes, self.scales, None, chunk_size)
+        else:
+            in_base = np.flatnonzero(rows < base_size)
+            out[:, in_base] = self._score_block(queries, self.codes, self.scales, rows[in_base], chunk_size)
+        if self._overlay_positions is not None:
+            positions = self._overlay_positions[rows]
+            hit = np.flatnonzero(positions >= 0)
+            out[:, hit] = self._score_block(queries, self._overlay_codes, self._overlay_scales, positions[hit], chunk_size)
+        return out
+
+def select_matches(approx_scores, exact_scores, threshold=None, top_k=None, rescore_factor=EMBEDDING_RESCORE_FACTOR):
+    """
+    Rank candidates from approximate scores, optionally rescoring a shortlist exactly.
+
+    Args:
+        approx_scores (np.ndarray): Scores of every candidate (exact when not quantized)
+        exact_scores (callable, optional): Given candidate positions, returns their float32 scores;
+            None means approx_scores are final
+        threshold (float, optional): Minimum similarity score
+        top_k (int, optional): Keep at most this many matches
+        rescore_factor (int): Shortlist size as a multiple of top_k
+
+    Returns:
+        list: (candidate position, score) pairs, best first
+    """
+    if exact_scores is None:
+        order = top_k_indices(approx_scores, top_k)
+        scores = approx_scores[order]
+    else:
+        if top_k is not None:
+            shortlist = top_k_indices(approx_scores, top_k * max(1, rescore_factor))
+        elif threshold is not None:
+            shortlist = np.flatnonzero(approx_scores >= threshold - QUANTIZATION_MARGIN)
+        else:
+            shortlist = np.arange(approx_scores.shape[0])
+        rescored = np.asarray(exact_scores(shortlist), dtype=np.float32)
+        ranked = top_k_indices(rescored, top_k)
+        order = shortlist[ranked]
+        scores = rescored[ranked]
+
+    if threshold is not None:
+        keep = scores >= threshold
+        order, scores = order[keep], scores[keep]
+    return [(int(position), float(score)) for position, score in zip(order, scores)]
+
+class EmbeddingMatrix:
+    """
+    Stored vectors stacked into one pre-normalized matrix for brute-force cosine search.
+
+    Build it once per set of stored embeddings and reuse it across queries; every
+    search is then one matrix multiplication plus a partial sort. With a float16 or
+    int8 ``quantization`` the matrix is kept compact and the shortlist is rescored
+    in float32 from ``rescore_source`` (the original vectors, e.g. a snapshot memmap).
+    """
+
+    def __init__(self, items, vectors, quantization=EMBEDDING_QUANTIZATION, rescore_source=None):
+        """
+        Args:
+            items (list): Records the rows belong to, in row order
+            vectors: 2-D array-like, one embedding per item
+            quantization (str): "float32", "float16" or "int8"
+            rescore_source (optional): Indexable by row lists, returns the float32 vectors
+                of those rows; without it quantized scores are final
+        """
+        self.items = list(items)
+        if self.items:
+            normalized = normalize_rows(np.asarray(vectors, dtype=np.float32).reshape(len(self.items), -1))
+        else:
+            normalized = np.empty((0, 0), dtype=np.float32)
+        self.vectors = QuantizedMatrix.encode(normalized, quantization)
+        self.rescore_source = rescore_source
+
+    @classmethod
+    def from_items(cls, stored_embeddings, column="embedding", quantization=EMBEDDING_QUANTIZATION):
+        """
+        Build the matrix from records carrying an embedding column; records without one are skipped.
+
+        When quantized, the shortlist is rescored from the records' own embeddings.
+        """
+        items = []
+        vectors = []
+        for item in stored_embeddings:
+            embedding = parse_embedding(item.get(column))
+            if embedding is not None and len(embedding):
+                items.append(item)
+                vectors.append(embedding)
+
+        matrix = cls(items, vectors, quantization)
+        if quantization != "float32":
+            matrix.rescore_source = _ItemVectors(items, column)
+        return matrix
+
+    @property
+    def matrix(self):
+        """
+        The stored vectors as float32 (decoded when quantized).
+        """
+        return self.vectors.decode()
+
+    def __len__(self):
+        return len(self.items)
+
+    def search(self, query_vectors, threshold=None, top_k=None):
+        """
+        Score many queries against every stored vector at once.
+
+        Args:
+            query_vectors: 2-D array-like, one query embedding per row
+            threshold (float, optional): Minimum cosine similarity to keep a match
+            top_k (int, optional): Keep at most this many matches per query
+
+        Returns:
+            list: For each query, a list of (row index, score) pairs, best first
+        """
+        queries = normalize_rows(np.atleast_2d(np.asarray(query_vectors, dtype=np.float32)))
+        if not self.items:
+            return [[] for _ in range(queries.shape[0])]
+
+        scores = self.vectors.scores(queries)
+        results = []
+        for query, row in zip(queries, scores):
+            exact_scores = None
+            if self.vectors.mode != "float32" and self.rescore_source is not None:
+                exact_scores = lambda rows, query=query: normalize_rows(self.rescore_source[rows]) @ query
+            results.append(select_matches(row, exact_scores, threshold, top_k))
+        return results
+
+class _ItemVectors:
+    """
+    Row-indexable view over the embeddings of a list of records, used for rescoring.
+    """
+
+    def __init__(self, items, column):
+        self.items = items
+        self.column = column
+
+    def __getitem__(self, rows):
+        return np.asarray([parse_embedding(self.items[row][self.column]) for row in rows], dtype=np.float32).reshape(len(rows), -1)
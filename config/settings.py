@@ -19,10 +19,84 @@ DB_PASSWORD = os.getenv("DB_PASSWORD")
 
 DB_PORT = os.getenv("DB_PORT", "6543")
 
+# Database Connection Pool
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds to wait for a free connection
+DB_POOL_MAX_LIFETIME = int(os.getenv("DB_POOL_MAX_LIFETIME", "1800"))  # recycle connections after 30 minutes
+DB_POOL_HEALTH_CHECK_INTERVAL = int(os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", "30"))  # ping idle connections older than this
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))  # set to 0 behind a transaction-mode pooler
+DB_SCHEMA_CACHE_TTL = int(os.getenv("DB_SCHEMA_CACHE_TTL", "300"))  # seconds before table column lists are reloaded
+
+# Pagination
+PAGINATION_DEFAULT_LIMIT = int(os.getenv("PAGINATION_DEFAULT_LIMIT", "50"))
+PAGINATION_MAX_LIMIT = int(os.getenv("PAGINATION_MAX_LIMIT", "200"))
+
 # Application Settings
 MODEL_NAME = os.getenv("MODEL_NAME")
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL")
 EMBEDDING_DIMENSION = int(os.getenv("EMBEDDING_DIMENSION", "1536"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "100"))  # products per embed_documents call during backfills
+EMBEDDING_FETCH_CHUNK_SIZE = int(os.getenv("EMBEDDING_FETCH_CHUNK_SIZE", "2000"))  # rows per round trip when streaming stored vectors
+EMBEDDING_REFRESH_ENABLED = os.getenv("EMBEDDING_REFRESH_ENABLED", "true").lower() == "true"  # background re-embedding of edited products
+EMBEDDING_REFRESH_INTERVAL = int(os.getenv("EMBEDDING_REFRESH_INTERVAL", "60"))  # seconds between polls for dirty products
+EMBEDDING_REFRESH_MAX_ATTEMPTS = int(os.getenv("EMBEDDING_REFRESH_MAX_ATTEMPTS", "5"))  # failed re-embeds before a product waits for its next edit
+EMBEDDING_REFRESH_RETRY_DELAY = int(os.getenv("EMBEDDING_REFRESH_RETRY_DELAY", "60"))  # seconds before the first retry, doubled after each failure
+EMBEDDING_REFRESH_MAX_RETRY_DELAY = int(os.getenv("EMBEDDING_REFRESH_MAX_RETRY_DELAY", "3600"))  # upper bound of the retry delay
+EMBEDDING_JOB_WORKERS = int(os.getenv("EMBEDDING_JOB_WORKERS", "1"))  # background backfill jobs run at the same time per process
+EMBEDDING_JOB_MAX_PENDING = int(os.getenv("EMBEDDING_JOB_MAX_PENDING", "10"))  # queued + running jobs accepted per process
+EMBEDDING_JOB_STALE_AFTER = int(os.getenv("EMBEDDING_JOB_STALE_AFTER", "300"))  # seconds without heartbeat before a running job is taken over
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))  # vectors kept in memory, 0 disables the memory tier
+EMBEDDING_CACHE_PERSIST = os.getenv("EMBEDDING_CACHE_PERSIST", "true").lower() == "true"  # also store vectors in the embedding_cache table
+
+# In-process ANN index
+ANN_INDEX_ENABLED = os.getenv("ANN_INDEX_ENABLED", "true").lower() == "true"
+ANN_INDEX_TABLES = [t.strip() for t in os.getenv("ANN_INDEX_TABLES", "products,content").split(",") if t.strip()]
+ANN_NLIST = int(os.getenv("ANN_NLIST", "0"))  # clusters, 0 = about sqrt(number of vectors)
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "8"))  # clusters scanned per query, higher = better recall, slower
+ANN_MIN_TRAIN_SIZE = int(os.getenv("ANN_MIN_TRAIN_SIZE", "1000"))  # exact search below this many vectors
+ANN_SYNC_ENABLED = os.getenv("ANN_SYNC_ENABLED", "true").lower() == "true"  # pick up other workers' vector writes
+ANN_SYNC_INTERVAL = int(os.getenv("ANN_SYNC_INTERVAL", "30"))  # seconds between delta loads
+ANN_SYNC_OVERLAP = int(os.getenv("ANN_SYNC_OVERLAP", "60"))  # seconds each delta reaches back, for late commits
+
+# Embedding snapshots (memory-mapped, shared by all workers)
+EMBEDDING_SNAPSHOT_ENABLED = os.getenv("EMBEDDING_SNAPSHOT_ENABLED", "true").lower() == "true"
+EMBEDDING_SNAPSHOT_DIR = os.getenv("EMBEDDING_SNAPSHOT_DIR", "data/embeddings")
+EMBEDDING_SNAPSHOT_DTYPE = os.getenv("EMBEDDING_SNAPSHOT_DTYPE", "float32")  # float32 or float16 (half the size)
+EMBEDDING_SNAPSHOT_MAX_AGE = int(os.getenv("EMBEDDING_SNAPSHOT_MAX_AGE", "3600"))  # seconds before startup rescans the table
+
+# Quantized vector storage for in-memory search
+EMBEDDING_QUANTIZATION = os.getenv("EMBEDDING_QUANTIZATION", "float32")  # float32, float16 (2x smaller) or int8 (4x smaller)
+EMBEDDING_RESCORE_FACTOR = int(os.getenv("EMBEDDING_RESCORE_FACTOR", "4"))  # shortlist of top_k * factor rescored in float32
+
+# Search query cache (query embeddings and top-k result ids)
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1000"))
+QUERY_CACHE_TTL = int(os.getenv("QUERY_CACHE_TTL", "300"))  # seconds; also bounds staleness across workers
+
+# In-process BM25 keyword index
+BM25_INDEX_ENABLED = os.getenv("BM25_INDEX_ENABLED", "true").lower() == "true"
+BM25_INDEX_TABLES = [table.strip() for table in os.getenv("BM25_INDEX_TABLES", "products,content").split(",") if table.strip()]
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))  # term frequency saturation
+BM25_B = float(os.getenv("BM25_B", "0.75"))  # document length normalization
+
+# Hybrid retrieval (BM25 + vector, fused with reciprocal rank fusion)
+RRF_K = int(os.getenv("RRF_K", "60"))
+HYBRID_VECTOR_WEIGHT = float(os.getenv("HYBRID_VECTOR_WEIGHT", "1.0"))
+HYBRID_LEXICAL_WEIGHT = float(os.getenv("HYBRID_LEXICAL_WEIGHT", "1.0"))
+HYBRID_CANDIDATE_FACTOR = int(os.getenv("HYBRID_CANDIDATE_FACTOR", "4"))  # each retriever returns limit * factor candidates
+HYBRID_SEARCH_WORKERS = int(os.getenv("HYBRID_SEARCH_WORKERS", "4"))
+
+# Exact-match cache of LLM responses
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "500"))
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "3600"))  # seconds
+
+# Semantic cache for topic generation (near-identical requests share a result)
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.97"))  # minimum cosine similarity for a hit
+SEMANTIC_CACHE_MAX_AGE = int(os.getenv("SEMANTIC_CACHE_MAX_AGE", "86400"))  # seconds before an entry is stale
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "200"))  # per tenant and request kind
+SEMANTIC_CACHE_MAX_SCOPES = int(os.getenv("SEMANTIC_CACHE_MAX_SCOPES", "1000"))
 
 # JWT Settings
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
@@ -0,0 +1,21 @@
+-- Theo dõi embedding cũ của sản phẩm
+-- embedding_text_hash: hash của đoạn văn bản đã dùng để tạo embedding hiện tại
+-- embedding_dirty_at: thời điểm sản phẩm bị đánh dấu cần tạo lại embedding (NULL = đã cập nhật)
+-- embedding_attempts: số lần tạo lại embedding thất bại liên tiếp (đặt lại khi sản phẩm được sửa)
+-- embedding_retry_at: chưa thử lại trước thời điểm này (backoff sau mỗi lần thất bại)
+ALTER TABLE products ADD COLUMN IF NOT EXISTS embedding_text_hash TEXT;
+ALTER TABLE products ADD COLUMN IF NOT EXISTS embedding_dirty_at TIMESTAMP WITH TIME ZONE;
+ALTER TABLE products ADD COLUMN IF NOT EXISTS embedding_attempts INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE products ADD COLUMN IF NOT EXISTS embedding_retry_at TIMESTAMP WITH TIME ZONE;
+
+-- Sản phẩm mới tạo mặc định cần embedding
+ALTER TABLE products ALTER COLUMN embedding_dirty_at SET DEFAULT NOW();
+
+-- Sản phẩm chưa có embedding được đưa vào hàng đợi
+UPDATE products SET embedding_dirty_at = NOW() WHERE embedding IS NULL AND embedding_dirty_at IS NULL;
+
+-- Worker chỉ quét các dòng bị đánh dấu
+CREATE INDEX IF NOT EXISTS products_embedding_dirty_at_idx ON products (embedding_dirty_at) WHERE embedding_dirty_at IS NOT NULL;
+
+-- Thông báo hoàn thành
+SELECT 'Đã thêm cột theo dõi embedding cho products' as message;
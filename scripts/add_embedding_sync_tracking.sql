@@ -0,0 +1,54 @@
+-- Đồng bộ ANN index trong bộ nhớ giữa các worker
+-- embedding_updated_at: thời điểm vector của dòng được ghi gần nhất (do trigger cập nhật)
+-- embedding_deletions: id các dòng đã bị xoá, để mọi worker bỏ chúng khỏi index
+ALTER TABLE products ADD COLUMN IF NOT EXISTS embedding_updated_at TIMESTAMP WITH TIME ZONE;
+ALTER TABLE content ADD COLUMN IF NOT EXISTS embedding_updated_at TIMESTAMP WITH TIME ZONE;
+
+CREATE TABLE IF NOT EXISTS embedding_deletions (
+    table_name TEXT NOT NULL,
+    record_id TEXT NOT NULL,
+    deleted_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS embedding_deletions_table_deleted_at_idx ON embedding_deletions (table_name, deleted_at);
+
+-- Ghi thời điểm mỗi khi vector thay đổi, dù ai ghi (API, script, Supabase)
+CREATE OR REPLACE FUNCTION touch_embedding_updated_at() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' OR NEW.embedding IS DISTINCT FROM OLD.embedding THEN
+        NEW.embedding_updated_at := clock_timestamp();
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Ghi lại id của dòng bị xoá (kể cả xoá dây chuyền khi xoá brand)
+CREATE OR REPLACE FUNCTION log_embedding_deletion() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO embedding_deletions (table_name, record_id) VALUES (TG_TABLE_NAME, OLD.id::text);
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS products_embedding_updated_at ON products;
+CREATE TRIGGER products_embedding_updated_at BEFORE INSERT OR UPDATE OF embedding ON products
+    FOR EACH ROW EXECUTE FUNCTION touch_embedding_updated_at();
+
+DROP TRIGGER IF EXISTS content_embedding_updated_at ON content;
+CREATE TRIGGER content_embedding_updated_at BEFORE INSERT OR UPDATE OF embedding ON content
+    FOR EACH ROW EXECUTE FUNCTION touch_embedding_updated_at();
+
+DROP TRIGGER IF EXISTS products_embedding_deleted ON products;
+CREATE TRIGGER products_embedding_deleted AFTER DELETE ON products
+    FOR EACH ROW EXECUTE FUNCTION log_embedding_deletion();
+
+DROP TRIGGER IF EXISTS content_embedding_deleted ON content;
+CREATE TRIGGER content_embedding_deleted AFTER DELETE ON content
+    FOR EACH ROW EXECUTE FUNCTION log_embedding_deletion();
+
+-- Worker chỉ đọc các dòng thay đổi sau lần đồng bộ trước
+CREATE INDEX IF NOT EXISTS products_embedding_updated_at_idx ON products (embedding_updated_at);
+CREATE INDEX IF NOT EXISTS content_embedding_updated_at_idx ON content (embedding_updated_at);
+
+-- Thông báo hoàn thành
+SELECT 'Đã thêm theo dõi thay đổi embedding cho products và content' as message;
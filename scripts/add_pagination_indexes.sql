@@ -0,0 +1,14 @@
+-- Index cho phân trang keyset theo (created_at, id), mới nhất trước
+-- Mỗi trang là một index range scan thay vì quét và sắp xếp toàn bộ bảng
+CREATE INDEX IF NOT EXISTS topics_user_created_at_id_idx ON topics (user_id, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS brands_user_created_at_id_idx ON brands (user_id, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS products_user_created_at_id_idx ON products (user_id, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS products_brand_created_at_id_idx ON products (brand_id, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS products_created_at_id_idx ON products (created_at DESC, id DESC);
+
+-- Thông báo hoàn thành
+SELECT 'Đã tạo các index phân trang' as message;
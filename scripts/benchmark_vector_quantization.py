@@ -0,0 +1,76 @@
+import argparse
+import time
+
+import numpy as np
+
+from app.utils.ann_index import IVFFlatIndex
+from app.utils.vector_search import normalize_rows, top_k_indices
+
+def synthetic_vectors(count, dim, clusters=64, seed=0):
+    """
+    Clustered random vectors, closer to real embeddings than uniform noise.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, count)
+    vectors = centers[labels] + 0.5 * rng.standard_normal((count, dim)).astype(np.float32)
+    return normalize_rows(vectors)
+
+def load_vectors(table_name):
+    """
+    Vectors of a table from its embedding snapshot (built from the database if missing).
+    """
+    from app.services.embedding_service import EmbeddingService
+    snapshot = EmbeddingService().load_embedding_snapshot(table_name)
+    return snapshot.ids, snapshot.matrix
+
+def benchmark(ids, vectors, queries, k, nprobe):
+    # Kết quả chính xác (brute force float32) làm chuẩn để tính recall
+    exact_scores = queries @ np.asarray(vectors, dtype=np.float32).T
+    truth = [set(top_k_indices(scores, k).tolist()) for scores in exact_scores]
+    rows = {record_id: row for row, record_id in enumerate(ids)}
+
+    print(f"{len(ids)} vectors x {vectors.shape[1]} dims, {len(queries)} queries, k={k}, nprobe={nprobe}")
+    print(f"{'storage':<10} {'rescore':<8} {'memory MB':>10} {'recall@k':>9} {'ms/query':>9}")
+    for mode in ("float32", "float16", "int8"):
+        for rescore in ((False,) if mode == "float32" else (False, True)):
+            index = IVFFlatIndex(nprobe=nprobe, quantization=mode)
+            # normalized=True dùng ma trận gốc làm nguồn chấm lại float32
+            index.build(ids, vectors, normalized=rescore or mode == "float32")
+
+            hits = 0
+            started = time.perf_counter()
+            for query, expected in zip(queries, truth):
+                found = index.search(query, k)
+                hits += len(expected & {rows[record_id] for record_id, _ in found})
+            elapsed = time.perf_counter() - started
+
+            stats = index.stats()
+            print(f"{mode:<10} {'yes' if rescore else 'no':<8} {stats['memory_bytes'] / 2 ** 20:>10.1f} "
+                  f"{hits / (k * len(queries)):>9.4f} {1000 * elapsed / len(queries):>9.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall, latency and memory of quantized vector storage")
+    parser.add_argument("--table", help="Benchmark the stored vectors of this table instead of synthetic data")
+    parser.add_argument("--count", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=8)
+    args = parser.parse_args()
+
+    if args.table:
+        ids, vectors = load_vectors(args.table)
+    else:
+        vectors = synthetic_vectors(args.count, args.dim)
+        ids = [str(row) for row in range(len(vectors))]
+
+    # Truy vấn là các vector đã lưu có thêm nhiễu
+    rng = np.random.default_rng(1)
+    sample = rng.choice(len(ids), min(args.queries, len(ids)), replace=False)
+    queries = np.asarray(vectors[np.sort(sample)], dtype=np.float32)
+    queries = normalize_rows(queries + 0.05 * rng.standard_normal(queries.shape).astype(np.float32))
+    benchmark(ids, vectors, queries, args.k, args.nprobe)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+-- Bảng cache embedding theo (model, hash của văn bản đã chuẩn hoá)
+-- Văn bản giống hệt nhau không cần gọi lại API embedding
+CREATE TABLE IF NOT EXISTS embedding_cache (
+    model TEXT NOT NULL,
+    text_hash CHAR(64) NOT NULL,
+    embedding DOUBLE PRECISION[] NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (model, text_hash)
+);
+
+-- Thông báo hoàn thành
+SELECT 'Đã tạo bảng embedding_cache' as message;
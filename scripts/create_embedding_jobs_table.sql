@@ -0,0 +1,25 @@
+-- Bảng lưu các job embedding chạy nền (backfill), dùng để theo dõi tiến độ và chạy tiếp sau khi khởi động lại
+CREATE TABLE IF NOT EXISTS embedding_jobs (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',  -- queued, running, completed, failed, cancelled
+    params JSONB NOT NULL DEFAULT '{}'::jsonb,
+    total INTEGER NOT NULL DEFAULT 0,
+    processed INTEGER NOT NULL DEFAULT 0,
+    successful INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    failures JSONB NOT NULL DEFAULT '[]'::jsonb,
+    last_product_id UUID,  -- sản phẩm cuối cùng của batch đã commit, job chạy tiếp từ đây
+    processed_at_start INTEGER NOT NULL DEFAULT 0,
+    cancel_requested BOOLEAN NOT NULL DEFAULT FALSE,
+    error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    started_at TIMESTAMP WITH TIME ZONE,
+    heartbeat_at TIMESTAMP WITH TIME ZONE,
+    finished_at TIMESTAMP WITH TIME ZONE
+);
+
+CREATE INDEX IF NOT EXISTS embedding_jobs_status_idx ON embedding_jobs (status) WHERE status IN ('queued', 'running');
+
+-- Thông báo hoàn thành
+SELECT 'Đã tạo bảng embedding_jobs' as message;
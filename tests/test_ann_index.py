@@ -0,0 +1,165 @@
+"""Tests for the in-process IVF-flat ANN index and its cross-worker sync in app.utils.ann_index."""
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from app.utils import ann_index
+from app.utils.ann_index import IVFFlatIndex, ann_remove, ann_upsert, sync_ann_index
+from app.utils.vector_search import normalize_rows
+
+def _vectors(count=400, dim=32, seed=7):
+    return np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32)
+
+def _exact_top(vectors, query, k):
+    scores = normalize_rows(vectors) @ normalize_rows(query.reshape(1, -1))[0]
+    return [str(row) for row in np.argsort(-scores)[:k]]
+
+def _index(vectors, **options):
+    settings = {"nlist": 8, "nprobe": 8, "min_train_size": 100, "quantization": "float32"}
+    settings.update(options)
+    index = IVFFlatIndex(**settings)
+    index.build([str(row) for row in range(len(vectors))], vectors)
+    return index
+
+def test_full_probe_is_exact_and_fewer_probes_scan_less():
+    """Test that probing every cluster gives the exact top-k, and one probe still finds a stored vector."""
+    vectors = _vectors()
+    index = _index(vectors)
+    assert index.trained
+    assert index.stats()["nlist"] == 8
+
+    query = vectors[10] + 0.1 * _vectors(1, seed=2)[0]
+    results = index.search(query, k=5)
+    assert [record_id for record_id, _ in results] == _exact_top(vectors, query, 5)
+    assert index.search(vectors[10], k=1, nprobe=1)[0][0] == "10"
+
+def test_int8_index_rescores_from_float32_source():
+    """Test that an int8 index rescored against the normalized float32 matrix still returns the exact top-k."""
+    vectors = _vectors()
+    index = IVFFlatIndex(nlist=8, nprobe=8, min_train_size=100, quantization="int8")
+    # Ma trận float32 đã chuẩn hoá làm nguồn chấm lại điểm, như khi dựng từ snapshot
+    index.build([str(row) for row in range(len(vectors))], normalize_rows(vectors), normalized=True)
+    assert index.trained
+
+    query = vectors[10] + 0.1 * _vectors(1, seed=2)[0]
+    assert [record_id for record_id, _ in index.search(query, k=5)] == _exact_top(vectors, query, 5)
+
+def test_small_index_stays_exact():
+    """Test that below min_train_size the index is not clustered."""
+    vectors = _vectors(50)
+    index = _index(vectors, min_train_size=100)
+    assert not index.trained
+    query = _vectors(1, seed=4)[0]
+    assert [record_id for record_id, _ in index.search(query, k=3)] == _exact_top(vectors, query, 3)
+
+def test_upsert_replace_and_remove():
+    """Test that upserted vectors are found, replaced ones move and removed ones disappear."""
+    vectors = _vectors()
+    index = _index(vectors)
+
+    new_vector = _vectors(1, seed=3)[0]
+    index.upsert("new", new_vector)
+    assert index.search(new_vector, k=1)[0][0] == "new"
+
+    index.upsert("new", vectors[5])
+    assert {record_id for record_id, _ in index.search(vectors[5], k=2)} == {"5", "new"}
+
+    index.remove("new")
+    index.remove("0")
+    index.remove("missing")
+    assert len(index) == len(vectors) - 1
+    assert "0" not in [record_id for record_id, _ in index.search(vectors[0], k=10)]
+    with pytest.raises(ValueError):
+        index.upsert("bad", [1.0, 0.0])
+
+def test_threshold_filters_low_scores():
+    """Test that matches below the similarity threshold are dropped."""
+    index = IVFFlatIndex(nlist=0, nprobe=1, min_train_size=100, quantization="float32")
+    index.build(["a", "b"], [[1.0, 0.0], [0.0, 1.0]])
+    assert [record_id for record_id, _ in index.search([1.0, 0.05], k=2, threshold=0.5)] == ["a"]
+
+@pytest.fixture
+def loaded_index(monkeypatch):
+    index = IVFFlatIndex(nlist=0, nprobe=1, min_train_size=100, quantization="float32")
+    index.build(["a", "b"], [[1.0, 0.0], [0.0, 1.0]])
+    index.synced_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    monkeypatch.setattr(ann_index, "ann_indexes", {"products": index})
+    monkeypatch.setattr(ann_index, "EMBEDDING_SNAPSHOT_ENABLED", False)
+    return index
+
+def test_ann_upsert_and_remove_follow_writes(loaded_index):
+    """Test the write hooks used by the controllers, including deletes."""
+    ann_upsert("products", "c", "[1.0,1.0]")
+    assert loaded_index.search([1.0, 1.0], k=1)[0][0] == "c"
+    ann_remove("products", "a")
+    assert "a" not in [record_id for record_id, _ in loaded_index.search([1.0, 0.0], k=3)]
+    # Bảng chưa có index thì bỏ qua
+    ann_upsert("content", "x", [1.0, 0.0])
+
+class FakeSyncCursor:
+    def __init__(self, results):
+        self.results = results
+        self.queries = []
+
+    def execute(self, query, params=None):
+        self.queries.append((query, params))
+
+    def fetchone(self):
+        return self.results.pop(0)
+
+    def fetchall(self):
+        return self.results.pop(0)
+
+    def close(self):
+        pass
+
+def test_sync_applies_other_workers_writes_and_deletions(loaded_index, monkeypatch):
+    """Test that the delta since synced_at (minus the overlap) is applied and the watermark moves."""
+    now = datetime(2024, 1, 1, 0, 5, tzinfo=timezone.utc)
+    cursor = FakeSyncCursor([
+        {"now": now},
+        [{"id": "c", "embedding": "[1.0,1.0]"}, {"id": "b", "embedding": None}],
+        [{"record_id": "a"}],
+    ])
+
+    class FakeConnection:
+        def cursor(self):
+            return cursor
+
+        def commit(self):
+            pass
+
+    @contextmanager
+    def db_connection():
+        yield FakeConnection()
+
+    monkeypatch.setattr(ann_index, "db_connection", db_connection)
+    monkeypatch.setattr(ann_index, "has_column", lambda table, column: True)
+
+    assert sync_ann_index("products", overlap=60) == 3
+    assert [record_id for record_id, _ in loaded_index.search([1.0, 1.0], k=5)] == ["c"]
+    assert loaded_index.synced_at == now
+    assert cursor.queries[1][1] == (datetime(2024, 1, 1, tzinfo=timezone.utc) - timedelta(seconds=60),)
+
+def test_sync_needs_change_tracking(loaded_index, monkeypatch):
+    """Test that sync is a no-op without the tracking column or a loaded index."""
+    monkeypatch.setattr(ann_index, "has_column", lambda table, column: False)
+    assert sync_ann_index("products") is None
+    assert sync_ann_index("content") is None
+
+def test_syncer_skips_failing_tables(loaded_index, monkeypatch):
+    """Test that one table failing to sync does not stop the others."""
+    from app.services import ann_index_syncer
+    monkeypatch.setitem(ann_index.ann_indexes, "content", IVFFlatIndex(quantization="float32"))
+
+    def sync(table_name):
+        if table_name == "content":
+            raise RuntimeError("connection lost")
+        return 2
+
+    monkeypatch.setattr(ann_index_syncer, "sync_ann_index", sync)
+    monkeypatch.setattr(ann_index_syncer, "ann_indexes", ann_index.ann_indexes)
+    syncer = ann_index_syncer.AnnIndexSyncer(interval=60)
+    assert syncer.run_once() == {"products": 2, "content": None}
+    assert syncer.stats()["last_result"] == {"products": 2, "content": None}
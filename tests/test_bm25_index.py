@@ -0,0 +1,51 @@
+"""Tests for the in-process BM25 index in app.utils.bm25_index."""
+from app.utils import bm25_index
+from app.utils.bm25_index import BM25Index, bm25_remove, bm25_upsert, fold_diacritics, tokenize
+from app.utils.query_cache import query_cache
+
+def _index():
+    index = BM25Index()
+    index.build([
+        ("1", "Kem chống nắng cho da dầu"),
+        ("2", "Sữa rửa mặt cho da khô"),
+        ("3", "Kem dưỡng ẩm ban đêm, kem dưỡng da khô"),
+    ])
+    return index
+
+def test_tokenize_folds_case_and_diacritics():
+    """Test that queries typed without accents match accented text."""
+    assert fold_diacritics("Kem Chống Nắng") == "Kem Chong Nang"
+    assert set(tokenize("kem chong nang")) <= set(tokenize("Kem Chống Nắng"))
+
+def test_bm25_ranks_by_term_frequency_and_rarity():
+    """Test that documents sharing no term are left out and the best match comes first."""
+    results = _index().search("kem dưỡng", k=10)
+    assert [record_id for record_id, _ in results] == ["3", "1"]
+    assert results[0][1] > results[1][1] > 0
+
+def test_bm25_upsert_and_remove():
+    """Test that replaced and removed documents stop matching their old text."""
+    index = _index()
+    index.upsert("1", "Son môi màu đỏ")
+    assert "1" not in [record_id for record_id, _ in index.search("chống nắng")]
+    assert [record_id for record_id, _ in index.search("son môi")] == ["1"]
+
+    index.remove("3")
+    index.remove("missing")
+    assert len(index) == 2
+    assert index.search("dưỡng ẩm") == []
+
+def test_write_hooks_update_loaded_index_and_drop_cached_results(monkeypatch):
+    """Test that saved and deleted products reach a loaded index and invalidate the table's cached results."""
+    index = BM25Index()
+    monkeypatch.setitem(bm25_index.bm25_indexes, "products", index)
+    query_cache.put_results("products", "son môi", 5, ["old"])
+
+    bm25_upsert("products", {"id": "p1", "name": "Son môi", "description": "Màu đỏ"})
+    assert [record_id for record_id, _ in index.search("son moi")] == ["p1"]
+    assert query_cache.get_results("products", "son môi", 5) is None
+
+    bm25_remove("products", "p1")
+    assert len(index) == 0
+    # Bảng chưa nạp index thì bỏ qua, không lỗi
+    bm25_upsert("content", {"id": "c1", "title": "x"})
@@ -0,0 +1,68 @@
+"""Tests for the shared API client registry in app.utils.clients."""
+import threading
+import time
+
+from app.utils import clients as clients_module
+from app.utils.clients import ClientRegistry
+
+class FakeClient:
+    def __init__(self, **options):
+        self.options = options
+
+def test_get_creates_once_and_reuses():
+    """Test that the factory runs on first use only."""
+    registry = ClientRegistry()
+    calls = []
+
+    def factory():
+        calls.append(1)
+        return object()
+
+    first = registry.get(("x",), factory)
+    assert registry.get(("x",), factory) is first
+    assert len(calls) == 1
+
+def test_get_is_safe_across_threads():
+    """Test that threads racing for the same key share a single client."""
+    registry = ClientRegistry()
+    calls = []
+
+    def factory():
+        calls.append(1)
+        time.sleep(0.01)
+        return object()
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get(("x",), factory))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert all(client is results[0] for client in results)
+
+def test_clients_keyed_by_options(monkeypatch):
+    """Test that chat models differ by temperature and vector stores share the Supabase and embeddings clients."""
+    monkeypatch.setattr(clients_module, "ChatOpenAI", FakeClient)
+    monkeypatch.setattr(clients_module, "OpenAIEmbeddings", FakeClient)
+    monkeypatch.setattr(clients_module, "SupabaseVectorStore", FakeClient)
+    monkeypatch.setattr(clients_module, "get_supabase_client", object)
+    registry = ClientRegistry()
+
+    assert registry.chat_model("gpt-4", 0.7) is registry.chat_model("gpt-4", 0.7)
+    assert registry.chat_model("gpt-4", 0.7) is not registry.chat_model("gpt-4", 0.2)
+
+    products = registry.vector_store("products", model="m")
+    content = registry.vector_store("content", model="m")
+    assert products is not content
+    assert products.options["client"] is content.options["client"] is registry.supabase()
+    assert products.options["embedding"] is registry.embeddings("m")
+
+def test_clear_forgets_clients(monkeypatch):
+    """Test that clients are recreated after clear(), e.g. after rotating keys."""
+    monkeypatch.setattr(clients_module, "OpenAIEmbeddings", FakeClient)
+    registry = ClientRegistry()
+    embeddings = registry.embeddings("m")
+
+    registry.clear()
+    assert registry.embeddings("m") is not embeddings
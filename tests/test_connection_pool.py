@@ -0,0 +1,165 @@
+"""Tests for the psycopg2 connection pool in app.utils.database."""
+import gc
+import time
+
+import psycopg2
+import pytest
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+from app.utils import database
+from app.utils.database import ConnectionPool
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, query, params=None):
+        if not self.conn.healthy:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+        self.conn.queries.append(query)
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    """Stands in for PooledConnection: the attributes and methods the pool uses, no socket."""
+    def __init__(self):
+        self.closed = 0
+        self.healthy = True
+        self.in_use = False
+        self.finalizer = None
+        self.created_at = time.monotonic()
+        self.last_used_at = self.created_at
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+        self.rollbacks = 0
+        self.queries = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def get_transaction_status(self):
+        return self.status
+
+    def discard(self):
+        self.closed = 1
+
+class FakePool(ConnectionPool):
+    def __init__(self, **options):
+        settings = {"min_size": 0, "max_size": 2, "timeout": 0.05, "max_lifetime": 3600, "health_check_interval": 30}
+        settings.update(options)
+        super().__init__(**settings)
+        self.opened = []
+
+    def _connect(self):
+        conn = FakeConnection()
+        self.opened.append(conn)
+        return conn
+
+def test_checkout_and_return_reuses_the_connection():
+    """Test that a returned connection is handed out again instead of opening a new one."""
+    pool = FakePool()
+    conn = pool.getconn()
+    assert conn.in_use
+    assert pool.stats() == {"size": 1, "idle": 0, "in_use": 1, "max_size": 2}
+
+    pool.release(conn)
+    assert not conn.in_use
+    assert pool.getconn() is conn
+    assert len(pool.opened) == 1
+
+def test_min_size_is_opened_on_first_checkout():
+    """Test that the pool warms up to min_size on first use."""
+    pool = FakePool(min_size=2, max_size=3)
+    pool.getconn()
+    assert len(pool.opened) == 2
+    assert pool.stats()["idle"] == 1
+
+def test_checkout_times_out_when_the_pool_is_exhausted():
+    """Test that getconn() waits at most ``timeout`` seconds for a free slot."""
+    pool = FakePool(max_size=1)
+    pool.getconn()
+    with pytest.raises(PoolError):
+        pool.getconn()
+
+def test_release_rolls_back_an_open_transaction():
+    """Test that uncommitted work never leaks into the next checkout."""
+    pool = FakePool()
+    conn = pool.getconn()
+    conn.status = extensions.TRANSACTION_STATUS_INTRANS
+    pool.release(conn)
+    assert conn.rollbacks == 1
+    assert pool.stats()["idle"] == 1
+
+def test_connections_past_max_lifetime_are_recycled():
+    """Test that an old connection is closed on return and on checkout, and replaced."""
+    pool = FakePool(max_lifetime=60)
+    conn = pool.getconn()
+    conn.created_at -= 120
+    pool.release(conn)
+    assert conn.closed
+    assert pool.stats()["size"] == 0
+
+    fresh = pool.getconn()
+    pool.release(fresh)
+    fresh.created_at -= 120
+    assert pool.getconn() is not fresh
+    assert fresh.closed
+
+def test_health_check_replaces_broken_idle_connections():
+    """Test that a connection idle past the health check interval is probed and dropped if dead."""
+    pool = FakePool(health_check_interval=10)
+    conn = pool.getconn()
+    pool.release(conn)
+
+    # Vừa dùng xong thì không cần kiểm tra
+    assert pool.getconn() is conn
+    assert conn.queries == []
+    pool.release(conn)
+
+    conn.last_used_at -= 60
+    assert pool.getconn() is conn
+    assert conn.queries == ["SELECT 1"]
+    pool.release(conn)
+
+    conn.last_used_at -= 60
+    conn.healthy = False
+    replacement = pool.getconn()
+    assert replacement is not conn
+    assert conn.closed
+    assert pool.stats()["size"] == 1
+
+def test_forgotten_connection_gives_its_slot_back():
+    """Test that a checked-out connection garbage collected without close() frees its slot."""
+    pool = FakePool(max_size=1)
+    pool.getconn()
+    pool.opened.clear()
+    gc.collect()
+    assert pool.stats()["size"] == 0
+    pool.getconn()
+
+def test_closed_pool_refuses_checkouts():
+    """Test that closeall() closes idle connections and later checkouts fail."""
+    pool = FakePool()
+    conn = pool.getconn()
+    pool.release(conn)
+    pool.closeall()
+    assert conn.closed
+    with pytest.raises(PoolError):
+        pool.getconn()
+
+def test_pool_is_rebuilt_after_fork(monkeypatch):
+    """Test that a forked worker gets its own pool instead of the parent's sockets."""
+    monkeypatch.setattr(database, "_pool", None)
+    monkeypatch.setattr(database, "_pool_pid", None)
+    monkeypatch.setattr(database.os, "getpid", lambda: 1000)
+    parent = database.get_connection_pool()
+    assert database.get_connection_pool() is parent
+
+    monkeypatch.setattr(database.os, "getpid", lambda: 1001)
+    child = database.get_connection_pool()
+    assert child is not parent
+    assert database.get_connection_pool() is child
@@ -0,0 +1,76 @@
+"""Tests for the SQL builders and helpers in app.utils.database."""
+import os
+import uuid
+
+import pytest
+from app.utils.database import (
+    build_insert, build_select, has_list_filter, restore_input_order, schema_cache, select_rows, get_connection_pool
+)
+
+def test_build_select_shape_only_depends_on_filter_keys():
+    """Test that values go to the parameters, never into the SQL text."""
+    first = build_select("products", {"id": "a", "brand_id": "b"}, columns=["id", "name"], limit=5)
+    second = build_select("products", {"id": "c", "brand_id": "d"}, columns=["id", "name"], limit=10)
+    assert first[0] == second[0]
+    assert first[0] == 'SELECT "id", "name" FROM "products" WHERE "id" = $1 AND "brand_id" = $2 LIMIT $3'
+    assert first[1] == ["a", "b", 5]
+
+def test_build_select_list_filter_on_uuid_column_is_cast():
+    """Test that list filters on uuid columns compare against uuid[] instead of text[]."""
+    ids = [str(uuid.uuid4()), str(uuid.uuid4())]
+    column_types = {"id": "uuid", "name": "text"}
+    query, params = build_select("brands", {"id__in": ids}, column_types=column_types)
+    assert query == 'SELECT * FROM "brands" WHERE "id" = ANY($1::uuid[])'
+    assert params == [ids]
+
+    query, _ = build_select("brands", {"id": tuple(ids)}, column_types=column_types)
+    assert query == 'SELECT * FROM "brands" WHERE "id" = ANY($1::uuid[])'
+
+    query, _ = build_select("brands", {"name__in": ["a", "b"]}, column_types=column_types)
+    assert query == 'SELECT * FROM "brands" WHERE "name" = ANY($1)'
+
+def test_build_select_order_and_offset():
+    """Test ORDER BY, LIMIT and OFFSET placement and parameter numbering."""
+    query, params = build_select("content", {"brand_id": "b"}, order_by=["-created_at", "id"], limit=20, offset=40)
+    assert query == 'SELECT * FROM "content" WHERE "brand_id" = $1 ORDER BY "created_at" DESC, "id" LIMIT $2 OFFSET $3'
+    assert params == ["b", 20, 40]
+
+def test_has_list_filter():
+    """Test detection of filters that become = ANY(...)."""
+    assert has_list_filter({"id__in": ["a"]})
+    assert has_list_filter({"id": ["a"]})
+    assert not has_list_filter({"id": "a", "embedding__isnull": True})
+    assert not has_list_filter(None)
+
+def test_build_insert_numbers_placeholders_row_by_row():
+    """Test that a multi-row INSERT numbers placeholders across rows in column order."""
+    query = build_insert("topics", ["id", "title"], 2, returning=["id"])
+    assert query == 'INSERT INTO "topics" ("id", "title") VALUES ($1, $2), ($3, $4) RETURNING "id"'
+
+    query = build_insert("topics", ["title"], 1, returning="*")
+    assert query == 'INSERT INTO "topics" ("title") VALUES ($1) RETURNING *'
+
+def test_restore_input_order():
+    """Test that RETURNING rows are matched back to the input rows on the key."""
+    rows = [{"id": "a"}, {"id": "b"}, {"id": "c"}]
+    returned = [{"id": "c", "n": 3}, {"id": "a", "n": 1}, {"id": "b", "n": 2}]
+    assert [row["n"] for row in restore_input_order(rows, returned)] == [1, 2, 3]
+
+    # Không có khoá ở input thì giữ nguyên thứ tự trả về
+    assert restore_input_order([{"title": "x"}], returned) == returned
+    assert restore_input_order(rows, []) == []
+
+@pytest.mark.skipif(not os.getenv("DB_HOST"), reason="needs a database (DB_HOST)")
+def test_select_rows_in_filter_on_uuid_column():
+    """Test an __in filter on a real uuid column, through a prepared statement and a plain execute."""
+    import psycopg2
+
+    schema_cache.invalidate("brands")
+    ids = [str(uuid.uuid4()), str(uuid.uuid4())]
+    assert select_rows("brands", {"id__in": ids}, columns=["id"]) == []
+
+    conn = psycopg2.connect(**get_connection_pool().connect_params)
+    try:
+        assert select_rows("brands", {"id__in": ids}, columns=["id"], conn=conn) == []
+    finally:
+        conn.close()
@@ -0,0 +1,61 @@
+"""Tests for the embedding cache in app.utils.embedding_cache."""
+import unicodedata
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2.errors import UndefinedTable
+from app.utils import embedding_cache as embedding_cache_module
+from app.utils.embedding_cache import EmbeddingCache, normalize_text, text_hash
+
+def test_text_hash_ignores_unicode_form_and_whitespace_but_not_case():
+    """Test that composed/decomposed diacritics and extra spaces share a key, different case does not."""
+    composed = "Sữa tươi  Vinamilk\n"
+    decomposed = unicodedata.normalize("NFD", "Sữa tươi Vinamilk")
+    assert normalize_text(composed) == "Sữa tươi Vinamilk"
+    assert text_hash(composed) == text_hash(decomposed)
+    assert text_hash("Vinamilk") != text_hash("vinamilk")
+
+def test_memory_tier_round_trip_and_lru():
+    """Test that vectors come back as lists, keyed per model, and the oldest entry is evicted."""
+    cache = EmbeddingCache(max_size=2, persist=False)
+    cache.put("model-a", "one", [0.5, 0.25])
+    assert cache.get("model-a", "one") == [0.5, 0.25]
+    assert cache.get("model-b", "one") is None
+
+    cache.put("model-a", "two", [1.0, 0.0])
+    cache.get("model-a", "one")
+    cache.put("model-a", "three", [0.0, 1.0])
+    assert cache.get("model-a", "two") is None
+    assert cache.get("model-a", "one") == [0.5, 0.25]
+
+    stats = cache.stats()
+    assert (stats["size"], stats["memory_hits"], stats["misses"]) == (2, 3, 2)
+
+def test_get_many_returns_one_hash_per_text():
+    """Test that duplicate texts share a hash and are all counted as lookups."""
+    cache = EmbeddingCache(max_size=10, persist=False)
+    cache.put("model", "a", [1.0])
+    hashes, found = cache.get_many("model", ["a", "b", "a"])
+    assert hashes[0] == hashes[2] != hashes[1]
+    assert found == {hashes[0]: [1.0]}
+    assert cache.stats()["memory_hits"] == 2
+
+def _failing_connection(error):
+    @contextmanager
+    def db_connection():
+        raise error
+        yield
+    return db_connection
+
+def test_missing_table_disables_persistence(monkeypatch):
+    """Test that only a missing table switches the cache to memory-only mode."""
+    cache = EmbeddingCache(max_size=10, persist=True)
+    monkeypatch.setattr(embedding_cache_module, "db_connection", _failing_connection(psycopg2.OperationalError("timeout")))
+    assert cache.get("model", "text") is None
+    assert cache.persist
+
+    monkeypatch.setattr(embedding_cache_module, "db_connection", _failing_connection(UndefinedTable("embedding_cache")))
+    cache.put("model", "text", [1.0])
+    assert not cache.persist
+    assert cache.get("model", "text") == [1.0]
+    assert cache.stats()["db_errors"] == 2
@@ -0,0 +1,141 @@
+"""Tests for resumable embedding backfill jobs in EmbeddingJobManager."""
+from datetime import datetime, timedelta
+
+import pytest
+from app.services import embedding_jobs as embedding_jobs_module
+from app.services.embedding_jobs import EmbeddingJobManager, JobQueueFullError
+
+class FakeProductEmbeddings:
+    def __init__(self, failing_ids=()):
+        self.failing_ids = set(failing_ids)
+        self.batches = []
+
+    def product_columns(self):
+        return ["id", "name"]
+
+    def embed_products(self, products, batch_size):
+        self.batches.append([product["id"] for product in products])
+        failed = [{"id": product["id"], "error": "boom"} for product in products if product["id"] in self.failing_ids]
+        return {"successful": len(products) - len(failed), "failed": len(failed), "failed_products": failed}
+
+def _job(**fields):
+    job = {
+        "id": "job-1", "kind": "product_backfill", "status": "running", "params": {"batch_size": 2},
+        "last_product_id": None, "processed": 0, "successful": 0, "failed": 0, "failures": []
+    }
+    job.update(fields)
+    return job
+
+def _manager(monkeypatch, product_ids, product_embeddings, cancel_after=None):
+    """Manager over an in-memory products table; records every _update call."""
+    manager = EmbeddingJobManager(max_workers=1, max_pending=2)
+    manager._product_embeddings = product_embeddings
+    updates = []
+
+    def select_rows(table_name, filters, columns, order_by, limit):
+        after = filters.get("id__gt")
+        remaining = [product_id for product_id in sorted(product_ids) if after is None or product_id > after]
+        return [{"id": product_id, "name": product_id} for product_id in remaining[:limit]]
+
+    def update(job_id, **fields):
+        updates.append(fields)
+        return cancel_after is not None and len(updates) > cancel_after
+
+    monkeypatch.setattr(embedding_jobs_module, "select_rows", select_rows)
+    monkeypatch.setattr(manager, "_update", update)
+    monkeypatch.setattr(
+        manager, "_count_remaining",
+        lambda last_product_id: len([product_id for product_id in product_ids if last_product_id is None or product_id > last_product_id])
+    )
+    return manager, updates
+
+def test_backfill_commits_progress_per_batch(monkeypatch):
+    """Test that every batch writes its counters and the last product id."""
+    product_embeddings = FakeProductEmbeddings(failing_ids={"c"})
+    manager, updates = _manager(monkeypatch, ["a", "b", "c", "d", "e"], product_embeddings)
+
+    assert manager._run_product_backfill(_job()) == "completed"
+    assert product_embeddings.batches == [["a", "b"], ["c", "d"], ["e"]]
+    assert updates[0] == {"total": 5}
+    assert [update["last_product_id"] for update in updates[1:]] == ["b", "d", "e"]
+    assert updates[-1]["processed"] == 5 and updates[-1]["successful"] == 4 and updates[-1]["failed"] == 1
+    assert '"id": "c"' in updates[-1]["failures"]
+
+def test_backfill_resumes_after_last_committed_batch(monkeypatch):
+    """Test that a resumed job skips the products it already processed and keeps its counters."""
+    product_embeddings = FakeProductEmbeddings()
+    manager, updates = _manager(monkeypatch, ["a", "b", "c", "d"], product_embeddings)
+
+    job = _job(last_product_id="b", processed=2, successful=2)
+    assert manager._run_product_backfill(job) == "completed"
+    assert product_embeddings.batches == [["c", "d"]]
+    assert updates[0] == {"total": 4}
+    assert updates[-1]["processed"] == 4 and updates[-1]["successful"] == 4
+
+def test_backfill_stops_on_cancel_and_shutdown(monkeypatch):
+    """Test that cancellation ends the job and shutdown hands it back to the queue after the current batch."""
+    product_embeddings = FakeProductEmbeddings()
+    manager, _ = _manager(monkeypatch, ["a", "b", "c", "d"], product_embeddings, cancel_after=1)
+    assert manager._run_product_backfill(_job()) == "cancelled"
+    assert product_embeddings.batches == [["a", "b"]]
+
+    product_embeddings = FakeProductEmbeddings()
+    manager, _ = _manager(monkeypatch, ["a", "b", "c", "d"], product_embeddings)
+    manager._stopping.set()
+    assert manager._run_product_backfill(_job()) is None
+    assert product_embeddings.batches == [["a", "b"]]
+
+def test_run_requeues_on_shutdown_and_records_failures(monkeypatch):
+    """Test the final status written for each way a runner can end."""
+    manager = EmbeddingJobManager(max_workers=1, max_pending=2)
+    finished = []
+    updates = []
+    monkeypatch.setattr(manager, "_claim", lambda job_id: _job(id=job_id))
+    monkeypatch.setattr(manager, "_finish", lambda job_id, status, error=None: finished.append((job_id, status, error)))
+    monkeypatch.setattr(manager, "_update", lambda job_id, **fields: updates.append(fields))
+
+    manager._runners["product_backfill"] = lambda job: None
+    manager._active["j1"] = None
+    manager._run("j1")
+    assert updates == [{"status": "queued"}] and not finished
+    assert "j1" not in manager._active
+
+    def failing(job):
+        raise RuntimeError("openai down")
+
+    manager._runners["product_backfill"] = failing
+    manager._run("j2")
+    assert finished == [("j2", "failed", "openai down")]
+
+def test_run_skips_jobs_claimed_elsewhere(monkeypatch):
+    """Test that a job held by a live worker is not run twice."""
+    manager = EmbeddingJobManager(max_workers=1, max_pending=2)
+    monkeypatch.setattr(manager, "_claim", lambda job_id: None)
+    manager._runners["product_backfill"] = lambda job: pytest.fail("runner should not be called")
+    manager._run("j1")
+
+def test_submit_rejects_unknown_kind_and_full_queue():
+    """Test that submit validates the kind and bounds the jobs in progress."""
+    manager = EmbeddingJobManager(max_workers=1, max_pending=1)
+    with pytest.raises(ValueError):
+        manager.submit("unknown")
+
+    manager._active["j1"] = None
+    with pytest.raises(JobQueueFullError):
+        manager.submit("product_backfill")
+
+def test_describe_reports_progress_and_throughput():
+    """Test the progress ratio and the throughput measured since the job was claimed."""
+    started_at = datetime(2024, 1, 1, 12, 0, 0)
+    job = _job(
+        total=200, processed=150, processed_at_start=50, started_at=started_at,
+        heartbeat_at=started_at + timedelta(seconds=20), finished_at=None
+    )
+
+    described = EmbeddingJobManager().describe(job)
+    assert described["progress"] == 0.75
+    assert described["throughput_per_second"] == 5.0
+    assert described["id"] == "job-1"
+
+    empty = EmbeddingJobManager().describe(_job(status="completed", total=0))
+    assert empty["progress"] == 1.0 and empty["throughput_per_second"] is None
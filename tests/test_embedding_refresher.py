@@ -0,0 +1,181 @@
+"""Tests for the background embedding refresher, retry backoff and the dirty mark written with product edits."""
+from contextlib import contextmanager
+
+import pytest
+from app.controllers.product_controller import ProductController
+from app.models.product import ProductUpdate
+from app.services import embedding_refresher as refresher_module
+from app.services.embedding_refresher import EmbeddingRefresher
+from app.utils import product_embeddings as product_embeddings_module
+from app.utils.embedding_cache import text_hash
+from app.utils.product_embeddings import ProductEmbeddings
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.result = None
+
+    def execute(self, query, params=None):
+        self.connection.queries.append((query, params))
+        if "pg_try_advisory_lock" in query:
+            self.result = [{"locked": self.connection.lock_free}]
+        else:
+            self.result = list(self.connection.rows)
+
+    def fetchone(self):
+        return self.result[0]
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    def __init__(self, lock_free=True, rows=()):
+        self.lock_free = lock_free
+        self.rows = rows
+        self.queries = []
+        self.autocommit = False
+        self.commits = 0
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+class FakeProductEmbeddings:
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = 0
+
+    def refresh_dirty_product_embeddings(self, batch_size):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return {"success": True, "total": 0, "batches": []}
+
+def _refresher(monkeypatch, connection, product_embeddings):
+    @contextmanager
+    def dedicated_connection():
+        yield connection
+        connection.closed = True
+
+    monkeypatch.setattr(refresher_module, "dedicated_connection", dedicated_connection)
+    refresher = EmbeddingRefresher(interval=60, batch_size=10)
+    refresher._product_embeddings = product_embeddings
+    return refresher
+
+def test_run_once_holds_session_lock_without_transaction(monkeypatch):
+    """Test that a round takes a session-level lock in autocommit mode and unlocks it afterwards."""
+    connection = FakeConnection()
+    product_embeddings = FakeProductEmbeddings()
+    refresher = _refresher(monkeypatch, connection, product_embeddings)
+
+    result = refresher.run_once()
+    assert result["success"] and product_embeddings.calls == 1
+    assert connection.autocommit
+    assert "pg_try_advisory_lock(" in connection.queries[0][0]
+    assert "pg_advisory_unlock(" in connection.queries[-1][0]
+    assert connection.closed
+    assert "batches" not in refresher.last_result
+
+def test_run_once_skips_when_lock_is_taken(monkeypatch):
+    """Test that another process holding the lock makes the round a no-op."""
+    connection = FakeConnection(lock_free=False)
+    product_embeddings = FakeProductEmbeddings()
+    refresher = _refresher(monkeypatch, connection, product_embeddings)
+
+    assert refresher.run_once() is None
+    assert product_embeddings.calls == 0
+    assert not any("pg_advisory_unlock(" in query for query, _ in connection.queries)
+
+def test_run_once_unlocks_after_error(monkeypatch):
+    """Test that the lock is released even if the round raises."""
+    connection = FakeConnection()
+    refresher = _refresher(monkeypatch, connection, FakeProductEmbeddings(error=RuntimeError("openai down")))
+
+    with pytest.raises(RuntimeError):
+        refresher.run_once()
+    assert "pg_advisory_unlock(" in connection.queries[-1][0]
+
+def test_refresh_skips_backed_off_products_and_records_failures(monkeypatch):
+    """Test that products in backoff or over the attempt limit are not selected and failures are counted."""
+    products = [{"id": "a", "name": "A"}, {"id": "b", "name": "B"}]
+    connections = []
+
+    @contextmanager
+    def db_connection():
+        connection = FakeConnection(rows=products)
+        connections.append(connection)
+        yield connection
+
+    monkeypatch.setattr(product_embeddings_module, "db_connection", db_connection)
+    monkeypatch.setattr(product_embeddings_module, "has_column", lambda table, column: True)
+    product_embeddings = ProductEmbeddings.__new__(ProductEmbeddings)
+    monkeypatch.setattr(product_embeddings, "product_columns", lambda: ["id", "name"])
+    monkeypatch.setattr(
+        product_embeddings, "embed_products",
+        lambda rows, batch_size, progress_callback, skip_unchanged: {
+            "success": True, "total": len(rows), "failed": 1, "failed_products": [{"id": "b", "error": "boom"}]
+        }
+    )
+
+    result = product_embeddings.refresh_dirty_product_embeddings(batch_size=10)
+    assert result["failed"] == 1
+
+    select_query, select_params = connections[0].queries[0]
+    assert "embedding_attempts < %s" in select_query
+    assert "embedding_retry_at IS NULL OR embedding_retry_at <= NOW()" in select_query
+    assert select_params == (product_embeddings_module.EMBEDDING_REFRESH_MAX_ATTEMPTS,)
+
+    update_query, update_params = connections[1].queries[0]
+    assert "embedding_attempts = embedding_attempts + 1" in update_query
+    assert "POWER(2, embedding_attempts)" in update_query
+    assert update_params[-1] == ["b"]
+    assert connections[1].commits == 1
+
+def test_refresh_without_failures_records_nothing(monkeypatch):
+    """Test that a clean round does not open a connection to record failures."""
+    connections = []
+
+    @contextmanager
+    def db_connection():
+        connection = FakeConnection(rows=[{"id": "a"}])
+        connections.append(connection)
+        yield connection
+
+    monkeypatch.setattr(product_embeddings_module, "db_connection", db_connection)
+    monkeypatch.setattr(product_embeddings_module, "has_column", lambda table, column: True)
+    product_embeddings = ProductEmbeddings.__new__(ProductEmbeddings)
+    monkeypatch.setattr(product_embeddings, "product_columns", lambda: ["id"])
+    monkeypatch.setattr(
+        product_embeddings, "embed_products",
+        lambda rows, batch_size, progress_callback, skip_unchanged: {"success": True, "failed": 0, "failed_products": []}
+    )
+
+    product_embeddings.refresh_dirty_product_embeddings(batch_size=10)
+    assert len(connections) == 1
+
+def test_dirty_fields_use_hash_of_edited_text():
+    """Test that the dirty mark is a SET clause comparing against the hash of the merged product text."""
+    existing = {"id": "p1", "name": "Old", "description": "Same", "features": None}
+    params = ["New", "now"]
+    fields, stale = ProductController()._embedding_dirty_fields(
+        {"embedding_dirty_at", "embedding_attempts"}, existing, ProductUpdate(name="New"), params
+    )
+
+    expected = text_hash(ProductEmbeddings.build_product_text({**existing, "name": "New"}))
+    assert params[-1] == expected
+    assert stale == "embedding_text_hash IS DISTINCT FROM $3"
+    assert fields[0] == f"embedding_dirty_at = CASE WHEN {stale} THEN NOW() ELSE embedding_dirty_at END"
+    assert any(field.startswith("embedding_attempts = CASE") for field in fields)
+    assert any(field.startswith("embedding_retry_at = CASE") for field in fields)
+
+def test_dirty_fields_without_tracking_columns():
+    """Test that nothing is added before the dirty-tracking script has been run."""
+    params = []
+    assert ProductController()._embedding_dirty_fields({"id", "name"}, {}, ProductUpdate(), params) == ([], None)
+    assert params == []
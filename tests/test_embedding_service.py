@@ -0,0 +1,77 @@
+"""Tests for streaming stored embeddings out of the database in EmbeddingService."""
+from contextlib import contextmanager
+
+import numpy as np
+from app.services import embedding_service as embedding_service_module
+from app.services.embedding_service import EmbeddingService
+
+class FakeClients:
+    def embeddings(self, model):
+        return None
+
+class FakeNamedCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.fetch_sizes = []
+        self.query = None
+        self.closed = False
+
+    def execute(self, query, params=None):
+        self.query = query
+
+    def fetchmany(self, size):
+        self.fetch_sizes.append(size)
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+    def close(self):
+        self.closed = True
+
+def _service(monkeypatch, rows):
+    cursor = FakeNamedCursor(rows)
+    cursors = []
+
+    class FakeConnection:
+        def cursor(self, name=None, cursor_factory=None):
+            cursors.append(name)
+            return cursor
+
+    @contextmanager
+    def db_connection():
+        yield FakeConnection()
+
+    monkeypatch.setattr(embedding_service_module, "clients", FakeClients())
+    monkeypatch.setattr(embedding_service_module, "db_connection", db_connection)
+    return EmbeddingService(), cursor, cursors
+
+def test_iter_embeddings_streams_float32_blocks(monkeypatch):
+    """Test that rows arrive through a named cursor in chunks and are parsed into float32 blocks."""
+    rows = [(f"id-{index}", f"[{index},0.5,-1]") for index in range(5)]
+    service, cursor, cursors = _service(monkeypatch, rows)
+
+    blocks = list(service.iter_embeddings_from_db("products", chunk_size=2))
+    assert [ids for ids, _ in blocks] == [["id-0", "id-1"], ["id-2", "id-3"], ["id-4"]]
+    assert all(block.dtype == np.float32 and block.shape[1] == 3 for _, block in blocks)
+    assert np.allclose(blocks[1][1], [[2, 0.5, -1], [3, 0.5, -1]])
+
+    # Cursor phía server có tên, chỉ lấy các dòng có vector
+    assert cursors[0].startswith("embeddings_")
+    assert cursor.query == 'SELECT id::text, "embedding"::text FROM "products" WHERE "embedding" IS NOT NULL'
+    assert set(cursor.fetch_sizes) == {2}
+    assert cursor.closed
+
+def test_iter_embeddings_closes_the_cursor_when_abandoned(monkeypatch):
+    """Test that a consumer stopping early still closes the server-side cursor."""
+    rows = [(f"id-{index}", "[1,0]") for index in range(6)]
+    service, cursor, _ = _service(monkeypatch, rows)
+
+    stream = service.iter_embeddings_from_db("content", condition="brand_id IS NOT NULL", chunk_size=2)
+    next(stream)
+    stream.close()
+    assert cursor.closed
+    assert cursor.query.endswith("AND (brand_id IS NOT NULL)")
+
+def test_empty_table_yields_nothing(monkeypatch):
+    """Test that a table without vectors produces no blocks."""
+    service, _, _ = _service(monkeypatch, [])
+    assert list(service.iter_embeddings_from_db("products")) == []
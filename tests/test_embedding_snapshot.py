@@ -0,0 +1,88 @@
+"""Tests for the memory-mapped embedding snapshot and indexes built on top of it."""
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+from app.utils.ann_index import IVFFlatIndex
+from app.utils.embedding_snapshot import invalidate_snapshot, load_or_build_snapshot, read_snapshot, write_snapshot_chunks
+from app.utils.vector_search import QuantizedMatrix, normalize_rows
+
+def _vectors(count=200, dim=16, seed=5):
+    return np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32)
+
+def _write(directory, vectors, dtype="float32", synced_at=None):
+    ids = [str(row) for row in range(len(vectors))]
+    chunks = [(ids[:50], vectors[:50]), ([], []), (ids[50:], vectors[50:])]
+    return write_snapshot_chunks("products", chunks, dtype=dtype, directory=str(directory), synced_at=synced_at)
+
+def test_snapshot_round_trip(tmp_path):
+    """Test that chunks are written normalized, mapped read-only and carry their sync watermark."""
+    vectors = _vectors()
+    synced_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    assert _write(tmp_path, vectors, synced_at=synced_at) == len(vectors)
+
+    snapshot = read_snapshot("products", directory=str(tmp_path))
+    assert len(snapshot) == len(vectors)
+    assert not snapshot.matrix.flags.writeable
+    assert np.allclose(snapshot.matrix, normalize_rows(vectors), atol=1e-6)
+    assert np.allclose(snapshot.vector("7"), normalize_rows(vectors[7:8])[0], atol=1e-6)
+    assert snapshot.synced_at == synced_at
+
+def test_stale_and_invalidated_snapshots_are_ignored(tmp_path):
+    """Test max_age and invalidate_snapshot(), and that load_or_build_snapshot rebuilds once."""
+    _write(tmp_path, _vectors())
+    assert read_snapshot("products", max_age=-1, directory=str(tmp_path)) is None
+    invalidate_snapshot("products", directory=str(tmp_path))
+    assert read_snapshot("products", directory=str(tmp_path)) is None
+
+    builds = []
+    def build():
+        builds.append(1)
+        _write(tmp_path, _vectors())
+
+    load_or_build_snapshot("products", build, directory=str(tmp_path))
+    snapshot = load_or_build_snapshot("products", build, directory=str(tmp_path))
+    assert len(builds) == 1
+    assert len(snapshot) == 200
+
+def test_overlay_leaves_the_shared_array_untouched():
+    """Test that rows set or added over a read-only array go to the overlay and win on read."""
+    base = normalize_rows(_vectors(4, 3))
+    base.flags.writeable = False
+    matrix = QuantizedMatrix.encode(base, "float32")
+    assert matrix.codes is base
+
+    replacement = normalize_rows(np.array([[1.0, 0.0, 0.0]], dtype=np.float32))[0]
+    added = normalize_rows(np.array([[0.0, 0.0, 1.0]], dtype=np.float32))[0]
+    matrix.set_row(1, replacement)
+    matrix.reserve(5)
+    matrix.set_row(4, added)
+
+    assert matrix.codes is base
+    assert matrix.overlay_rows == 2
+    expected = np.vstack([base[0], replacement, base[2], base[3], added])
+    assert np.allclose(matrix.decode()[:5], expected)
+    assert np.allclose(matrix.decode([4, 1]), expected[[4, 1]])
+    query = np.array([[0.0, 0.6, 0.8]], dtype=np.float32)
+    assert np.allclose(matrix.scores(query)[0, :5], expected @ query[0])
+    assert np.allclose(matrix.scores(query, np.array([1, 4, 2]))[0], expected[[1, 4, 2]] @ query[0])
+
+@pytest.mark.parametrize("dtype", ["float32", "float16"])
+def test_index_on_snapshot_upserts_without_copying_it(tmp_path, dtype):
+    """Test that upserts into an index built on the mmap keep sharing it, for float32 and float16 snapshots."""
+    vectors = _vectors()
+    _write(tmp_path, vectors, dtype=dtype)
+    snapshot = read_snapshot("products", directory=str(tmp_path))
+
+    index = IVFFlatIndex(nlist=4, nprobe=4, min_train_size=50, quantization="float32")
+    index.build(snapshot.ids, snapshot.matrix, normalized=True)
+    new_vector = _vectors(1, seed=9)[0]
+    index.upsert("new", new_vector)
+    index.upsert("3", vectors[100])
+
+    # Vẫn là một view của mmap, không phải bản sao riêng của worker
+    assert np.shares_memory(index._vectors.codes, snapshot.matrix)
+    assert not index._vectors.codes.flags.writeable
+    assert index.stats()["overlay_rows"] == 2
+    assert index.search(new_vector, k=1)[0][0] == "new"
+    assert {record_id for record_id, _ in index.search(vectors[100], k=2)} == {"3", "100"}
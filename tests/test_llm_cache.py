@@ -0,0 +1,68 @@
+"""Tests for the chat model response cache in app.utils.llm_cache."""
+import pytest
+from app.utils.llm_cache import CachedChatModel, LLMResponseCache, fresh_requested, fresh_responses
+
+class FakeChatModel:
+    def __init__(self, temperature=0.7, error=None):
+        self.model_name = "gpt-test"
+        self.temperature = temperature
+        self.error = error
+        self.prompts = []
+
+    def invoke(self, prompt, *args, **kwargs):
+        self.prompts.append(prompt)
+        if self.error:
+            raise self.error
+        return f"response {len(self.prompts)}"
+
+def test_repeated_prompt_is_served_from_cache():
+    """Test that the same model, temperature and prompt call the API once."""
+    cache = LLMResponseCache(max_size=10, ttl=60, enabled=True)
+    client = FakeChatModel()
+    model = CachedChatModel(client, cache)
+
+    assert model.invoke("hello") == "response 1"
+    assert model.invoke("hello") == "response 1"
+    assert model.invoke("other") == "response 2"
+    assert CachedChatModel(FakeChatModel(temperature=0.2), cache).invoke("hello") == "response 1"
+    assert len(client.prompts) == 2
+    assert cache.stats()["hits"] == 1
+
+def test_fresh_bypasses_but_refreshes_cache():
+    """Test that fresh requests skip the lookup and store the new response for later calls."""
+    cache = LLMResponseCache(max_size=10, ttl=60, enabled=True)
+    model = CachedChatModel(FakeChatModel(), cache)
+    model.invoke("hello")
+
+    with fresh_responses():
+        assert fresh_requested()
+        assert model.invoke("hello") == "response 2"
+    assert not fresh_requested()
+    assert model.invoke("hello") == "response 2"
+    assert model.invoke("hello", fresh=True) == "response 3"
+    assert cache.stats()["bypassed"] == 1
+
+def test_errors_and_non_string_prompts_are_not_cached():
+    """Test that failures are raised every time and message lists go straight to the client."""
+    cache = LLMResponseCache(max_size=10, ttl=60, enabled=True)
+    client = FakeChatModel(error=RuntimeError("rate limited"))
+    model = CachedChatModel(client, cache)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            model.invoke("hello")
+    assert len(client.prompts) == 2
+
+    client = FakeChatModel()
+    model = CachedChatModel(client, cache)
+    model.invoke(["message"])
+    model.invoke(["message"])
+    assert len(client.prompts) == 2
+    assert model.model_name == "gpt-test"
+
+def test_disabled_cache_always_calls_the_client():
+    """Test that LLM_CACHE_ENABLED=false turns caching off."""
+    client = FakeChatModel()
+    model = CachedChatModel(client, LLMResponseCache(max_size=10, ttl=60, enabled=False))
+    model.invoke("hello")
+    model.invoke("hello")
+    assert len(client.prompts) == 2
@@ -0,0 +1,62 @@
+"""Tests for keyset pagination helpers in app.utils.pagination."""
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+from app.utils.pagination import decode_cursor, encode_cursor, keyset_condition, keyset_limit, keyset_order, split_page
+
+def _rows(count):
+    return [
+        {"id": f"00000000-0000-0000-0000-{index:012d}", "created_at": datetime(2024, 1, 1, 12, index, tzinfo=timezone.utc)}
+        for index in range(count)
+    ]
+
+def test_cursor_round_trip():
+    """Test that a cursor decodes back to the row's (created_at, id)."""
+    row = _rows(1)[0]
+    cursor = encode_cursor(row)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (row["created_at"], row["id"])
+
+def test_decode_cursor_rejects_garbage():
+    """Test that a malformed cursor is a 400, not a server error."""
+    with pytest.raises(HTTPException) as error:
+        decode_cursor("not-a-cursor")
+    assert error.value.status_code == 400
+
+def test_keyset_clauses_continue_parameter_numbering():
+    """Test that the keyset condition and limit append to existing parameters."""
+    row = _rows(1)[0]
+    params = ["brand"]
+    condition = keyset_condition("t", encode_cursor(row), params)
+    limit = keyset_limit(10, params)
+    assert condition == "(t.created_at, t.id) < ($2, $3)"
+    assert limit == " LIMIT $4"
+    assert params == ["brand", row["created_at"], row["id"], 11]
+    assert keyset_order("t") == " ORDER BY t.created_at DESC NULLS FIRST, t.id DESC"
+
+def test_rows_without_created_at():
+    """Test that a NULL created_at gives a valid cursor that continues within the NULL group."""
+    row = {"id": "00000000-0000-0000-0000-000000000001", "created_at": None}
+    cursor = encode_cursor(row)
+    assert decode_cursor(cursor) == (None, row["id"])
+
+    params = []
+    condition = keyset_condition("p", cursor, params)
+    assert condition == "((p.created_at IS NULL AND p.id < $1) OR p.created_at IS NOT NULL)"
+    assert params == [row["id"]]
+
+    page, next_cursor = split_page([row, _rows(1)[0]], 1)
+    assert page == [row]
+    assert decode_cursor(next_cursor) == (None, row["id"])
+
+def test_split_page():
+    """Test that the extra row signals a next page whose cursor points at the last row kept."""
+    rows = _rows(3)
+    page, cursor = split_page(rows, 2)
+    assert page == rows[:2]
+    assert decode_cursor(cursor) == (rows[1]["created_at"], rows[1]["id"])
+
+    page, cursor = split_page(rows, 3)
+    assert page == rows
+    assert cursor is None
@@ -0,0 +1,50 @@
+"""Tests for the search result cache in app.utils.query_cache."""
+from app.utils import query_cache as query_cache_module
+from app.utils.query_cache import QueryCache, TTLCache, normalize_query
+
+def test_ttl_cache_evicts_lru_and_expires(monkeypatch):
+    """Test least-recently-used eviction and expiry after ttl seconds."""
+    now = [100.0]
+    monkeypatch.setattr(query_cache_module.time, "monotonic", lambda: now[0])
+    cache = TTLCache(max_size=2, ttl=10)
+
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.stats()["evictions"] == 1
+
+    now[0] += 10
+    assert cache.get("a") is None and cache.get("c") is None
+    assert cache.stats()["size"] == 0
+
+def test_ttl_cache_disabled():
+    """Test that a zero size or ttl turns the cache off."""
+    for cache in (TTLCache(max_size=0, ttl=10), TTLCache(max_size=10, ttl=0)):
+        cache.put("a", 1)
+        assert cache.get("a") is None
+
+def test_results_keyed_like_embedding_cache():
+    """Test that result keys collapse whitespace and Unicode forms but keep case, like the embedding cache."""
+    cache = QueryCache(max_size=10, ttl=60)
+    cache.put_results("products", "  Áo  thun\tnam ", 5, ["p1", "p2"])
+
+    assert cache.get_results("products", "Áo thun nam", 5) == ["p1", "p2"]
+    assert cache.get_results("products", "áo thun nam", 5) is None
+    assert cache.get_results("products", "Áo thun nam", 10) is None
+    assert list(cache.stats()) == ["results"]
+
+def test_invalidate_is_per_table():
+    """Test that invalidating one table keeps the other tables' results."""
+    cache = QueryCache(max_size=10, ttl=60)
+    cache.put_results("products", "shirt", 5, ["p1"])
+    cache.put_results("content", "shirt", 5, ["c1"])
+
+    cache.invalidate("products")
+    assert cache.get_results("products", "shirt", 5) is None
+    assert cache.get_results("content", "shirt", 5) == ["c1"]
+
+def test_normalize_query_casefolds():
+    """Test the case-insensitive form used where case carries no meaning."""
+    assert normalize_query("  Hello WORLD ") == "hello world"
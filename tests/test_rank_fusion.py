@@ -0,0 +1,20 @@
+"""Tests for reciprocal rank fusion in app.utils.rank_fusion."""
+import pytest
+from app.utils.rank_fusion import reciprocal_rank_fusion
+
+def test_rrf_rewards_agreement_between_sources():
+    """Test that a record ranked well by both sources beats one ranked first by only one."""
+    fused = reciprocal_rank_fusion({"vector": ["a", "b", "c"], "bm25": ["b", "d", "a"]}, k=60)
+    assert [record_id for record_id, _, _ in fused] == ["b", "a", "d", "c"]
+    assert fused[0][1] == pytest.approx(1 / 62 + 1 / 61)
+    assert fused[0][2] == {"vector": 2, "bm25": 1}
+
+def test_rrf_weights_and_limit():
+    """Test that weights shift the order, zero weight drops a source and limit truncates."""
+    rankings = {"vector": ["a", "b"], "bm25": ["b", "a"]}
+    fused = reciprocal_rank_fusion(rankings, weights={"bm25": 2.0}, limit=1)
+    assert [record_id for record_id, _, _ in fused] == ["b"]
+
+    fused = reciprocal_rank_fusion(rankings, weights={"bm25": 0})
+    assert [record_id for record_id, _, _ in fused] == ["a", "b"]
+    assert all(set(ranks) == {"vector"} for _, _, ranks in fused)
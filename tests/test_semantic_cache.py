@@ -0,0 +1,130 @@
+"""Tests for the semantic generation cache in app.utils.semantic_cache."""
+import numpy as np
+from app.services import rag_service as rag_service_module
+from app.services.rag_service import RAGService
+from app.utils.semantic_cache import SemanticCache, exact_key
+
+VECTORS = {
+    "summer skincare": [1.0, 0.0, 0.0],
+    "skincare for summer": [0.99, 0.14, 0.0],
+    "winter skincare": [0.0, 1.0, 0.0],
+}
+
+def _embed(text):
+    return np.asarray(VECTORS[text], dtype=np.float32)
+
+class _Counter:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return {"result": self.calls}
+
+def test_exact_and_semantic_hits_within_a_scope():
+    """Test that the same or a close request is served from the cache."""
+    cache = SemanticCache(threshold=0.95, max_age=3600, max_entries=10, max_scopes=10, enabled=True)
+    compute = _Counter()
+    scope = ("tenant-a", "topics", "product-1", 3)
+
+    first = cache.get_or_compute(scope, "summer skincare", _embed, compute)
+    assert cache.get_or_compute(scope, "summer skincare", _embed, compute) == first
+    assert cache.get_or_compute(scope, "skincare for summer", _embed, compute) == first
+    assert cache.get_or_compute(scope, "winter skincare", _embed, compute) != first
+    assert compute.calls == 2
+
+    stats = cache.stats()
+    assert (stats["exact_hits"], stats["semantic_hits"], stats["misses"]) == (1, 1, 2)
+
+def test_scopes_isolate_tenants_products_and_prompts():
+    """Test that a result is never served across tenants, products, prompts or previous topics."""
+    cache = SemanticCache(threshold=0.95, max_age=3600, max_entries=10, max_scopes=10, enabled=True)
+    compute = _Counter()
+    scopes = [
+        ("tenant-a", "topic", "product-1", exact_key("summer"), None),
+        ("tenant-b", "topic", "product-1", exact_key("summer"), None),
+        ("tenant-a", "topic", "product-2", exact_key("summer"), None),
+        ("tenant-a", "topic", "product-1", exact_key("winter"), None),
+        ("tenant-a", "topic", "product-1", exact_key("summer"), exact_key(["Sunscreen guide"])),
+    ]
+    for scope in scopes:
+        cache.get_or_compute(scope, "summer skincare", _embed, compute)
+    assert compute.calls == len(scopes)
+
+    cache.invalidate("tenant-a")
+    assert cache.stats()["scopes"] == 1
+
+def test_no_tenant_bypasses_the_cache():
+    """Test that requests without a tenant are always computed and never stored."""
+    cache = SemanticCache(threshold=0.95, max_age=3600, max_entries=10, max_scopes=10, enabled=True)
+    compute = _Counter()
+    cache.get_or_compute((None, "topics", None, 3), "summer skincare", _embed, compute)
+    cache.get_or_compute((None, "topics", None, 3), "summer skincare", _embed, compute)
+    assert compute.calls == 2
+    assert cache.stats()["size"] == 0
+
+def test_eviction_and_uncacheable_results():
+    """Test LRU eviction of entries and scopes, and that rejected results are not stored."""
+    cache = SemanticCache(threshold=0.95, max_age=3600, max_entries=1, max_scopes=2, enabled=True)
+    compute = _Counter()
+    scope = ("tenant-a", "topics", None, 3)
+
+    cache.get_or_compute(scope, "summer skincare", _embed, compute)
+    cache.get_or_compute(scope, "winter skincare", _embed, compute)
+    cache.get_or_compute(scope, "summer skincare", _embed, compute)
+    assert compute.calls == 3
+
+    cache.get_or_compute(("tenant-b",), "summer skincare", _embed, compute)
+    cache.get_or_compute(("tenant-c",), "summer skincare", _embed, compute)
+    stats = cache.stats()
+    assert (stats["scopes"], stats["size"]) == (2, 2)
+
+    cache.get_or_compute(("tenant-d",), "summer skincare", _embed, compute, cacheable=lambda value: False)
+    assert cache.stats()["scopes"] == 2
+
+def test_expired_entries_are_not_served():
+    """Test that entries older than max_age are recomputed."""
+    cache = SemanticCache(threshold=0.95, max_age=-1, max_entries=10, max_scopes=10, enabled=True)
+    compute = _Counter()
+    cache.get_or_compute(("tenant-a",), "summer skincare", _embed, compute)
+    cache.get_or_compute(("tenant-a",), "summer skincare", _embed, compute)
+    assert compute.calls == 2
+
+def test_exact_key_ignores_case_whitespace_and_list_order():
+    """Test that exact keys only differ when the normalized content differs."""
+    assert exact_key("  Summer  Sale ") == exact_key("summer sale")
+    assert exact_key("summer sale") != exact_key("winter sale")
+    assert exact_key(["Topic B", "topic a"]) == exact_key(["Topic A", "Topic B", "topic b"])
+    assert exact_key(["Topic A"]) != exact_key(["Topic A", "Topic C"])
+    assert exact_key(None) is None and exact_key([]) is None
+
+def test_topic_from_context_scopes_prompt_and_previous_topics(monkeypatch):
+    """Test that previous topics match as a set and a different prompt or topic set is generated anew."""
+    monkeypatch.setattr(rag_service_module, "semantic_cache", SemanticCache(
+        threshold=0.95, max_age=3600, max_entries=10, max_scopes=10, enabled=True
+    ))
+    generated = []
+
+    class FakeEmbeddingService:
+        def generate_embedding(self, text):
+            return [1.0, 0.0]
+
+    def create_topic_generator(**context):
+        generated.append(context)
+        return lambda: f"topic {len(generated)}"
+
+    service = RAGService.__new__(RAGService)
+    service.embedding_service = FakeEmbeddingService()
+    service.create_topic_generator = create_topic_generator
+
+    def topic(previous_topics, prompt=None):
+        return service.generate_topic_from_context(
+            "Kem chống nắng", previous_topics=previous_topics, prompt=prompt, tenant="brand-1", product_id="p1"
+        )
+
+    assert topic(["Topic A", "Topic B"]) == "topic 1"
+    assert topic(["topic b", "Topic A"]) == "topic 1"
+    assert topic(["Topic A", "Topic C"]) == "topic 2"
+    monkeypatch.setattr(service, "refine_topic_with_prompt", lambda topic, prompt: f"{topic} ({prompt})", raising=False)
+    assert topic(["Topic A", "Topic B"], prompt="mùa hè") == "topic 3 (mùa hè)"
+    assert len(generated) == 3
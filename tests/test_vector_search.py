@@ -0,0 +1,91 @@
+"""Tests for brute-force cosine search in app.utils.vector_search, with and without quantization."""
+import numpy as np
+import pytest
+from app.utils.vector_search import (
+    EmbeddingMatrix, QuantizedMatrix, normalize_rows, parse_embedding, select_matches, top_k_indices
+)
+
+def _vectors(count=400, dim=32, seed=7):
+    return np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32)
+
+def _exact_top(vectors, query, k):
+    scores = normalize_rows(vectors) @ normalize_rows(query.reshape(1, -1))[0]
+    return list(np.argsort(-scores)[:k])
+
+def test_normalize_rows_and_top_k():
+    """Test unit-length rows (zero rows stay zero) and best-first partial sorting."""
+    rows = normalize_rows([[3.0, 4.0], [0.0, 0.0]])
+    assert np.allclose(rows, [[0.6, 0.8], [0.0, 0.0]])
+
+    scores = np.array([0.1, 0.9, 0.5, 0.7], dtype=np.float32)
+    assert list(top_k_indices(scores, 2)) == [1, 3]
+    assert list(top_k_indices(scores, None)) == [1, 3, 2, 0]
+    assert list(top_k_indices(scores, 0)) == []
+
+def test_parse_embedding_accepts_pgvector_text():
+    """Test that the text form psycopg2 returns for vector columns is parsed."""
+    assert parse_embedding("[0.5,1,-2]") == [0.5, 1, -2]
+    assert parse_embedding([1.0]) == [1.0]
+    assert parse_embedding(None) is None
+
+@pytest.mark.parametrize("quantization", ["float32", "float16", "int8"])
+def test_embedding_matrix_matches_exact_search(quantization):
+    """Test that batched matrix search returns the exact top-k for every query, best first, after rescoring."""
+    vectors = _vectors()
+    items = [{"id": str(index), "embedding": vector.tolist()} for index, vector in enumerate(vectors)]
+    matrix = EmbeddingMatrix.from_items(items, quantization=quantization)
+    queries = vectors[:3] + 0.1 * _vectors(3, seed=1)
+
+    results = matrix.search(queries, top_k=5)
+    assert len(results) == 3
+    for query, matches in zip(queries, results):
+        assert [row for row, _ in matches] == _exact_top(vectors, query, 5)
+        scores = [score for _, score in matches]
+        assert scores == sorted(scores, reverse=True)
+
+def test_embedding_matrix_threshold_and_missing_embeddings():
+    """Test the similarity threshold and that records without an embedding are skipped."""
+    items = [{"id": "a", "embedding": [1.0, 0.0]}, {"id": "b", "embedding": None}, {"id": "c", "embedding": "[0.0,1.0]"}]
+    matrix = EmbeddingMatrix.from_items(items, quantization="float32")
+    assert [item["id"] for item in matrix.items] == ["a", "c"]
+
+    [matches] = matrix.search([[1.0, 0.1]], threshold=0.9)
+    assert [row for row, _ in matches] == [0]
+    assert matches[0][1] == pytest.approx(1 / np.sqrt(1.01), rel=1e-5)
+    assert EmbeddingMatrix([], [], quantization="float32").search([[1.0, 0.0]]) == [[]]
+
+@pytest.mark.parametrize("mode, ratio", [("float16", 2), ("int8", 4)])
+def test_quantized_matrix_is_compact_and_close(mode, ratio):
+    """Test the memory saving of each mode and that decoded rows and scores stay close to float32."""
+    vectors = normalize_rows(_vectors(dim=64))
+    exact = QuantizedMatrix.encode(vectors, "float32")
+    quantized = QuantizedMatrix.encode(vectors, mode, chunk_size=50)
+    assert quantized.codes.dtype == np.dtype(mode)
+    assert exact.nbytes / quantized.nbytes >= ratio * 0.9
+
+    assert np.allclose(quantized.decode([0, 5]), vectors[[0, 5]], atol=0.02)
+    queries = vectors[:2]
+    assert np.allclose(quantized.scores(queries), exact.scores(queries), atol=0.02)
+
+def test_quantized_matrix_rejects_unknown_mode():
+    """Test that only the supported quantization modes are accepted."""
+    with pytest.raises(ValueError):
+        QuantizedMatrix("int4")
+
+def test_select_matches_rescores_shortlist():
+    """Test that exact scores decide the final order among the shortlisted candidates."""
+    approx = np.array([0.90, 0.89, 0.10, 0.88], dtype=np.float32)
+    exact = np.array([0.80, 0.95, 0.99, 0.70], dtype=np.float32)
+    shortlisted = []
+
+    def exact_scores(positions):
+        shortlisted.append(list(positions))
+        return exact[positions]
+
+    matches = select_matches(approx, exact_scores, top_k=1, rescore_factor=2)
+    assert shortlisted == [[0, 1]]
+    assert matches == [(1, pytest.approx(0.95))]
+
+    assert select_matches(approx, None, top_k=2) == [(0, pytest.approx(0.90)), (1, pytest.approx(0.89))]
+    # Với ngưỡng, chỉ các ứng viên có điểm gần đúng sát ngưỡng mới được chấm lại
+    assert [position for position, _ in select_matches(approx, lambda positions: exact[positions], threshold=0.9)] == [1]